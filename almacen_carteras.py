@@ -0,0 +1,396 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+
+# =============================================================================
+# ALMACÉN DE CARTERAS (SQLite)
+# Sustituye al directorio pool_de_carteras/wallet_N.json: un único archivo con
+# índices por id, address y estado. Cada proceso abre su propia conexión.
+# =============================================================================
+
+log = logging.getLogger()
+
+ALMACEN_DB = "carteras.db"          # Archivo SQLite con todas las carteras. ¡Contiene claves privadas!
+CARTERAS_DIR = "pool_de_carteras"   # Directorio antiguo (solo para importar)
+ARCHIVO_RAIZ_JSON = "raiz_hd.json"  # Raíz HD antigua dentro de CARTERAS_DIR (solo para importar)
+TIMEOUT_BLOQUEO_SECONDS = 30        # Espera máxima si otro proceso tiene la base de datos bloqueada
+
+# --- Estados de una cartera ---
+ESTADO_NUEVA = "nueva"        # Nunca usada por un worker
+ESTADO_EN_USO = "en_uso"      # Asignada a un slot
+ESTADO_RESUELTA = "resuelta"  # Ya resolvió un challenge
+ESTADO_CUARENTENA = "cuarentena" # Hizo fallar su slot una y otra vez: no se vuelve a lanzar
+
+# Campos del antiguo wallet_N.json que se guardan como columnas
+CAMPOS_CARTERA = (
+    "seed_phrase",
+    "address",
+    "public_key_hex",
+    "payment_private_key_hex",
+    "stake_private_key_hex",
+    "derivation_index",
+    "payment_derivation_path",
+    "stake_derivation_path",
+    "generated_signature",
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS carteras (
+    id INTEGER PRIMARY KEY,
+    seed_phrase TEXT,
+    address TEXT NOT NULL,
+    public_key_hex TEXT NOT NULL,
+    payment_private_key_hex TEXT NOT NULL,
+    stake_private_key_hex TEXT,
+    derivation_index INTEGER,
+    payment_derivation_path TEXT,
+    stake_derivation_path TEXT,
+    generated_signature TEXT,
+    status TEXT NOT NULL DEFAULT 'nueva',
+    updated_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_carteras_address ON carteras(address);
+CREATE INDEX IF NOT EXISTS idx_carteras_status ON carteras(status, id);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS firmas (
+    address TEXT NOT NULL,
+    hash_mensaje TEXT NOT NULL,
+    firma TEXT NOT NULL,
+    creada REAL,
+    PRIMARY KEY (address, hash_mensaje)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sesiones (
+    wallet_id INTEGER PRIMARY KEY,
+    datos TEXT NOT NULL,
+    guardada REAL
+);
+CREATE TABLE IF NOT EXISTS navegadores (
+    pid_driver INTEGER PRIMARY KEY,
+    pid_worker INTEGER NOT NULL,
+    slot_id INTEGER,
+    pgid INTEGER,
+    pid_chrome INTEGER,
+    creado REAL
+);
+"""
+
+
+def conectar(ruta_db=None):
+    """
+    Abre una conexión al almacén (creando el esquema si hace falta).
+    WAL permite que los workers escriban mientras el supervisor lee.
+    """
+    conn = sqlite3.connect(ruta_db or ALMACEN_DB, timeout=TIMEOUT_BLOQUEO_SECONDS)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def _ejecutar(sql, params=(), ruta_db=None):
+    """Ejecuta una sentencia de escritura en su propia transacción."""
+    conn = conectar(ruta_db)
+    try:
+        with conn:
+            return conn.execute(sql, params).rowcount
+    finally:
+        conn.close()
+
+
+def _consultar(sql, params=(), ruta_db=None):
+    """Ejecuta una consulta y devuelve todas las filas."""
+    conn = conectar(ruta_db)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+# --- API de carteras ---
+
+def insertar_carteras(carteras, ruta_db=None):
+    """
+    Inserta una lista de (wallet_id, datos) en una sola transacción.
+    Los IDs (o direcciones) ya existentes se ignoran. Devuelve los IDs que se insertaron.
+    """
+    columnas = ("id",) + CAMPOS_CARTERA + ("status", "updated_at")
+    sql = (f"INSERT OR IGNORE INTO carteras ({', '.join(columnas)}) "
+           f"VALUES ({', '.join('?' for _ in columnas)})")
+    ahora = time.time()
+    filas = [
+        (wallet_id,) + tuple(datos.get(c) for c in CAMPOS_CARTERA) + (datos.get("status", ESTADO_NUEVA), ahora)
+        for wallet_id, datos in carteras
+    ]
+    conn = conectar(ruta_db)
+    try:
+        with conn:
+            return [fila[0] for fila in filas if conn.execute(sql, fila).rowcount > 0]
+    finally:
+        conn.close()
+
+
+def obtener_cartera(wallet_id, ruta_db=None):
+    """Devuelve los datos de la cartera como dict (mismas claves que el antiguo JSON) o None."""
+    filas = _consultar("SELECT * FROM carteras WHERE id = ?", (wallet_id,), ruta_db)
+    if not filas:
+        return None
+    return {k: v for k, v in dict(filas[0]).items() if v is not None}
+
+
+def contar_carteras(estado=None, ruta_db=None):
+    """Número de carteras del almacén (opcionalmente solo las de un estado)."""
+    if estado is None:
+        return _consultar("SELECT COUNT(*) FROM carteras", (), ruta_db)[0][0]
+    return _consultar("SELECT COUNT(*) FROM carteras WHERE status = ?", (estado,), ruta_db)[0][0]
+
+
+def reservar_ids(cantidad, ruta_db=None):
+    """
+    Reserva 'cantidad' IDs contiguos para carteras nuevas y devuelve el primero.
+    El contador vive en meta ('proximo_id') y se avanza en una transacción
+    BEGIN IMMEDIATE: el productor y la generación síncrona del supervisor nunca
+    reciben el mismo ID, aunque todavía no hayan insertado sus carteras.
+    """
+    conn = conectar(ruta_db)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fila = conn.execute("SELECT valor FROM meta WHERE clave = 'proximo_id'").fetchone()
+            maximo = conn.execute("SELECT MAX(id) FROM carteras").fetchone()[0] or 0
+            primero = max(json.loads(fila[0]) if fila else 1, maximo + 1)
+            conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('proximo_id', ?)",
+                         (json.dumps(primero + cantidad),))
+            return primero
+    finally:
+        conn.close()
+
+
+def listar_ids(estado=None, limite=None, ruta_db=None):
+    """
+    IDs de las carteras ordenados de menor a mayor (opcionalmente filtrados por
+    estado: uno, o una tupla de estados).
+    """
+    sql, params = "SELECT id FROM carteras", ()
+    if isinstance(estado, (tuple, list)):
+        sql, params = sql + f" WHERE status IN ({', '.join('?' for _ in estado)})", tuple(estado)
+    elif estado is not None:
+        sql, params = sql + " WHERE status = ?", (estado,)
+    sql += " ORDER BY id"
+    if limite is not None:
+        sql, params = sql + " LIMIT ?", params + (limite,)
+    return [fila[0] for fila in _consultar(sql, params, ruta_db)]
+
+
+def reservar_cartera_nueva(ruta_db=None):
+    """
+    Toma la cartera NUEVA de menor ID y la marca EN_USO en una sola transacción.
+    Devuelve su ID, o None si no queda ninguna lista. Usa el índice (status, id).
+    """
+    conn = conectar(ruta_db)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE") # Evita que dos procesos reserven la misma
+            fila = conn.execute("SELECT id FROM carteras WHERE status = ? ORDER BY id LIMIT 1",
+                                (ESTADO_NUEVA,)).fetchone()
+            if fila is None:
+                return None
+            conn.execute("UPDATE carteras SET status = ?, updated_at = ? WHERE id = ?",
+                         (ESTADO_EN_USO, time.time(), fila[0]))
+            return fila[0]
+    finally:
+        conn.close()
+
+
+def guardar_firma(wallet_id, firma_hex, ruta_db=None):
+    """Guarda la última firma generada para la cartera (sustituye a reescribir el JSON)."""
+    return _ejecutar("UPDATE carteras SET generated_signature = ?, updated_at = ? WHERE id = ?",
+                     (firma_hex, time.time(), wallet_id), ruta_db) > 0
+
+
+def marcar_estado(wallet_id, estado, ruta_db=None, solo_si=None):
+    """
+    Cambia el estado de una cartera (ESTADO_NUEVA, ESTADO_EN_USO, ESTADO_RESUELTA...).
+    Con 'solo_si', solo si su estado actual es ese (en la misma sentencia). Devuelve si cambió.
+    """
+    if solo_si is not None:
+        return _ejecutar("UPDATE carteras SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                         (estado, time.time(), wallet_id, solo_si), ruta_db) > 0
+    return _ejecutar("UPDATE carteras SET status = ?, updated_at = ? WHERE id = ?",
+                     (estado, time.time(), wallet_id), ruta_db) > 0
+
+
+# --- Metadatos (raíz HD, etc.) ---
+
+def obtener_meta(clave, ruta_db=None):
+    """Devuelve el valor (JSON decodificado) guardado bajo 'clave' o None."""
+    filas = _consultar("SELECT valor FROM meta WHERE clave = ?", (clave,), ruta_db)
+    return json.loads(filas[0][0]) if filas else None
+
+
+def guardar_meta(clave, valor, ruta_db=None):
+    """Guarda 'valor' (serializable a JSON) bajo 'clave'."""
+    _ejecutar("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (clave, json.dumps(valor)), ruta_db)
+
+
+# --- Caché de firmas (address, sha256 del mensaje) ---
+# Compartida por todos los workers: relanzar una cartera con el mismo texto de
+# términos no vuelve a firmar. Al cambiar el texto se borran las de textos anteriores.
+
+def hash_mensaje(mensaje):
+    """Clave del mensaje en la caché (sha256 en hex del texto en UTF-8)."""
+    return hashlib.sha256(mensaje.encode("utf-8")).hexdigest()
+
+
+def obtener_firma_cache(address, mensaje, ruta_db=None):
+    """Firma guardada de 'mensaje' para 'address', o None si no está en la caché."""
+    filas = _consultar("SELECT firma FROM firmas WHERE address = ? AND hash_mensaje = ?",
+                       (address, hash_mensaje(mensaje)), ruta_db)
+    return filas[0][0] if filas else None
+
+
+def guardar_firmas_cache(firmas, mensaje, ruta_db=None):
+    """
+    Guarda una lista de (address, firma) de 'mensaje' en una sola transacción.
+    Si 'mensaje' no es el último texto de términos visto, antes invalida todas las
+    firmas de textos anteriores. Devuelve cuántas se guardaron.
+    """
+    clave = hash_mensaje(mensaje)
+    ahora = time.time()
+    conn = conectar(ruta_db)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE") # La comprobación y el borrado, atómicos entre procesos
+            fila = conn.execute("SELECT valor FROM meta WHERE clave = 'hash_terminos'").fetchone()
+            if fila is None or json.loads(fila[0]) != clave:
+                borradas = conn.execute("DELETE FROM firmas WHERE hash_mensaje != ?", (clave,)).rowcount
+                conn.executemany("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)",
+                                 [("hash_terminos", json.dumps(clave)), ("texto_terminos", json.dumps(mensaje))])
+                if borradas:
+                    log.info(f"El texto de los términos ha cambiado: {borradas} firmas antiguas invalidadas.")
+            conn.executemany("INSERT OR REPLACE INTO firmas (address, hash_mensaje, firma, creada) VALUES (?, ?, ?, ?)",
+                             [(address, clave, firma, ahora) for address, firma in firmas])
+            return len(firmas)
+    finally:
+        conn.close()
+
+
+def texto_terminos_actual(ruta_db=None):
+    """Último texto de términos firmado por un worker (o None si aún no se ha visto ninguno)."""
+    return obtener_meta("texto_terminos", ruta_db)
+
+
+def carteras_sin_firma_cache(mensaje, estados=(ESTADO_NUEVA, ESTADO_EN_USO), ruta_db=None):
+    """(address, payment_private_key_hex) de las carteras en 'estados' sin firma de 'mensaje' en la caché."""
+    marcas = ", ".join("?" for _ in estados)
+    filas = _consultar(
+        f"SELECT c.address, c.payment_private_key_hex FROM carteras c WHERE c.status IN ({marcas}) "
+        f"AND NOT EXISTS (SELECT 1 FROM firmas f WHERE f.address = c.address AND f.hash_mensaje = ?) ORDER BY c.id",
+        tuple(estados) + (hash_mensaje(mensaje),), ruta_db)
+    return [(fila[0], fila[1]) for fila in filas]
+
+
+# --- Sesiones del navegador por cartera (cookies + storage tras 'Start session') ---
+# ¡Dan acceso a la sesión del sitio igual que las claves dan acceso a los fondos!
+
+def guardar_sesion(wallet_id, datos, ruta_db=None):
+    """Guarda (sustituyendo la anterior) la sesión del navegador de la cartera (dict serializable a JSON)."""
+    _ejecutar("INSERT OR REPLACE INTO sesiones (wallet_id, datos, guardada) VALUES (?, ?, ?)",
+              (wallet_id, json.dumps(datos), time.time()), ruta_db)
+
+
+def obtener_sesion(wallet_id, max_edad_seconds=None, ruta_db=None):
+    """Sesión guardada de la cartera como dict, o None si no hay (o es más antigua que 'max_edad_seconds')."""
+    filas = _consultar("SELECT datos, guardada FROM sesiones WHERE wallet_id = ?", (wallet_id,), ruta_db)
+    if not filas:
+        return None
+    if max_edad_seconds is not None and time.time() - (filas[0][1] or 0) > max_edad_seconds:
+        return None
+    return json.loads(filas[0][0])
+
+
+def borrar_sesion(wallet_id, ruta_db=None):
+    """Olvida la sesión guardada de la cartera (inválida o ya no necesaria)."""
+    return _ejecutar("DELETE FROM sesiones WHERE wallet_id = ?", (wallet_id,), ruta_db) > 0
+
+
+# --- Procesos de navegador por worker (ver procesos_navegador.py) ---
+
+def registrar_navegador(pid_driver, pid_worker, slot_id=None, pgid=None, pid_chrome=None, ruta_db=None):
+    """Apunta el chromedriver (y su grupo y Chrome) que ha arrancado el worker 'pid_worker'."""
+    _ejecutar("INSERT OR REPLACE INTO navegadores (pid_driver, pid_worker, slot_id, pgid, pid_chrome, creado) "
+              "VALUES (?, ?, ?, ?, ?, ?)", (pid_driver, pid_worker, slot_id, pgid, pid_chrome, time.time()), ruta_db)
+
+
+def listar_navegadores(pid_worker=None, ruta_db=None):
+    """Navegadores registrados (todos, o solo los del worker 'pid_worker') como filas con nombre."""
+    if pid_worker is None:
+        return _consultar("SELECT * FROM navegadores ORDER BY creado", (), ruta_db)
+    return _consultar("SELECT * FROM navegadores WHERE pid_worker = ? ORDER BY creado", (pid_worker,), ruta_db)
+
+
+def borrar_navegador(pid_driver, ruta_db=None):
+    """Olvida un navegador registrado (cerrado por su worker o ya terminado por el supervisor)."""
+    return _ejecutar("DELETE FROM navegadores WHERE pid_driver = ?", (pid_driver,), ruta_db) > 0
+
+
+# --- Importador del formato antiguo ---
+
+def importar_pool_json(directorio=CARTERAS_DIR, ruta_db=None):
+    """
+    Importa (una sola vez) los wallet_N.json de 'directorio' al almacén.
+    Conserva el ID de cada archivo; los IDs ya importados se ignoran.
+    También importa la raíz HD (raiz_hd.json) si existe.
+    Devuelve el número de carteras importadas.
+    """
+    if not os.path.isdir(directorio):
+        log.warning(f"No existe el directorio '{directorio}'. Nada que importar.")
+        return 0
+
+    carteras = []
+    for nombre in os.listdir(directorio):
+        if not (nombre.startswith('wallet_') and nombre.endswith('.json')):
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            wallet_id = int(nombre[len('wallet_'):-len('.json')])
+            with open(ruta, 'r') as f:
+                datos = json.load(f)
+            # Las que ya tienen firma ya pasaron por un worker
+            if datos.get("generated_signature"):
+                datos["status"] = ESTADO_RESUELTA
+            carteras.append((wallet_id, datos))
+        except (ValueError, KeyError, IOError) as e:
+            log.warning(f"Saltando '{ruta}': {e}")
+
+    importadas = len(insertar_carteras(carteras, ruta_db))
+    log.info(f"Importadas {importadas} de {len(carteras)} carteras desde '{directorio}'.")
+
+    ruta_raiz = os.path.join(directorio, ARCHIVO_RAIZ_JSON)
+    if os.path.exists(ruta_raiz) and obtener_meta("raiz_hd", ruta_db) is None:
+        with open(ruta_raiz, 'r') as f:
+            guardar_meta("raiz_hd", json.load(f), ruta_db)
+        log.info(f"Raíz HD importada desde '{ruta_raiz}'.")
+
+    return importadas
+
+
+def importar_si_vacio(directorio=CARTERAS_DIR, ruta_db=None):
+    """Importa el directorio antiguo solo si el almacén aún no tiene carteras."""
+    if contar_carteras(ruta_db=ruta_db) == 0 and os.path.isdir(directorio):
+        log.info(f"Almacén vacío. Importando pool antiguo desde '{directorio}'...")
+        return importar_pool_json(directorio, ruta_db)
+    return 0
+
+
+if __name__ == "__main__":
+    # Uso: python almacen_carteras.py [directorio_pool_json]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    importar_pool_json(sys.argv[1] if len(sys.argv) > 1 else CARTERAS_DIR)
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib
+import statistics
+import subprocess
+import multiprocessing
+from multiprocessing import Pipe
+
+import procesos_navegador
+
+# =============================================================================
+# BENCHMARK DE ARRANQUE DE UN WORKER
+# Cada rotación y cada crash arrancan un proceso nuevo: mide cuánto tarda desde
+# Process.start() hasta tener importado lo que necesita un worker y cuánta
+# memoria ocupa, para cada disposición de módulos y método de arranque:
+#   "anterior": lo que importaba cada worker cuando toda la lógica estaba en
+#               lanzador_bots.py (pycardano, mnemonic, selenium, webdriver_manager...)
+#   "actual":   lanzador_bots + worker_bots (pycardano solo si hay que firmar)
+# Cada combinación se mide en un intérprete aparte (el servidor de forkserver
+# precarga los módulos de su variante y solo se puede configurar una vez).
+# Uso: python benchmark_arranque.py --repeticiones 10 --salida arranque.json
+# =============================================================================
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+log = logging.getLogger()
+
+REPETICIONES = 10
+# Variante -> módulos que importa un worker al arrancar
+VARIANTES = {
+    "anterior": [
+        "pycardano", "pycardano.cip.cip8", "mnemonic.mnemonic",
+        "selenium.webdriver", "selenium.webdriver.support.ui", "selenium.webdriver.support.expected_conditions",
+        "webdriver_manager.chrome",
+        "almacen_carteras", "metricas_login", "procesos_navegador", "registro_logs",
+    ],
+    "actual": ["lanzador_bots", "worker_bots"],
+}
+METODOS = ("spawn", "forkserver")
+
+
+def pss_mb(pid):
+    """PSS (MB) de un proceso: su RSS repartiendo las páginas compartidas (Linux, smaps_rollup), o None."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linea in f:
+                if linea.startswith("Pss:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def arrancar_worker(modulos, conn):
+    """Proceso medido: importa 'modulos' y envía el momento en que terminó y su memoria."""
+    for modulo in modulos:
+        importlib.import_module(modulo)
+    conn.send({"listo": time.time(), "rss_mb": procesos_navegador.rss_mb(os.getpid()), "pss_mb": pss_mb(os.getpid())})
+    conn.close()
+
+
+def arrancar_y_esperar(contexto, modulos):
+    """Arranca un worker medido y espera a que termine. Devuelve (segundos hasta listo, datos del worker)."""
+    conn_padre, conn_hijo = Pipe(duplex=False)
+    inicio = time.time()
+    proceso = contexto.Process(target=arrancar_worker, args=(modulos, conn_hijo))
+    proceso.start()
+    conn_hijo.close()
+    datos = conn_padre.recv()
+    proceso.join()
+    return datos["listo"] - inicio, datos
+
+
+def medir(variante, metodo, repeticiones) -> dict:
+    """Arranca 'repeticiones' workers de 'variante' con 'metodo', uno tras otro. Devuelve p50/máx de cada métrica."""
+    modulos = VARIANTES[variante]
+    contexto = multiprocessing.get_context(metodo)
+    servidor_segundos = None
+    if metodo == "forkserver":
+        # El servidor importa los módulos una sola vez: el primer worker espera a esa precarga
+        contexto.set_forkserver_preload(modulos)
+        servidor_segundos = round(arrancar_y_esperar(contexto, modulos)[0], 3)
+
+    segundos, rss, pss = [], [], []
+    for _ in range(repeticiones):
+        transcurrido, datos = arrancar_y_esperar(contexto, modulos)
+        segundos.append(transcurrido)
+        rss.append(datos["rss_mb"])
+        if datos["pss_mb"] is not None:
+            pss.append(datos["pss_mb"])
+
+    def resumen(muestras, decimales):
+        if not muestras:
+            return None, None
+        return round(statistics.median(muestras), decimales), round(max(muestras), decimales)
+    arranque_p50, arranque_max = resumen(segundos, 3)
+    rss_p50, _ = resumen(rss, 1)
+    pss_p50, _ = resumen(pss, 1)
+    return {
+        "variante": variante,
+        "metodo": metodo,
+        "repeticiones": repeticiones,
+        "arranque_p50_segundos": arranque_p50,
+        "arranque_max_segundos": arranque_max,
+        "rss_p50_mb": rss_p50,
+        "pss_p50_mb": pss_p50,
+        "servidor_segundos": servidor_segundos,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de arranque y memoria de un worker por disposición de módulos")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--variantes", nargs="+", choices=list(VARIANTES), default=list(VARIANTES))
+    parser.add_argument("--metodos", nargs="+", choices=METODOS, default=[m for m in METODOS if m in multiprocessing.get_all_start_methods()])
+    parser.add_argument("--salida", help="guardar los resultados en este JSON")
+    parser.add_argument("--medir", nargs=2, metavar=("VARIANTE", "METODO"), help=argparse.SUPPRESS) # Uso interno: una combinación
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.medir[0], args.medir[1], args.repeticiones)))
+        sys.exit(0)
+
+    resultados = []
+    for variante in args.variantes:
+        for metodo in args.metodos:
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--medir", variante, metodo,
+                                     "--repeticiones", str(args.repeticiones)],
+                                    capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if salida.returncode != 0:
+                log.error(f"[ARRANQUE] {variante}/{metodo} falló:\n{salida.stderr.strip()}")
+                continue
+            resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+            resultados.append(resultado)
+            log.info(f"[ARRANQUE] {variante:>8} / {metodo:<10} arranque p50 {resultado['arranque_p50_segundos']:.3f}s "
+                     f"(máx {resultado['arranque_max_segundos']:.3f}s) | RSS {resultado['rss_p50_mb']} MB | PSS {resultado['pss_p50_mb']} MB"
+                     + (f" | servidor {resultado['servidor_segundos']}s" if resultado["servidor_segundos"] is not None else ""))
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(resultados, f, indent=2)
+        log.info(f"[ARRANQUE] Resultados guardados en '{args.salida}'.")
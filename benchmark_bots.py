@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from multiprocessing import Process, Event, get_start_method
+
+import almacen_carteras
+import metricas_login
+import servidor_wizard
+import lanzador_bots
+import worker_bots
+import procesos_navegador
+import registro_logs
+
+# =============================================================================
+# BENCHMARK DE EXTREMO A EXTREMO (workers + supervisor contra servidor_wizard)
+# Arranca el wizard local, lanza N slots con el supervisor real durante un
+# tiempo fijo y mide: tiempo hasta la flota completa, latencia de login y de
+# rotación, coste del supervisor y memoria por slot (-> slots por host).
+# Con --referencia compara con un resultado anterior y sale con código 1 si
+# alguna métrica empeora más de TOLERANCIA_REGRESION.
+# Uso: python benchmark_bots.py --slots 4 --duracion 600 --salida resultado.json
+# Perfiles del navegador: --perfil completo --recursos-pesados --salida completo.json
+#                     y   --perfil ligero --recursos-pesados --referencia completo.json
+# Barrido de parámetros: --config host.toml --set supervisor.max_arranques_simultaneos=4 --salida a4.json
+# =============================================================================
+
+log = logging.getLogger()
+
+SLOTS = 4
+DURACION_SECONDS = 600
+INTERVALO_MUESTREO_SECONDS = 5   # Cada cuánto se mide la memoria del árbol de procesos
+TOLERANCIA_REGRESION = 0.15      # Empeorar más de un 15% respecto a la referencia es una regresión
+
+# Métrica del resultado -> True si "más alto es mejor"
+METRICAS_COMPARABLES = {
+    "segundos_hasta_flota_completa": False,
+    "login_p50_segundos": False,
+    "login_p90_segundos": False,
+    "rotacion_p50_segundos": False,
+    "rotacion_p90_segundos": False,
+    "supervisor_cpu_porcentaje": False,
+    "rss_por_slot_mb": False,
+    "bytes_por_slot": False,
+    "soluciones_por_hora": True,
+}
+
+
+def ejecutar_benchmark(slots, duracion, config_servidor, perfil=None) -> dict:
+    """Lanza el wizard local y 'slots' workers durante 'duracion' segundos. Devuelve el resultado."""
+    servidor, url = servidor_wizard.iniciar_en_hilo(**config_servidor)
+    # Los workers (spawn) heredan el entorno: así leen URL_ORIGEN y PERFIL_NAVEGADOR al importar worker_bots
+    os.environ["URL_ORIGEN"] = url
+    worker_bots.URL_ORIGEN = url
+    worker_bots.URL_WIZARD = url + "/wizard/mine"
+    if perfil:
+        os.environ["PERFIL_NAVEGADOR"] = perfil
+        worker_bots.PERFIL_NAVEGADOR = perfil
+    if "MANAGER_SLEEP_SECONDS" not in (lanzador_bots._ajustes or {}).get("supervisor", {}):
+        lanzador_bots.MANAGER_SLEEP_SECONDS = INTERVALO_MUESTREO_SECONDS # Despertar para muestrear la memoria
+    log.info(f"[BENCHMARK] Wizard local en {url}. {slots} slots durante {duracion}s, perfil {worker_bots.PERFIL_NAVEGADOR}.")
+
+    lanzador_bots._ruta_chromedriver = lanzador_bots.resolver_chromedriver(lanzador_bots.CHROMEDRIVER_PATH)
+    lanzador_bots._cola_logs, listener_logs = registro_logs.iniciar()
+    lanzador_bots.gestionar_pool_de_carteras(slots + lanzador_bots.MINIMO_CARTERAS_LISTAS)
+    principales = almacen_carteras.listar_ids(limite=slots)
+    for wallet_id in principales:
+        almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_EN_USO)
+
+    evento_parada = Event()
+    productor = Process(target=lanzador_bots.run_productor_carteras,
+                        args=(lanzador_bots.MINIMO_CARTERAS_LISTAS, evento_parada, lanzador_bots._ajustes))
+    productor.start()
+
+    memoria_libre_inicio = lanzador_bots.leer_memoria_libre_mb()
+    supervisor = lanzador_bots.nuevo_supervisor(principales)
+    # CPU del hilo del bucle del supervisor: sin el wizard local ni el listener de logs, que corren
+    # en otros hilos de este mismo proceso (time.process_time() los sumaría)
+    inicio, cpu_inicio = time.time(), time.thread_time()
+    flota_completa_en, rss_maximo, proximo_muestreo = None, 0.0, 0
+    try:
+        while time.time() - inicio < duracion:
+            lanzador_bots.paso_supervisor(supervisor)
+            if flota_completa_en is None and supervisor["lanzador"]["completado"]:
+                flota_completa_en = time.time() - inicio
+            if time.time() >= proximo_muestreo:
+                rss_maximo = max(rss_maximo, procesos_navegador.rss_arbol_mb() or 0)
+                proximo_muestreo = time.time() + INTERVALO_MUESTREO_SECONDS
+    finally:
+        transcurrido, cpu = time.time() - inicio, time.thread_time() - cpu_inicio
+        lanzador_bots.shutdown_all_workers(supervisor["worker_slots"])
+        lanzador_bots.detener_productor(productor, evento_parada)
+        servidor.shutdown()
+        registro_logs.detener(listener_logs)
+
+    metricas = supervisor["metricas"]
+    def percentil(paso, p):
+        muestras = metricas["pasos"].get(paso, {}).get("muestras", [])
+        return metricas_login.percentil(muestras, p)
+
+    contadores = servidor.estado["contadores"]
+    resueltos = contadores["resueltos"]
+    rss_por_slot = rss_maximo / slots if rss_maximo else None
+    return {
+        "slots": slots,
+        "perfil": worker_bots.PERFIL_NAVEGADOR,
+        "arranque": get_start_method(),
+        "ajustes": lanzador_bots._ajustes or {}, # Constantes cambiadas con --config / --set
+        "recursos_pesados": servidor.estado["recursos_pesados"],
+        "duracion_segundos": round(transcurrido, 1),
+        "segundos_hasta_flota_completa": round(flota_completa_en, 1) if flota_completa_en is not None else None,
+        "logins": metricas["pasos"].get(metricas_login.PASO_TOTAL, {}).get("total", 0),
+        "login_p50_segundos": percentil(metricas_login.PASO_TOTAL, 50),
+        "login_p90_segundos": percentil(metricas_login.PASO_TOTAL, 90),
+        "rotaciones": metricas["pasos"].get(metricas_login.PASO_ROTACION, {}).get("total", 0),
+        "rotacion_p50_segundos": percentil(metricas_login.PASO_ROTACION, 50),
+        "rotacion_p90_segundos": percentil(metricas_login.PASO_ROTACION, 90),
+        "soluciones": resueltos,
+        "soluciones_por_hora": round(resueltos * 3600 / transcurrido, 1),
+        "supervisor_cpu_porcentaje": round(100 * cpu / transcurrido, 2),
+        "supervisor_ocupado_porcentaje": round(100 * supervisor["segundos_ocupado"] / transcurrido, 2),
+        "supervisor_ciclos": supervisor["ciclos"],
+        "rss_maximo_mb": round(rss_maximo, 1) if rss_maximo else None,
+        "rss_por_slot_mb": round(rss_por_slot, 1) if rss_por_slot else None,
+        # Bytes servidos por el wizard local (página, API y recursos pesados) por slot
+        "bytes_por_slot": round(contadores["bytes_enviados"] / slots),
+        "bytes_estaticos_por_slot": round(contadores["bytes_estaticos"] / slots),
+        # Cuántos slots cabrían en este host con la memoria libre al empezar (dejando el margen del lanzador)
+        "slots_por_host_estimados": (int((memoria_libre_inicio - lanzador_bots.MEMORIA_LIBRE_MINIMA_MB) // rss_por_slot)
+                                     if memoria_libre_inicio and rss_por_slot else None),
+        "pasos_login": metricas_login.resumen(metricas),
+    }
+
+
+def comparar(resultado: dict, referencia: dict) -> list:
+    """Devuelve las regresiones (texto) de 'resultado' frente a 'referencia'."""
+    regresiones = []
+    for clave, mas_alto_es_mejor in METRICAS_COMPARABLES.items():
+        actual, anterior = resultado.get(clave), referencia.get(clave)
+        if actual is None or not anterior:
+            continue
+        cambio = (actual - anterior) / anterior
+        if (-cambio if mas_alto_es_mejor else cambio) > TOLERANCIA_REGRESION:
+            regresiones.append(f"{clave}: {anterior} -> {actual} ({cambio:+.0%})")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de workers y supervisor contra el wizard local")
+    parser.add_argument("--slots", type=int, default=SLOTS)
+    parser.add_argument("--duracion", type=int, default=DURACION_SECONDS, help="segundos de medición")
+    parser.add_argument("--solve-min", type=float, default=servidor_wizard.SOLVE_MIN_SECONDS)
+    parser.add_argument("--solve-max", type=float, default=servidor_wizard.SOLVE_MAX_SECONDS)
+    parser.add_argument("--challenge", type=int, default=servidor_wizard.CHALLENGE_SECONDS)
+    parser.add_argument("--latencia-ms", type=int, default=servidor_wizard.LATENCIA_MS)
+    parser.add_argument("--recursos-pesados", action="store_true", help="la página carga imagen, fuente, vídeo y analítica")
+    parser.add_argument("--perfil", choices=worker_bots.PERFILES_NAVEGADOR, help="perfil del navegador (por defecto, el de worker_bots)")
+    parser.add_argument("--arranque", choices=("spawn", "forkserver"), help="método de arranque de los workers (por defecto, METODO_ARRANQUE)")
+    parser.add_argument("--config", help="archivo TOML con la configuración del lanzador (ver configuracion.py)")
+    parser.add_argument("--set", dest="asignaciones", action="append", default=[], metavar="SECCION.CONSTANTE=VALOR",
+                        help="cambia una constante del lanzador (repetible; para barridos de parámetros)")
+    parser.add_argument("--directorio", help="directorio de trabajo (carteras.db, métricas); por defecto uno temporal")
+    parser.add_argument("--salida", help="guardar el resultado en este JSON")
+    parser.add_argument("--referencia", help="JSON de un resultado anterior con el que comparar")
+    args = parser.parse_args()
+
+    try:
+        lanzador_bots.cargar_configuracion(args.config, args.asignaciones)
+    except ValueError as e:
+        log.error(f"[BENCHMARK] {e}")
+        sys.exit(2)
+    lanzador_bots.configurar_arranque(args.arranque)
+    # Los workers heredan el directorio de trabajo: el benchmark nunca toca el carteras.db real
+    directorio = args.directorio or tempfile.mkdtemp(prefix="benchmark_bots_")
+    os.makedirs(directorio, exist_ok=True)
+    salida = os.path.abspath(args.salida) if args.salida else None
+    referencia = os.path.abspath(args.referencia) if args.referencia else None
+    os.chdir(directorio)
+
+    resultado = ejecutar_benchmark(args.slots, args.duracion, {
+        "solve_min": args.solve_min, "solve_max": args.solve_max,
+        "challenge_seconds": args.challenge, "latencia_ms": args.latencia_ms,
+        "recursos_pesados": args.recursos_pesados,
+    }, args.perfil)
+    log.info("[BENCHMARK] Resultado:\n" + "\n".join(f"  {k}: {v}" for k, v in resultado.items() if k != "pasos_login"))
+    log.info(f"[BENCHMARK] Latencia por paso del login:\n{resultado['pasos_login']}")
+
+    if salida:
+        with open(salida, "w") as f:
+            json.dump(resultado, f, indent=2)
+        log.info(f"[BENCHMARK] Resultado guardado en '{salida}'.")
+    if referencia:
+        with open(referencia) as f:
+            regresiones = comparar(resultado, json.load(f))
+        if regresiones:
+            log.error("[BENCHMARK] REGRESIONES respecto a la referencia:\n  " + "\n  ".join(regresiones))
+            sys.exit(1)
+        log.info("[BENCHMARK] Sin regresiones respecto a la referencia.")
@@ -1 +0,0 @@
-taskkill /im chrome.exe /f 
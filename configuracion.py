@@ -0,0 +1,200 @@
+import difflib
+
+try:
+    import tomllib
+except ImportError: # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# =============================================================================
+# CONFIGURACIÓN DEL LANZADOR (archivo TOML + línea de comandos)
+# Los parámetros siguen siendo las constantes de cada módulo (su valor es el
+# valor por defecto). Un archivo TOML o --set SECCION.CONSTANTE=VALOR los
+# cambian al arrancar, sin editar el código. Cada sección corresponde a un
+# módulo (ver modulos_configurables() en lanzador_bots y worker_bots):
+#
+#   slots = 8
+#   [supervisor]                 # lanzador_bots.py
+#   manager_sleep_seconds = 30
+#   [worker]                     # worker_bots.py
+#   monitor_poll_seconds = 15
+#
+# Los procesos hijos vuelven a importar los módulos con los valores por
+# defecto: el supervisor les pasa los ajustes y cada uno los aplica al empezar.
+# Un módulo con constantes derivadas define HOOK_AJUSTES (una función que recibe
+# los valores aplicados) para recalcularlas.
+# =============================================================================
+
+CLAVES_GENERALES = {"slots": int} # Claves del TOML fuera de las secciones
+
+# Constantes que no se pueden cambiar desde la configuración (códigos de salida, valores derivados)
+NO_CONFIGURABLES = {"EXIT_CODE_SOLVED", "EXIT_CODE_ERROR", "URL_WIZARD", "NETWORK", "PAYMENT_DERIVATION_PATH",
+                    "STAKE_DERIVATION_PATH", "ESTADO_NUEVA", "ESTADO_EN_USO", "ESTADO_RESUELTA",
+                    "ESTADO_CUARENTENA", "PASO_TOTAL", "PASO_ROTACION", "VERSION_ESTADO"}
+# Tipo de las constantes cuyo valor por defecto es None
+TIPOS_OPCIONALES = {"MAX_SLOTS_AUTOESCALADO": int, "CHROMEDRIVER_PATH": str}
+# Valores permitidos de las constantes de texto que eligen un modo
+OPCIONES = {
+    "PERFIL_NAVEGADOR": ("ligero", "completo"),
+    "METODO_ARRANQUE": ("spawn", "forkserver"),
+    "MODO_GENERACION": ("mnemonic", "raiz"),
+    "INDICE_DERIVACION": ("account", "address"),
+}
+# Mínimo de las constantes numéricas que no pueden ser 0 (el resto solo tiene que ser >= 0)
+MINIMOS = {
+    "CARTERAS_POR_NAVEGADOR": 1, "MAX_ARRANQUES_SIMULTANEOS": 1, "MAX_REINICIOS_SIMULTANEOS": 1,
+    "PROCESOS_GENERACION": 1, "PROCESOS_PRODUCTOR": 1, "MIN_SLOTS_AUTOESCALADO": 1, "MAX_SLOTS_AUTOESCALADO": 1,
+    "MANAGER_SLEEP_SECONDS": 0.1, "MONITOR_POLL_SECONDS": 1, "INTERVALO_VIGILANCIA_SECONDS": 1,
+    "INTERVALO_ALERTA_SECONDS": 1, "SONDEO_ESTADOS_SECONDS": 0.01, "TIMEOUT_WIZARD_SECONDS": 1, "TIMEOUT_INICIO_SESION_SECONDS": 1,
+    "REGISTROS_POR_SLOT": 1, "CARGA_CPU_MAXIMA": 0.01, "CARGA_CPU_OBJETIVO": 0.01,
+}
+MAXIMOS = {"BACKOFF_JITTER": 0.99}
+SUFIJO_DURACION = "_SECONDS" # Las duraciones admiten int o float aunque su valor por defecto sea entero
+HOOK_AJUSTES = "ajustes_aplicados" # Función opcional de un módulo: se llama tras fijar sus constantes
+
+
+def constantes(modulo) -> dict:
+    """Constantes configurables de un módulo (nombre -> valor actual): MAYÚSCULAS y valor escalar."""
+    return {nombre: valor for nombre, valor in vars(modulo).items()
+            if nombre.isupper() and not nombre.startswith(("_", "SCRIPT_")) and nombre not in NO_CONFIGURABLES
+            and (valor is None or isinstance(valor, (bool, int, float, str)))}
+
+
+def cargar_toml(ruta) -> dict:
+    """Lee el archivo de configuración. Lanza ValueError si no se puede leer o no es TOML válido."""
+    if tomllib is None:
+        raise ValueError("leer TOML necesita Python 3.11+ o el paquete 'tomli' (pip install tomli)")
+    try:
+        with open(ruta, "rb") as f:
+            return tomllib.load(f)
+    except OSError as e:
+        raise ValueError(f"no se pudo leer '{ruta}': {e}")
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(f"'{ruta}' no es TOML válido: {e}")
+
+
+def parsear_asignacion(texto) -> dict:
+    """
+    'seccion.CONSTANTE=valor' (o 'slots=8') -> dict con la misma forma que el TOML.
+    El valor se interpreta como TOML (30, 0.5, true, "texto"); si no lo es, como texto.
+    """
+    clave, separador, valor = texto.partition("=")
+    if not separador or not clave.strip():
+        raise ValueError(f"'{texto}' no tiene la forma SECCION.CONSTANTE=VALOR")
+    try:
+        valor = tomllib.loads(f"v = {valor.strip()}")["v"] if tomllib else valor.strip()
+    except tomllib.TOMLDecodeError:
+        valor = valor.strip()
+    seccion, _, nombre = clave.strip().rpartition(".")
+    return {seccion: {nombre: valor}} if seccion else {nombre: valor}
+
+
+def combinar(base: dict, extra: dict) -> dict:
+    """Une dos configuraciones (las claves de 'extra' ganan), sección por sección."""
+    resultado = {clave: dict(valor) if isinstance(valor, dict) else valor for clave, valor in base.items()}
+    for clave, valor in extra.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(clave), dict):
+            resultado[clave].update(valor)
+        else:
+            resultado[clave] = valor
+    return resultado
+
+
+def _validar_valor(nombre, valor, actual):
+    """Devuelve el valor convertido al tipo de la constante. Lanza ValueError si no vale."""
+    tipo = TIPOS_OPCIONALES.get(nombre, type(valor)) if actual is None else type(actual)
+    if tipo is float and isinstance(valor, int) and not isinstance(valor, bool):
+        valor = float(valor)
+    if nombre.endswith(SUFIJO_DURACION) and tipo is int and type(valor) is float:
+        tipo = float # p. ej. MANAGER_SLEEP_SECONDS = 60 admite 0.5
+    if type(valor) is not tipo:
+        raise ValueError(f"debe ser {tipo.__name__}, no {type(valor).__name__} ({valor!r})")
+    if nombre in OPCIONES and valor not in OPCIONES[nombre]:
+        raise ValueError(f"debe ser uno de {OPCIONES[nombre]} ({valor!r})")
+    if tipo in (int, float):
+        if valor < MINIMOS.get(nombre, 0):
+            raise ValueError(f"debe ser >= {MINIMOS.get(nombre, 0)} ({valor})")
+        if nombre in MAXIMOS and valor > MAXIMOS[nombre]:
+            raise ValueError(f"debe ser <= {MAXIMOS[nombre]} ({valor})")
+    return valor
+
+
+def validar(config: dict, modulos: dict):
+    """
+    Comprueba 'config' (TOML + --set) contra las constantes de 'modulos'
+    (sección -> módulo). Devuelve (generales, ajustes): las claves generales
+    (slots) y {seccion: {CONSTANTE: valor}} con los nombres en mayúsculas y
+    los tipos de cada constante. Lanza ValueError con todos los errores.
+    """
+    errores, generales, ajustes = [], {}, {}
+    for seccion, contenido in config.items():
+        if not isinstance(contenido, dict):
+            if seccion not in CLAVES_GENERALES:
+                errores.append(f"'{seccion}': clave desconocida (generales: {', '.join(CLAVES_GENERALES)}; secciones: {', '.join(modulos)})")
+            elif type(contenido) is not CLAVES_GENERALES[seccion] or contenido < 1:
+                errores.append(f"'{seccion}': debe ser un {CLAVES_GENERALES[seccion].__name__} positivo ({contenido!r})")
+            else:
+                generales[seccion] = contenido
+            continue
+        if seccion not in modulos:
+            errores.append(f"[{seccion}]: sección desconocida (válidas: {', '.join(modulos)})")
+            continue
+        disponibles = constantes(modulos[seccion])
+        for clave, valor in contenido.items():
+            nombre = clave.upper()
+            if nombre not in disponibles:
+                parecidas = difflib.get_close_matches(nombre, disponibles, n=1)
+                errores.append(f"{seccion}.{clave}: no existe" + (f" (¿{parecidas[0]}?)" if parecidas else ""))
+                continue
+            try:
+                ajustes.setdefault(seccion, {})[nombre] = _validar_valor(nombre, valor, disponibles[nombre])
+            except ValueError as e:
+                errores.append(f"{seccion}.{clave}: {e}")
+    if errores:
+        raise ValueError("configuración no válida:\n  " + "\n  ".join(errores))
+    return generales, ajustes
+
+
+def aplicar(ajustes: dict, modulos: dict):
+    """
+    Fija las constantes de 'ajustes' en los módulos de 'modulos' (las secciones que
+    no estén se ignoran) y llama al HOOK_AJUSTES de cada módulo que lo defina.
+    """
+    for seccion, valores in (ajustes or {}).items():
+        modulo = modulos.get(seccion)
+        if modulo is None:
+            continue
+        for nombre, valor in valores.items():
+            setattr(modulo, nombre, valor)
+        hook = getattr(modulo, HOOK_AJUSTES, None)
+        if callable(hook):
+            hook(valores)
+
+
+def efectiva(modulos: dict) -> dict:
+    """Configuración en uso: {seccion: {CONSTANTE: valor}} de todos los módulos."""
+    return {seccion: constantes(modulo) for seccion, modulo in modulos.items()}
+
+
+def a_toml(config: dict, generales: dict = None) -> str:
+    """Texto TOML de una configuración (las constantes a None se dejan comentadas)."""
+    def literal(valor):
+        if isinstance(valor, bool):
+            return "true" if valor else "false"
+        if isinstance(valor, str):
+            return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        return repr(valor)
+    lineas = [f"{clave} = {literal(valor)}" for clave, valor in (generales or {}).items()]
+    for seccion, valores in config.items():
+        lineas += ["", f"[{seccion}]"]
+        lineas += [f"# {nombre.lower()} =" if valor is None else f"{nombre.lower()} = {literal(valor)}"
+                   for nombre, valor in valores.items()]
+    return "\n".join(lineas).lstrip("\n") + "\n"
+
+
+def resumen_cambios(ajustes: dict) -> str:
+    """'seccion.CONSTANTE=valor, ...' de los ajustes, o 'ninguno'."""
+    cambios = [f"{seccion}.{nombre}={valor!r}" for seccion, valores in ajustes.items() for nombre, valor in valores.items()]
+    return ", ".join(cambios) or "ninguno"
@@ -1,40 +1,45 @@
 import os
 import json
+import math
 import time
 import sys
-from multiprocessing import Process, set_start_method, Queue
+import random
+import statistics
+from multiprocessing import Process, set_start_method, set_forkserver_preload, get_all_start_methods, Queue, Pool, Event, Pipe
+from multiprocessing.connection import wait as esperar_eventos
 import traceback
 import logging
+import argparse
 import subprocess
 from queue import Empty 
 
-# --- Dependencias de Cardano ---
-from pycardano import (
-    Address, 
-    Network, 
-    PaymentSigningKey, 
-    PaymentVerificationKey,
-    StakeSigningKey,         
-    StakeVerificationKey,    
-    HDWallet 
+# --- Dependencias de Cardano y de webdriver_manager ---
+# Se importan dentro de las funciones que las usan (generación de carteras,
+# pre-firma, resolver_chromedriver): los workers arrancan con 'spawn' y vuelven
+# a importar este módulo, y solo pycardano tarda unos 2.5 s en importarse.
+
+# --- Lógica del worker (navegador + login + monitoreo) ---
+import worker_bots
+from worker_bots import (
+    EXIT_CODE_SOLVED,
+    PERFILES_NAVEGADOR,
+    firmar_mensaje_cip8,
+    clave_de_pago,
+    run_bot_worker,
+    run_browser_worker,
+    run_multi_browser_worker,
 )
-# Importar Mnemonic desde su propia librería (Correcto para tu entorno)
-from mnemonic.mnemonic import Mnemonic
-# Importamos las funciones CIP-8
-from pycardano.cip import cip8
-# Importamos Keys para simular teclas
-from selenium.webdriver.common.keys import Keys 
-# --- Fin Dependencias Cardano ---
-
-# --- Dependencias de Selenium ---
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+
+# --- Almacén de carteras (SQLite) ---
+import almacen_carteras
+# --- Métricas de latencia del login ---
+import metricas_login
+# --- Árbol de procesos (chromedriver + Chrome) de cada worker ---
+import procesos_navegador
+# --- Logs de los workers por una cola hacia el supervisor ---
+import registro_logs
+# --- Configuración (TOML / línea de comandos) ---
+import configuracion
 
 # --- Configuración de Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
@@ -45,85 +50,224 @@ log = logging.getLogger()
 # SECCIÓN 1: GESTOR DE CARTERAS (Sin cambios)
 # =============================================================================
 
-CARTERAS_DIR = "pool_de_carteras"
-NETWORK = Network.MAINNET
+NETWORK = "MAINNET" # Miembro de pycardano.Network
 PAYMENT_DERIVATION_PATH = "m/1852'/1815'/0'/0/0"
 STAKE_DERIVATION_PATH = "m/1852'/1815'/0'/2/0"
+PROCESOS_GENERACION = os.cpu_count() or 1 # Procesos para generar carteras en paralelo (1 = modo secuencial)
+
+# --- MODO DE GENERACIÓN ---
+# "mnemonic": una frase semilla nueva por cartera (por defecto).
+# "raiz": una única raíz HD (guardada en el almacén) y cada cartera se deriva por índice.
+MODO_GENERACION = "mnemonic"
+# En modo "raiz": "account" deriva m/1852'/1815'/i'/0/0, "address" deriva m/1852'/1815'/0'/0/i
+INDICE_DERIVACION = "account"
+
+# --- PRE-GENERACIÓN EN SEGUNDO PLANO ---
+MINIMO_CARTERAS_LISTAS = 5       # Nivel mínimo de carteras NUEVAS que el productor mantiene listas
+PRODUCTOR_SLEEP_SECONDS = 5      # Cada cuánto comprueba el productor el nivel de carteras listas
+PROCESOS_PRODUCTOR = 1           # Procesos de generación del productor (1 = no compite con los navegadores)
+PRODUCTOR_NICE = 10              # Prioridad más baja para el productor (solo POSIX)
+
+# --- CACHÉ DE FIRMAS ---
+# Antes de lanzar, firmar en paralelo el último texto de términos visto para todas las
+# carteras NUEVAS y EN_USO que no lo tengan en la caché (el login las reutiliza).
+PREFIRMAR_AL_ARRANCAR = True
 
+# Raíz HD del proceso actual en modo "raiz": (seed_phrase, root_key). Ver _inicializar_raiz_generacion.
+_raiz_generacion = None
+
+
+def _derivar_cartera(root_key, payment_path, stake_path):
+    """
+    Deriva las claves de Pago y Staking de 'root_key' y construye la Base Address.
+    (Utiliza el slicing de xprivate_key para compatibilidad con tu pycardano)
+    """
+    from pycardano import Address, Network, PaymentSigningKey, PaymentVerificationKey, StakeSigningKey, StakeVerificationKey
+
+    # --- CLAVES DE PAGO (PARA CIP-8) ---
+    payment_derived_key = root_key.derive_from_path(payment_path)
+    # ¡IMPORTANTE!: Tu corrección descubierta: usar .xprivate_key y el slicing [0:32]
+    payment_private_key_seed_32 = payment_derived_key.xprivate_key[0:32]
+    payment_signing_key = PaymentSigningKey(payment_private_key_seed_32)
+    payment_verification_key = PaymentVerificationKey.from_signing_key(payment_signing_key)
+
+    # --- CLAVES DE STAKING (Para la dirección) ---
+    stake_derived_key = root_key.derive_from_path(stake_path)
+    stake_private_key_seed_32 = stake_derived_key.xprivate_key[0:32]
+    stake_verification_key = StakeVerificationKey.from_signing_key(StakeSigningKey(stake_private_key_seed_32))
+
+    # --- Clave pública de PAGO (64 chars) ---
+    public_key_hex = payment_verification_key.payload.hex()
+    log.debug(f"Clave pública (Payment Key Payload) generada: {public_key_hex[:10]}... (len: {len(public_key_hex)})")
+
+    # --- Dirección Base (pago + staking) ---
+    address = Address(
+        payment_part=payment_verification_key.hash(),
+        staking_part=stake_verification_key.hash(),
+        network=Network[NETWORK]
+    )
+
+    return {
+        "address": str(address),
+        "public_key_hex": public_key_hex, # Clave PÚBLICA de Pago (para el campo "Public key")
+        "payment_private_key_hex": payment_private_key_seed_32.hex(), # Clave PRIVADA de Pago (para la firma CIP-8)
+        "stake_private_key_hex": stake_private_key_seed_32.hex() # Clave PRIVADA de Staking (guardada por seguridad)
+    }
+
+def _mnemonic():
+    """Generador BIP39 en inglés (mnemonic se importa solo al generar carteras)."""
+    from mnemonic.mnemonic import Mnemonic
+    return Mnemonic("english")
+
+def _raiz_desde_frase(seed_phrase):
+    """Convierte la frase semilla en la clave raíz HDWallet (PBKDF2 de 2048 rondas)."""
+    from pycardano import HDWallet
+    seed_bytes = _mnemonic().to_seed(seed_phrase)
+    return HDWallet.from_seed(seed_bytes.hex())
 
 def generar_nueva_cartera():
     """
     Genera la Base Address y obtiene las claves de Pago y Staking.
-    (Utiliza el slicing de xprivate_key para compatibilidad con tu pycardano)
+    Cada cartera tiene su propia frase semilla de 24 palabras.
     """
     log.info("Iniciando generación de nueva cartera (Base Address)...")
     try:
         # 1. Genera la frase semilla
-        mnemo_lib = Mnemonic("english")
-        seed_phrase = mnemo_lib.generate(strength=256)
+        seed_phrase = _mnemonic().generate(strength=256)
 
-        # 2. Convierte la frase en semilla BIP39 (64 bytes) -> HEX
-        seed_bytes = mnemo_lib.to_seed(seed_phrase)
-        seed_hex_string = seed_bytes.hex()
-        root_key = HDWallet.from_seed(seed_hex_string)
+        # 2. Convierte la frase en semilla BIP39 (64 bytes) -> Clave raíz
+        root_key = _raiz_desde_frase(seed_phrase)
         log.debug("Clave raíz HDWallet creada.")
 
-        # --- 3. CLAVES DE PAGO (PARA CIP-8) ---
-        payment_derived_key = root_key.derive_from_path(PAYMENT_DERIVATION_PATH)
-        # ¡IMPORTANTE!: Tu corrección descubierta: usar .xprivate_key y el slicing [0:32]
-        payment_private_key_seed_32 = payment_derived_key.xprivate_key[0:32]
-        payment_signing_key = PaymentSigningKey(payment_private_key_seed_32)
-        payment_verification_key = PaymentVerificationKey.from_signing_key(payment_signing_key)
-
-        # --- 4. CLAVES DE STAKING (Para la dirección) ---
-        stake_derived_key = root_key.derive_from_path(STAKE_DERIVATION_PATH)
-        stake_private_key_seed_32 = stake_derived_key.xprivate_key[0:32]
-        stake_verification_key = StakeVerificationKey.from_signing_key(StakeSigningKey(stake_private_key_seed_32))
-
-        # --- 5. Clave pública de PAGO (64 chars) ---
-        public_key_hex = payment_verification_key.payload.hex()
-        log.debug(f"Clave pública (Payment Key Payload) generada: {public_key_hex[:10]}... (len: {len(public_key_hex)})")
-
-        # --- 6. Dirección Base (pago + staking) ---
-        address = Address(
-            payment_part=payment_verification_key.hash(),
-            staking_part=stake_verification_key.hash(),
-            network=NETWORK
-        )
-        
-        log.info(f"Cartera (Base Address) generada: {str(address)[:20]}...")
-
-        return {
-            "seed_phrase": seed_phrase, 
-            "address": str(address),
-            "public_key_hex": public_key_hex, # Clave PÚBLICA de Pago (para el campo "Public key")
-            "payment_private_key_hex": payment_private_key_seed_32.hex(), # Clave PRIVADA de Pago (para la firma CIP-8)
-            "stake_private_key_hex": stake_private_key_seed_32.hex() # Clave PRIVADA de Staking (guardada por seguridad)
-        }
+        # 3. Deriva claves y dirección
+        cartera = {"seed_phrase": seed_phrase}
+        cartera.update(_derivar_cartera(root_key, PAYMENT_DERIVATION_PATH, STAKE_DERIVATION_PATH))
+
+        log.info(f"Cartera (Base Address) generada: {cartera['address'][:20]}...")
+        return cartera
     except Exception as e:
         log.error(f"Error generando cartera: {e}")
         traceback.print_exc()
         return None
 
-def guardar_cartera(wallet_data, filepath):
-    """Guarda los datos de la cartera en un archivo JSON."""
+def rutas_derivacion(indice):
+    """Devuelve (payment_path, stake_path) para el índice 'indice' según INDICE_DERIVACION."""
+    if INDICE_DERIVACION == "address":
+        return f"m/1852'/1815'/0'/0/{indice}", f"m/1852'/1815'/0'/2/{indice}"
+    return f"m/1852'/1815'/{indice}'/0/0", f"m/1852'/1815'/{indice}'/2/0"
+
+def generar_cartera_derivada(root_key, seed_phrase, indice):
+    """
+    Deriva la cartera número 'indice' de una raíz HD ya construida.
+    Solo cuesta las derivaciones: el PBKDF2 de la raíz se paga una vez.
+    """
     try:
-        with open(filepath, 'w') as f:
-            json.dump(wallet_data, f, indent=4)
-        return True
-    except IOError as e:
-        log.error(f"Error guardando archivo {filepath}: {e}")
-        return False
+        payment_path, stake_path = rutas_derivacion(indice)
+        cartera = {"seed_phrase": seed_phrase}
+        cartera.update(_derivar_cartera(root_key, payment_path, stake_path))
+        cartera["derivation_index"] = indice
+        cartera["payment_derivation_path"] = payment_path
+        cartera["stake_derivation_path"] = stake_path
+
+        log.info(f"Cartera derivada (índice {indice}) generada: {cartera['address'][:20]}...")
+        return cartera
+    except Exception as e:
+        log.error(f"Error derivando cartera con índice {indice}: {e}")
+        traceback.print_exc()
+        return None
 
-def gestionar_pool_de_carteras(cantidad_deseada):
-    """Asegura que el número deseado de carteras exista."""
-    log.info("Iniciando gestión de pool de carteras...")
-    if not os.path.exists(CARTERAS_DIR):
-        log.info(f"Creando directorio '{CARTERAS_DIR}'...")
-        os.makedirs(CARTERAS_DIR)
+def cargar_o_crear_raiz():
+    """Devuelve la frase semilla raíz guardada en el almacén, creándola la primera vez."""
+    raiz = almacen_carteras.obtener_meta("raiz_hd")
+    if raiz:
+        if raiz.get("index_mode", INDICE_DERIVACION) != INDICE_DERIVACION:
+            log.warning(f"La raíz HD se creó con índice '{raiz['index_mode']}' pero INDICE_DERIVACION es '{INDICE_DERIVACION}'.")
+        return raiz["seed_phrase"]
+
+    log.info(f"Creando nueva raíz HD en '{almacen_carteras.ALMACEN_DB}'...")
+    seed_phrase = _mnemonic().generate(strength=256)
+    almacen_carteras.guardar_meta("raiz_hd", {"seed_phrase": seed_phrase, "index_mode": INDICE_DERIVACION})
+    return seed_phrase
+
+def _inicializar_raiz_generacion(seed_phrase, ajustes=None):
+    """
+    Construye la raíz HD una sola vez por proceso (initializer del Pool, que
+    también aplica la configuración del supervisor con 'ajustes').
+    Con seed_phrase=None se vuelve al modo de una frase por cartera.
+    """
+    global _raiz_generacion
+    if ajustes:
+        aplicar_ajustes(ajustes)
+    _raiz_generacion = (seed_phrase, _raiz_desde_frase(seed_phrase)) if seed_phrase else None
 
-    archivos_existentes = [f for f in os.listdir(CARTERAS_DIR) if f.startswith('wallet_') and f.endswith('.json')]
-    cantidad_existente = len(archivos_existentes)
+def _generar_cartera_con_id(nuevo_id):
+    """
+    Tarea de un proceso del pool de generación: crea la cartera 'nuevo_id'.
+    Devuelve (nuevo_id, datos o None); el proceso padre la guarda en el almacén.
+    """
+    if _raiz_generacion:
+        # Modo "raiz": wallet_N usa el índice N-1 (wallet_1 = cuenta 0)
+        seed_phrase, root_key = _raiz_generacion
+        return nuevo_id, generar_cartera_derivada(root_key, seed_phrase, nuevo_id - 1)
+    return nuevo_id, generar_nueva_cartera()
+
+def _guardar_carteras(generadas):
+    """
+    Guarda en el almacén las (id, datos) generadas y devuelve los IDs que no se
+    pudieron guardar (fallo al generar, error del almacén o fila ignorada por un ID
+    o una dirección que ya existían).
+    """
+    validas = [(i, c) for i, c in generadas if c]
+    fallidos = [i for i, c in generadas if not c]
+    try:
+        insertadas = set(almacen_carteras.insertar_carteras(validas))
+    except Exception as e:
+        log.error(f"Error guardando {len(validas)} carteras en el almacén: {e}")
+        return fallidos + [i for i, _ in validas]
+    ignoradas = [i for i, _ in validas if i not in insertadas]
+    if ignoradas:
+        log.warning(f"El almacén ya tenía {len(ignoradas)} de estas carteras (ID o dirección repetidos): "
+                    + ", ".join(f"wallet_{i}" for i in ignoradas))
+    return fallidos + ignoradas
+
+def _generar_carteras_en_paralelo(ids_a_crear, num_procesos, seed_phrase_raiz=None):
+    """
+    Reparte la generación de 'ids_a_crear' entre 'num_procesos' procesos.
+    Los IDs se asignan antes de repartir el trabajo, así que el resultado es
+    el mismo que en modo secuencial. Devuelve la lista de IDs que fallaron.
+    Con 'seed_phrase_raiz' cada proceso construye la raíz HD una vez y deriva por índice.
+    """
+    total = len(ids_a_crear)
+    paso_progreso = max(1, total // 10) # Informar (y guardar en bloque) cada ~10%
+    fallidos = []
+    pendientes_de_guardar = []
+    completadas = 0
+    inicio = time.time()
+
+    log.info(f"Generando {total} carteras con {num_procesos} procesos en paralelo...")
+    with Pool(processes=num_procesos, initializer=_inicializar_raiz_generacion, initargs=(seed_phrase_raiz, _ajustes)) as pool:
+        for nuevo_id, cartera in pool.imap_unordered(_generar_cartera_con_id, ids_a_crear):
+            completadas += 1
+            pendientes_de_guardar.append((nuevo_id, cartera))
+            if completadas % paso_progreso == 0 or completadas == total:
+                fallidos += _guardar_carteras(pendientes_de_guardar)
+                pendientes_de_guardar = []
+                transcurrido = max(time.time() - inicio, 1e-6)
+                log.info(f"Progreso: {completadas}/{total} carteras ({completadas / transcurrido:.2f} carteras/s)")
+
+    return sorted(fallidos)
+
+def gestionar_pool_de_carteras(cantidad_deseada, num_procesos=None, modo=None):
+    """
+    Asegura que el número deseado de carteras exista.
+    Si 'num_procesos' > 1 la generación se reparte entre varios procesos
+    (por defecto PROCESOS_GENERACION). Los IDs nuevos se reservan de una vez
+    (almacen_carteras.reservar_ids), así que son contiguos y no chocan con los
+    de otro proceso que esté generando a la vez.
+    'modo' es "mnemonic" o "raiz" (por defecto MODO_GENERACION).
+    """
+    log.info("Iniciando gestión de pool de carteras...")
+    cantidad_existente = almacen_carteras.contar_carteras()
     
     carteras_a_crear = cantidad_deseada - cantidad_existente
 
@@ -131,380 +275,592 @@ def gestionar_pool_de_carteras(cantidad_deseada):
         log.info(f"Ya existen {cantidad_existente} carteras. No se crearán nuevas.")
         return
 
+    if num_procesos is None:
+        num_procesos = PROCESOS_GENERACION
+    num_procesos = max(1, min(num_procesos, carteras_a_crear))
+
+    seed_phrase_raiz = None
+    if (modo or MODO_GENERACION) == "raiz":
+        seed_phrase_raiz = cargar_o_crear_raiz()
+        log.info(f"Modo raíz HD: las carteras se derivan por índice '{INDICE_DERIVACION}'.")
+
     log.info(f"Se crearán {carteras_a_crear} carteras nuevas.")
-    for i in range(carteras_a_crear):
-        nuevo_id = cantidad_existente + i + 1
-        filepath = os.path.join(CARTERAS_DIR, f"wallet_{nuevo_id}.json")
-        
-        log.info(f"Generando wallet_{nuevo_id}...")
-        nueva_cartera = generar_nueva_cartera()
-        
-        if nueva_cartera and guardar_cartera(nueva_cartera, filepath):
-            log.info(f"Éxito: Cartera {nuevo_id} guardada.")
-        else:
-            log.warning(f"Fallo: No se pudo crear o guardar la cartera {nuevo_id}.")
-            
+    primer_id = almacen_carteras.reservar_ids(carteras_a_crear)
+    ids_a_crear = list(range(primer_id, primer_id + carteras_a_crear))
+    inicio = time.time()
+
+    fallidos = []
+    if num_procesos > 1:
+        fallidos = _generar_carteras_en_paralelo(ids_a_crear, num_procesos, seed_phrase_raiz)
+        ids_secuenciales = fallidos # Reintento secuencial de los fallos para no dejar huecos en los IDs
+    else:
+        ids_secuenciales = ids_a_crear
+
+    if ids_secuenciales:
+        fallidos = []
+        _inicializar_raiz_generacion(seed_phrase_raiz)
+        try:
+            for nuevo_id in ids_secuenciales:
+                log.info(f"Generando wallet_{nuevo_id}...")
+                exito = not _guardar_carteras([_generar_cartera_con_id(nuevo_id)])
+                
+                if exito:
+                    log.info(f"Éxito: Cartera {nuevo_id} guardada.")
+                else:
+                    fallidos.append(nuevo_id)
+                    log.warning(f"Fallo: No se pudo crear o guardar la cartera {nuevo_id}.")
+        finally:
+            _inicializar_raiz_generacion(None)
+
+    creadas = carteras_a_crear - len(fallidos)
+    transcurrido = max(time.time() - inicio, 1e-6)
+    log.info(f"{creadas} de {carteras_a_crear} carteras creadas en {transcurrido:.1f}s ({creadas / transcurrido:.2f} carteras/s).")
     log.info("Gestión de pool de carteras completada.\n")
 
+def run_productor_carteras(minimo_listas: int, evento_parada, ajustes=None):
+    """
+    Proceso productor: mantiene al menos 'minimo_listas' carteras NUEVAS (nunca usadas)
+    en el almacén para que la rotación del supervisor nunca tenga que generarlas.
+    Termina cuando se activa 'evento_parada'. 'ajustes': configuración del supervisor.
+    """
+    aplicar_ajustes(ajustes)
+    if hasattr(os, "nice"):
+        os.nice(PRODUCTOR_NICE)
+    log.info(f"[PRODUCTOR] Iniciado. Manteniendo {minimo_listas} carteras listas.")
 
-# =============================================================================
-# SECCIÓN 2: LÓGICA DEL BOT (WORKER) - (REESCRITO PARA REPORTAR ESTADO)
-# =============================================================================
+    while not evento_parada.is_set():
+        try:
+            listas = almacen_carteras.contar_carteras(almacen_carteras.ESTADO_NUEVA)
+            if listas < minimo_listas:
+                faltan = minimo_listas - listas
+                log.info(f"[PRODUCTOR] {listas}/{minimo_listas} carteras listas. Generando {faltan}...")
+                gestionar_pool_de_carteras(almacen_carteras.contar_carteras() + faltan, num_procesos=PROCESOS_PRODUCTOR)
+                continue # Volver a comprobar sin esperar
+        except Exception as e:
+            log.error(f"[PRODUCTOR] Error generando carteras: {e}")
+            traceback.print_exc()
+        evento_parada.wait(PRODUCTOR_SLEEP_SECONDS)
 
-# Código de Salida Especial para "Challenge Resuelto"
-EXIT_CODE_SOLVED = 0
+    log.info("[PRODUCTOR] Detenido.")
 
-# --- ¡FUNCIÓN DE FIRMA CIP-8! ---
-def firmar_mensaje_cip8(payment_signing_key: PaymentSigningKey, message_str: str) -> str:
+def obtener_cartera_de_rotacion():
     """
-    Firma un mensaje usando el estándar CIP-8 con la Payment Signing Key.
+    Devuelve el ID de una cartera NUEVA ya lista (O(1) si el productor va al día).
+    Si el productor se ha quedado atrás, genera una de forma síncrona como último recurso.
     """
-    try:
-        signed_message_hex = cip8.sign(
-            message=message_str,
-            signing_key=payment_signing_key, # USAMOS LA CLAVE DE PAGO
-            attach_cose_key=False # Usamos False porque pegaremos la Public Key por separado
-        )
-        return signed_message_hex
-    except Exception as e:
-        log.error(f"Error al firmar el mensaje CIP-8: {e}")
-        return ""
-# --- FIN DE FUNCIÓN AÑADIDA ---
-
-def parse_timer_to_seconds(timer_str: str) -> int:
+    wallet_id = almacen_carteras.reservar_cartera_nueva()
+    while wallet_id is None:
+        log.warning("No hay carteras listas (el productor va retrasado). Generando una de forma síncrona...")
+        gestionar_pool_de_carteras(almacen_carteras.contar_carteras() + 1, num_procesos=1)
+        wallet_id = almacen_carteras.reservar_cartera_nueva()
+    return wallet_id
+
+def _firmar_para_cache(tarea):
+    """Worker del pool de pre-firma: (address, payment_private_key_hex, mensaje) -> (address, firma)."""
+    address, private_key_hex, mensaje = tarea
+    return address, firmar_mensaje_cip8(clave_de_pago(private_key_hex), mensaje)
+
+def prefirmar_carteras(mensaje=None, num_procesos=None):
     """
-    Convierte un string de tiempo 'dd:hh:mm:ss' en segundos totales.
+    Firma 'mensaje' (por defecto, el último texto de términos visto por un worker)
+    para todas las carteras NUEVAS y EN_USO que aún no lo tengan en la caché,
+    repartiendo el trabajo entre procesos. Devuelve cuántas firmas se guardaron.
     """
-    try:
-        parts = timer_str.split(':')
-        if len(parts) != 4:
-            return 99999 # Valor alto por defecto en caso de error de parseo
-        
-        days = int(parts[0])
-        hours = int(parts[1])
-        minutes = int(parts[2])
-        seconds = int(parts[3])
-        
-        total_seconds = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
-        return total_seconds
-    except ValueError:
-        return 99999 # Valor alto si el parseo falla
+    mensaje = mensaje or almacen_carteras.texto_terminos_actual()
+    if not mensaje:
+        log.info("Aún no se conoce el texto de los términos: no hay nada que pre-firmar.")
+        return 0
+    pendientes = almacen_carteras.carteras_sin_firma_cache(mensaje)
+    if not pendientes:
+        log.info("Caché de firmas al día para todo el pool.")
+        return 0
+
+    num_procesos = max(1, min(num_procesos or PROCESOS_GENERACION, len(pendientes)))
+    log.info(f"Pre-firmando el texto de los términos para {len(pendientes)} carteras con {num_procesos} procesos...")
+    inicio = time.time()
+    tareas = [(address, private_key_hex, mensaje) for address, private_key_hex in pendientes]
+    if num_procesos == 1:
+        firmas = [_firmar_para_cache(tarea) for tarea in tareas]
+    else:
+        with Pool(processes=num_procesos) as pool:
+            firmas = list(pool.imap_unordered(_firmar_para_cache, tareas, chunksize=64))
+    firmas = [(address, firma) for address, firma in firmas if firma] # firmar_mensaje_cip8 devuelve "" si falla
+    guardadas = almacen_carteras.guardar_firmas_cache(firmas, mensaje)
+    log.info(f"Pre-firmadas {guardadas} carteras en {time.time() - inicio:.1f}s.")
+    return guardadas
+
+
+# =============================================================================
+# SECCIÓN 2: LÓGICA DEL BOT (WORKER) -> worker_bots.py
+# =============================================================================
 
+# =============================================================================
+# SECCIÓN 3: SUPERVISOR DE WORKERS (REINICIO ESCALONADO POR SLOT)
+# =============================================================================
 
-def run_bot_worker(wallet_file_path, status_queue: Queue):
+# --- CONFIGURACIÓN DE LANZAMIENTO ---
+DELAY_BETWEEN_LAUNCHES_SECONDS = 15 # Retardo fijo entre navegadores del lanzamiento INICIAL (solo si LANZAMIENTO_ADAPTATIVO = False)
+LANZAMIENTO_ADAPTATIVO = True      # True: lanzar tan rápido como permita el presupuesto de recursos de abajo
+MAX_ARRANQUES_SIMULTANEOS = 3      # Navegadores arrancando (Chrome + login del wizard) a la vez
+CARGA_CPU_MAXIMA = 0.85            # No lanzar si la carga de 1 min (/proc/loadavg) por núcleo supera este valor
+MEMORIA_LIBRE_MINIMA_MB = 1024     # No lanzar si MemAvailable (/proc/meminfo) baja de X MB
+ARRANQUE_TIMEOUT_SECONDS = 180     # Un arranque que no reporta nada en X s deja de contar como "en curso"
+INTERVALO_RECURSOS_SECONDS = 2     # Cada cuánto se reevalúa el presupuesto mientras haya navegadores por lanzar
+MANAGER_SLEEP_SECONDS = 60         # Espera máxima del supervisor si no ocurre nada (despierta antes con cada evento)
+SONDEO_ESTADOS_SECONDS = 0.5       # Si no se puede esperar en la cola de estado, cada cuánto se mira (ver lector_de_cola)
+WORKER_CLEAN_SHUTDOWN_TIMEOUT = 10 # Tiempo (seg) para esperar a que un worker se cierre solo antes de forzarlo
+# True: cada slot mantiene un Chrome persistente y recibe las carteras por un Pipe (sin relanzar Chrome al rotar).
+# False: un proceso y un Chrome nuevos por cada cartera (modo clásico, sale con EXIT_CODE_SOLVED).
+REUTILIZAR_NAVEGADORES = True
+# Con REUTILIZAR_NAVEGADORES: cuántos slots comparten un mismo Chrome (cada uno en un contexto aislado).
+CARTERAS_POR_NAVEGADOR = 1
+
+# --- ARRANQUE DE PROCESOS ---
+# "spawn": cada worker arranca un intérprete nuevo e importa lanzador_bots + worker_bots (cualquier plataforma).
+# "forkserver" (solo POSIX): un proceso servidor importa MODULOS_PRECARGA una sola vez y cada
+# worker nace como fork suyo, con selenium y worker_bots ya cargados (ver benchmark_arranque.py).
+METODO_ARRANQUE = os.environ.get("METODO_ARRANQUE") or "spawn"
+MODULOS_PRECARGA = ["__main__", "worker_bots"]
+
+# Ruta fija a chromedriver (modo offline). None = resolverla con webdriver_manager al arrancar el supervisor.
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH") or None
+# Ruta de chromedriver resuelta al arrancar el supervisor (ver resolver_chromedriver)
+_ruta_chromedriver = None
+# Cola hacia el listener de logs del supervisor (ver registro_logs.iniciar); None = cada worker escribe en su consola
+_cola_logs = None
+# Constantes cambiadas por la configuración ({seccion: {CONSTANTE: valor}}); se pasan a cada proceso hijo
+_ajustes = None
+
+# --- CONFIGURACIÓN DE REINICIO ESCALONADO ---
+# Cada slot se reinicia por separado cuando SU challenge termina, en oleadas de
+# como mucho MAX_REINICIOS_SIMULTANEOS slots; el resto sigue trabajando.
+# RESTART_TRIGGER_SECONDS, ESTABILIZACION_CHALLENGE_SECONDS y REINICIO_TIMEOUT_SECONDS
+# están en worker_bots.py (los usan también los workers).
+MAX_REINICIOS_SIMULTANEOS = 2         # Slots reiniciándose a la vez
+
+# --- CONFIGURACIÓN DE BACKOFF Y CUARENTENA TRAS FALLOS ---
+# Un slot que falla (su proceso muere o su cartera responde "fallo") no se relanza
+# al momento: espera un backoff exponencial con jitter. Tras CRASHES_PARA_CUARENTENA
+# fallos seguidos sin llegar a iniciar sesión, su cartera principal pasa a cuarentena
+# y el slot sigue con otra nueva. Si la nueva también acumula la racha, el problema
+# es el slot (su navegador) y se aparca él durante CUARENTENA_SLOT_SECONDS.
+BACKOFF_BASE_SECONDS = 5              # Espera tras el primer fallo (se duplica con cada fallo seguido)
+BACKOFF_MAX_SECONDS = 300             # Tope de la espera entre relanzamientos
+BACKOFF_JITTER = 0.3                  # +-30% al azar para que los slots que fallan juntos no se relancen a la vez
+CRASHES_PARA_CUARENTENA = 5           # Fallos seguidos sin iniciar sesión para poner en cuarentena la cartera principal
+MAX_CARTERAS_EN_CUARENTENA_POR_SLOT = 1 # Carteras descartadas seguidas en un slot; la siguiente racha aparca el slot
+CUARENTENA_SLOT_SECONDS = 1800        # Tiempo que pasa aparcado un slot antes de volver a intentarlo
+# Estados de las carteras que pueden ser principales al arrancar (nunca RESUELTAS ni en CUARENTENA)
+ESTADOS_PRINCIPAL = (almacen_carteras.ESTADO_NUEVA, almacen_carteras.ESTADO_EN_USO)
+INTERVALO_RESUMEN_SECONDS = 300       # Cada cuánto registra el supervisor el resumen de estado de los slots
+
+# --- CONFIGURACIÓN DE AUTOESCALADO ---
+# Con AUTOESCALADO el número de slots deja de ser fijo: el supervisor mide el RSS
+# real del árbol de procesos de cada slot (worker + chromedriver + Chrome) y aparca
+# slots cuando la memoria libre o la CPU pasan del límite (MEMORIA_LIBRE_MINIMA_MB,
+# CARGA_CPU_MAXIMA), o activa uno más cuando hay margen para otro slot por encima de
+# MEMORIA_LIBRE_OBJETIVO_MB y la CPU está por debajo de CARGA_CPU_OBJETIVO.
+# Las carteras de un slot aparcado vuelven a la cola como NUEVAS.
+# Solo con un slot por navegador (CARTERAS_POR_NAVEGADOR = 1).
+AUTOESCALADO = False
+MIN_SLOTS_AUTOESCALADO = 1            # Nunca se aparcan slots por debajo de este número
+MAX_SLOTS_AUTOESCALADO = None         # Tope de slots activos (None = los pedidos al arrancar)
+MEMORIA_LIBRE_OBJETIVO_MB = 2048      # Solo se activa otro slot si tras él quedarían X MB libres
+CARGA_CPU_OBJETIVO = 0.7              # Solo se activa otro slot con la carga por núcleo por debajo de X
+RSS_SLOT_ESTIMADO_MB = 400            # RSS supuesto de un slot hasta que se pueda medir
+INTERVALO_AUTOESCALADO_SECONDS = 60   # Cada cuánto se mide y se decide (un slot activado por intervalo)
+
+# --- INSTANTÁNEA DEL ESTADO (reanudar tras una caída del supervisor) ---
+# Al final de cada paso del supervisor en el que algo cambió (lanzamiento, rotación,
+# fallo, cuarentena, aparcado...) se reescribe ARCHIVO_ESTADO de forma atómica.
+# Con --reanudar los slots se reconstruyen desde él, sin volver a elegir carteras:
+# cada slot vuelve con su cartera actual, su racha de fallos y su cuarentena.
+# La cola de carteras (NUEVAS), las resueltas y el contador de IDs ya están en carteras.db.
+ARCHIVO_ESTADO = "estado_supervisor.json" # Instantánea del supervisor (se reescribe entera)
+VERSION_ESTADO = 1                        # Formato de la instantánea
+# Campos de cada slot que se guardan (el resto es del proceso en curso y no sobrevive a una caída)
+CAMPOS_ESTADO_SLOT = ("id", "principal_wallet_id", "current_wallet_id", "challenge_id", "crashes",
+                      "carteras_en_cuarentena", "cuarentena_hasta", "aparcado")
+
+# --- Funciones de Ayuda del Supervisor ---
+
+def modulos_configurables() -> dict:
+    """Sección de la configuración -> módulo cuyas constantes ajusta (ver configuracion.py)."""
+    return {"supervisor": sys.modules[__name__], **worker_bots.modulos_configurables(), "metricas": metricas_login}
+
+def aplicar_ajustes(ajustes):
     """
-    Esta función es el TRABAJO que realizará CADA bot de Selenium.
-    Reporta su estado y sale con código 0 si SOLVED. 
+    Aplica la configuración en este proceso (los hijos vuelven a importar los
+    módulos con los valores por defecto) y la guarda para los procesos que lance.
     """
-    
-    # Extraer un ID simple para los logs, ej: "wallet_1"
-    wallet_id = os.path.basename(wallet_file_path).split('.')[0]
-    
-    def log_bot(mensaje, level=logging.INFO):
-        # Función helper para que todos los logs de este bot tengan su ID
-        log.log(level, f"[{wallet_id}] {mensaje}")
-
-    log_bot(f"Bot iniciado. Cargando datos de cartera: {wallet_file_path}")
+    global _ajustes
+    _ajustes = ajustes
+    configuracion.aplicar(ajustes, modulos_configurables())
 
-    # 1. Cargar datos de la cartera
-    wallet_data = {} 
-    try:
-        with open(wallet_file_path, 'r') as f:
-            wallet_data = json.load(f)
-        
-        address = wallet_data["address"]
-        public_key = wallet_data["public_key_hex"]
-        private_key_hex = wallet_data["payment_private_key_hex"] 
-        private_key_bytes = bytes.fromhex(private_key_hex)
-        signing_key = PaymentSigningKey(private_key_bytes) 
-        
-        log_bot(f"Cartera cargada. Dirección: {address[:20]}...")
-        
-    except Exception as e:
-        log_bot(f"ERROR: No se pudo cargar o parsear el archivo {wallet_file_path}: {e}", logging.ERROR)
-        traceback.print_exc()
-        return # Sale con error (no 0)
-
-    # 2. Configurar Selenium
-    chrome_options = Options()
-    chrome_options.add_argument("--headless") 
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/5.37.36 (KHTML, like Gecko) Chrome/90.0.4430.85 Safari/537.36")
-    
-    driver = None # Definir el driver fuera del try para el 'finally'
+def cargar_configuracion(ruta=None, asignaciones=()) -> tuple:
+    """
+    Lee el TOML 'ruta' y las asignaciones de --set (que ganan al archivo), las
+    valida y las aplica. Devuelve (generales, ajustes). Lanza ValueError con
+    todos los errores si algo no es válido.
+    """
+    config = configuracion.cargar_toml(ruta) if ruta else {}
+    for asignacion in asignaciones:
+        config = configuracion.combinar(config, configuracion.parsear_asignacion(asignacion))
+    generales, ajustes = configuracion.validar(config, modulos_configurables())
+    aplicar_ajustes(ajustes)
+    return generales, ajustes
+
+def configurar_arranque(metodo=None) -> str:
+    """
+    Fija el método de arranque de los procesos (por defecto METODO_ARRANQUE) y, con
+    "forkserver", los módulos que precarga su servidor. Si el método no existe en
+    esta plataforma se usa "spawn". Devuelve el método en uso.
+    """
+    metodo = metodo or METODO_ARRANQUE
+    if metodo not in get_all_start_methods():
+        log.warning(f"Método de arranque '{metodo}' no disponible en esta plataforma. Se usa 'spawn'.")
+        metodo = "spawn"
+    if metodo == "forkserver":
+        set_forkserver_preload(MODULOS_PRECARGA)
     try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        wait = WebDriverWait(driver, 20) 
-        log_bot("Navegador iniciado.")
-    except Exception as e:
-        log_bot(f"ERROR: No se pudo iniciar Selenium. {e}", logging.ERROR)
-        traceback.print_exc()
-        if driver:
-            driver.quit()
-        return # Sale con error (no 0)
+        set_start_method(metodo)
+    except RuntimeError:
+        pass # Ya fijado
+    return metodo
 
-    # 3. Bucle principal del bot (Lógica de clics)
-    try:
-        # Paso 1: Ir a la página
-        driver.get("https://sm.midnight.gd/wizard/mine")
-        log_bot(f"Abierta la página: {driver.title}")
-
-        # --- INICIO LÓGICA DE LOGIN (Pasos 2 a 13) ---
-        # Paso 2: Clic en "Enter an address manually"
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[contains(text(), 'Enter an address manually')]")
-        )).click()
-        log_bot("Clic en 'Enter an address manually'.")
-
-        # Paso 3: Pegar la address
-        wait.until(EC.visibility_of_element_located(
-            (By.XPATH, "//input[@placeholder='Please enter an unused Cardano address']")
-        )).send_keys(address)
-        log_bot("Dirección (Base Address) pegada.")
-
-        # Paso 4: Clic en "Continue"
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Continue']")
-        )).click()
-        log_bot("Clic en 'Continue'.")
-
-        # Paso 5: Clic en "Next"
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Next']")
-        )).click()
-        log_bot("Clic en 'Next' (1/2).")
-
-        # Paso 6: Clic en "Next" (otra vez)
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Next']")
-        )).click()
-        log_bot("Clic en 'Next' (2/2).")
-
-        # Paso 7: Scroll y clic en checkbox "accept-terms"
-        log_bot("Página de términos. Buscando checkbox...")
-        checkbox = wait.until(EC.presence_of_element_located(
-            (By.ID, "accept-terms")
-        ))
-        driver.execute_script("arguments[0].click();", checkbox)
-        log_bot("Checkbox de términos marcado.")
-
-        # Paso 8: Clic en "Accept and sign"
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Accept and sign']")
-        )).click()
-        log_bot("Clic en 'Accept and sign'.")
-
-        # --- FASE DE FIRMA ---
-        log_bot("Iniciando fase de firma...")
-        message_element = wait.until(EC.visibility_of_element_located(
-            (By.XPATH, "//div[contains(text(), 'I agree to abide by the terms')]")
-        ))
-        texto_challenge = message_element.text
-        firma_hex = firmar_mensaje_cip8(signing_key, texto_challenge)
-        
-        # --- Guardar Firma en JSON ---
-        try:
-            wallet_data["generated_signature"] = firma_hex 
-            with open(wallet_file_path, 'w') as f: 
-                json.dump(wallet_data, f, indent=4)
-        except Exception as e:
-            log_bot(f"ADVERTENCIA: No se pudo guardar la firma en el JSON: {e}", logging.WARNING)
-
-        # --- LÓGICA DE PEGADO Y EDICIÓN MANUAL ---
-        signature_textarea = wait.until(EC.visibility_of_element_located(
-            (By.XPATH, "//textarea[@placeholder='Please enter the signature generated by your wallet']")
-        ))
-        driver.execute_script("arguments[0].value = arguments[1];", signature_textarea, firma_hex)
-        signature_textarea.click() 
-        signature_textarea.send_keys(Keys.SPACE)
-        signature_textarea.send_keys(Keys.BACKSPACE)
-        
-        public_key_input = wait.until(EC.visibility_of_element_located(
-            (By.XPATH, "//input[@placeholder='Please enter a public key']")
-        ))
-        driver.execute_script("arguments[0].value = arguments[1];", public_key_input, public_key)
-        public_key_input.click()
-        public_key_input.send_keys(Keys.SPACE)
-        public_key_input.send_keys(Keys.BACKSPACE)
-
-        # Paso 13: Clic en "Sign"
-        wait.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Sign']")
-        )).click()
-        log_bot("Clic en 'Sign'.")
-        # --- FIN LÓGICA LOGIN ---
-
-
-        # Paso 14: Clic en "Start session"
-        wait_long = WebDriverWait(driver, 40) 
-        wait_long.until(EC.element_to_be_clickable(
-            (By.XPATH, "//button[text()='Start session']")
-        )).click()
-        log_bot("¡Sesión iniciada! Estabilizando para capturar estado inicial...")
-
-        # --- Capturar estado inicial ---
-        time.sleep(10) # Espera 10s para que la página se estabilice
-        initial_solved_challenges = -1
+def resolver_chromedriver(ruta_fija=None) -> str:
+    """
+    Resuelve y valida el binario de chromedriver UNA sola vez (en el supervisor).
+    Con 'ruta_fija' no se consulta webdriver_manager (modo offline / versión fijada).
+    Lanza RuntimeError si el binario no existe o no se puede ejecutar.
+    """
+    inicio = time.time()
+    if ruta_fija:
+        ruta = ruta_fija
+        origen = "ruta fija"
+    else:
         try:
-            initial_solved_challenges_str = wait.until(EC.visibility_of_element_located(
-                (By.XPATH, "//span[@data-testid='solved-count']")
-            )).text
-            initial_solved_challenges = int(initial_solved_challenges_str)
-            log_bot(f"Estado inicial capturado -> Solved: {initial_solved_challenges}")
+            from webdriver_manager.chrome import ChromeDriverManager # Solo lo necesita el supervisor
+            ruta = ChromeDriverManager().install()
         except Exception as e:
-            log_bot(f"Error capturando estado inicial. Asumiendo 0. Error: {e}", logging.WARNING)
-            initial_solved_challenges = 0 # Fallback
+            raise RuntimeError(f"webdriver_manager no pudo resolver chromedriver: {e}")
+        origen = "webdriver_manager"
 
+    if not os.path.isfile(ruta) or not os.access(ruta, os.X_OK):
+        raise RuntimeError(f"chromedriver no existe o no es ejecutable: '{ruta}'")
+    try:
+        version = subprocess.run([ruta, "--version"], check=True, capture_output=True, text=True, timeout=15).stdout.strip().split("\n")[0]
+    except (subprocess.SubprocessError, OSError) as e:
+        raise RuntimeError(f"chromedriver '{ruta}' no responde a --version: {e}")
 
-        # Paso 15: Bucle de monitoreo (¡CÓDIGO DE REPORTE!)
-        while True:
-            try:
-                # --- Capturar estado actual ---
-                claim = wait.until(EC.visibility_of_element_located(
-                    (By.XPATH, "//*[contains(text(), 'Your estimated claim:')]/following-sibling::span")
-                )).text
-                my_solutions = driver.find_element(
-                    By.XPATH, "//*[contains(text(), 'Your submitted solutions:')]/following-sibling::span"
-                ).text
-                all_solutions_submitted = driver.find_element(
-                    By.XPATH, "//*[contains(text(), 'All submitted solutions:')]/following-sibling::span"
-                ).text
-                current_solved_challenges_str = driver.find_element(
-                    By.XPATH, "//span[@data-testid='solved-count']"
-                ).text
-                current_solved_challenges = int(current_solved_challenges_str)
-                next_challenge_in = driver.find_element(
-                    By.XPATH, "//div[contains(span, 'Next challenge in:')]/span[2]"
-                ).text
-                
-                timer_in_seconds = parse_timer_to_seconds(next_challenge_in)
-                miner_status = driver.find_element(
-                    By.XPATH, "//*[contains(text(), 'Miner status')]/following-sibling::span//span[1]"
-                ).text
-                current_challenge_id = driver.find_element(
-                    By.XPATH, "//*[contains(text(), 'Current challenge:')]/following-sibling::span"
-                ).text
-
-                # --- Log de Progreso ---
-                log_bot("----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------")
-                log_bot(f"PROGRESO: [{miner_status}] Claim: {claim} | Solved: {current_solved_challenges} (Initial: {initial_solved_challenges}) | Current ID: {current_challenge_id} | Timer: {next_challenge_in}")
-                log_bot("----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------")
-
-                # --- ¡NUEVO! Lógica de salida por éxito (Challenge Solved) ---
-                if current_solved_challenges > initial_solved_challenges:
-                    log_bot(f"¡ÉXITO! Challenge resuelto. (Solved: {current_solved_challenges} > {initial_solved_challenges})")
-                    log_bot("Cerrando este worker para rotación de NUEVA wallet. Saliendo con código 0...")
-                    driver.quit()
-                    sys.exit(EXIT_CODE_SOLVED) # Salir con código 0 (Rotación de Wallet)
-
-
-                # --- Reportar estado al Supervisor (Timer y Challenge ID) ---
-                status_queue.put({
-                    "wallet_file": wallet_file_path, 
-                    "timer_seconds": timer_in_seconds,
-                    "challenge_id": current_challenge_id
-                })
-                
-            except (NoSuchElementException, TimeoutException) as e:
-                log_bot(f"Error al leer datos de progreso (puede ser temporal): {str(e)[:100]}... Refrescando...", logging.WARNING)
-                driver.refresh() # Refrescar la página si algo falla
-            except Exception as e:
-                log_bot(f"Error inesperado en el bucle de monitoreo: {e}", logging.ERROR)
-                # Reportar un estado de "error" (timer -1)
-                status_queue.put({"wallet_file": wallet_file_path, "timer_seconds": -1})
-                
-            time.sleep(30)
+    log.info(f"Chromedriver resuelto ({origen}) en {time.time() - inicio:.2f}s: {ruta} [{version}]")
+    return ruta
 
-    except TimeoutException:
-        log_bot("ERROR: Un elemento no se encontró o no estuvo clicable a tiempo. El bot se detendrá.", logging.ERROR)
-        traceback.print_exc()
-    except KeyboardInterrupt:
-        log_bot("Cierre por Ctrl+C detectado en el worker...", logging.INFO)
+
+def limpiar_navegador_de(proceso):
+    """
+    El proceso del worker ya no está vivo: termina el chromedriver y el Chrome que
+    dejó registrados (solo los suyos, no el resto de Chrome de la máquina).
+    """
+    if proceso is None or proceso.is_alive() or proceso.pid is None:
+        return
+    try:
+        procesos_navegador.limpiar_worker(proceso.pid)
     except Exception as e:
-        log_bot(f"ERROR fatal en el bot: {e}", logging.ERROR)
-        traceback.print_exc()
-    finally:
-        if driver:
-            log_bot("Ejecutando driver.quit() en 'finally'...", logging.INFO)
-            driver.quit()
-        log_bot("Navegador cerrado. Proceso terminado (por 'finally').")
+        log.warning(f"No se pudo limpiar el navegador del proceso {proceso.pid}: {e}")
 
+def lanzar_navegador(slots_grupo: list, status_queue: Queue):
+    """
+    Arranca un proceso de navegador persistente que aloja 'slots_grupo'
+    (uno con run_browser_worker, varios con run_multi_browser_worker).
+    Todos los slots del grupo comparten el proceso y el Pipe.
+    """
+    conn_supervisor, conn_worker = Pipe()
+    slot_ids = [slot["id"] for slot in slots_grupo]
+    if len(slot_ids) > 1:
+        p = Process(target=run_multi_browser_worker, args=(slot_ids, conn_worker, status_queue, _ruta_chromedriver, _cola_logs, _ajustes))
+    else:
+        p = Process(target=run_browser_worker, args=(slot_ids[0], conn_worker, status_queue, _ruta_chromedriver, _cola_logs, _ajustes))
+    p.start()
+    conn_worker.close() # El extremo del worker solo debe quedar abierto en el hijo
+    for slot in slots_grupo:
+        slot["process"] = p
+        slot["conn"] = conn_supervisor
+        slot["arrancando_desde"] = time.time()
+        slot["relanzar_en"] = None
+
+def liberar_cartera(wallet_id: int) -> bool:
+    """Devuelve a la cola (NUEVA) una cartera EN_USO que ya no usa ningún slot. Las RESUELTAS no se tocan."""
+    return almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_NUEVA, solo_si=almacen_carteras.ESTADO_EN_USO)
+
+def cambiar_cartera_actual(slot: dict, wallet_id: int):
+    """
+    Fija la cartera actual del slot. Si abandona una cartera de rotación sin que
+    resolviera (vuelta a la principal tras un fallo o un reinicio), esta vuelve a la cola.
+    """
+    anterior = slot["current_wallet_id"]
+    slot["current_wallet_id"] = wallet_id
+    if anterior not in (wallet_id, slot["principal_wallet_id"]) and liberar_cartera(anterior):
+        log.info(f"Slot {slot['id']}: wallet_{anterior} no llegó a resolver y vuelve a la cola.")
 
-# =============================================================================
-# SECCIÓN 3: SUPERVISOR DE WORKERS (LÓGICA DE REINICIO GLOBAL)
-# =============================================================================
+def enviar_cartera(slot: dict, wallet_id: int):
+    """Envía 'wallet_id' al navegador persistente del slot."""
+    slot["conn"].send({"slot": slot["id"], "wallet_id": wallet_id})
+    cambiar_cartera_actual(slot, wallet_id)
 
-# --- CONFIGURACIÓN DE LANZAMIENTO ---
-DELAY_BETWEEN_LAUNCHES_SECONDS = 15 # Retardo para el lanzamiento INICIAL de cada bot
-MANAGER_SLEEP_SECONDS = 15         # Tiempo que el supervisor espera antes de comprobar el estado de los workers
-WORKER_CLEAN_SHUTDOWN_TIMEOUT = 10 # Tiempo (seg) para esperar a que un worker se cierre solo antes de forzarlo
-CHROME_KILL_SCRIPT = "chromeKill.bat" # Nombre del script .bat para matar Chrome
+def lanzar_slot(slot: dict, wallet_id: int, status_queue: Queue):
+    """
+    Arranca un proceso nuevo para 'slot' con la cartera 'wallet_id'.
+    Con REUTILIZAR_NAVEGADORES el proceso es un navegador persistente y la cartera
+    se le envía por el Pipe del slot.
+    """
+    if REUTILIZAR_NAVEGADORES:
+        lanzar_navegador([slot], status_queue)
+        enviar_cartera(slot, wallet_id)
+    else:
+        p = Process(target=run_bot_worker, args=(wallet_id, slot["id"], status_queue, _ruta_chromedriver, _cola_logs, _ajustes))
+        p.start()
+        slot["process"] = p
+        slot["conn"] = None
+        cambiar_cartera_actual(slot, wallet_id)
+        slot["arrancando_desde"] = time.time()
+        slot["relanzar_en"] = None
 
-# --- CONFIGURACIÓN DE REINICIO GLOBAL ---
-# El reinicio se activa si MÁS DE 3 workers están por debajo de 20 segundos.
-RESTART_TRIGGER_COUNT = 3
-RESTART_TRIGGER_SECONDS = 20
+def relanzar_tras_crash(slot: dict, worker_slots: list, status_queue: Queue):
+    """
+    El proceso del slot murió: lo relanza con la cartera PRINCIPAL. Si el navegador
+    era compartido, relanza uno nuevo para todo el grupo (sin los slots en cuarentena)
+    y cada slot vuelve a su principal.
+    """
+    hermanos = [s for s in worker_slots if s["process"] is slot["process"] and s["cuarentena_hasta"] is None]
+    if slot["conn"] is None or len(hermanos) <= 1:
+        lanzar_slot(slot, slot["principal_wallet_id"], status_queue)
+        return
+    lanzar_navegador(hermanos, status_queue)
+    for hermano in hermanos:
+        enviar_cartera(hermano, hermano["principal_wallet_id"])
 
-# --- Funciones de Ayuda del Supervisor ---
+def asignar_cartera(slot: dict, wallet_id: int, status_queue: Queue):
+    """
+    Pone 'wallet_id' a trabajar en 'slot': reutiliza su navegador persistente si sigue
+    vivo y, si no, lanza un proceso nuevo.
+    """
+    if slot.get("conn") is not None and slot["process"].is_alive():
+        try:
+            enviar_cartera(slot, wallet_id)
+            return
+        except (OSError, EOFError) as e:
+            log.warning(f"Slot {slot['id']}: el navegador persistente no acepta la cartera ({e}). Relanzando proceso...")
+            slot["process"].kill()
+            slot["process"].join()
+            limpiar_navegador_de(slot["process"])
+    if CARTERAS_POR_NAVEGADOR > 1 and REUTILIZAR_NAVEGADORES:
+        # Navegador compartido caído: el bucle del supervisor relanzará el grupo completo
+        cambiar_cartera_actual(slot, wallet_id)
+        return
+    lanzar_slot(slot, wallet_id, status_queue)
 
-def run_chrome_kill():
-    """Ejecuta el script chromeKill.bat para limpiar procesos huérfanos."""
-    kill_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CHROME_KILL_SCRIPT)
-    if not os.path.exists(kill_path):
-        log.warning(f"No se encontró '{CHROME_KILL_SCRIPT}' en la ruta del script. Saltando limpieza de Chrome.")
+def rotar_slot(slot: dict, wallet_id: int, status_queue: Queue):
+    """
+    'wallet_id' resolvió su challenge en el slot: la marca como RESUELTA y le asigna
+    una NUEVA. Si el slot ya tiene otra asignación en camino (p. ej. un reinicio
+    escalonado), solo se registra la cartera resuelta: el slot no rota.
+    """
+    almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_RESUELTA)
+    almacen_carteras.borrar_sesion(wallet_id) # Ya no se volverá a lanzar
+    if wallet_id != slot["current_wallet_id"]:
+        log.info(f"Slot {slot['id']}: wallet_{wallet_id} resolvió su challenge después de que se le asignara "
+                 f"wallet_{slot['current_wallet_id']}. Sin rotación.")
         return
-        
+    slot["rotando_desde"] = time.time()
+    new_wallet_id = obtener_cartera_de_rotacion() # Ya queda marcada EN_USO
+    log.info(f"Siguiente cartera lista: wallet_{new_wallet_id}")
+    asignar_cartera(slot, new_wallet_id, status_queue)
+
+def reiniciar_slot(slot: dict, status_queue: Queue):
+    """El slot falló: vuelve a su cartera PRINCIPAL (reutilizando el navegador si sigue vivo)."""
+    asignar_cartera(slot, slot["principal_wallet_id"], status_queue)
+
+# --- Lanzamiento inicial (adaptativo) ---
+
+def leer_carga_cpu():
+    """Carga media de 1 minuto por núcleo (/proc/loadavg), o None si no está disponible (p. ej. Windows)."""
     try:
-        log.info(f"Ejecutando '{CHROME_KILL_SCRIPT}'...")
-        # shell=True es necesario para ejecutar .bat en Windows
-        subprocess.run([kill_path], shell=True, check=True, capture_output=True, text=True)
-        log.info("chromeKill.bat ejecutado con éxito.")
-    except subprocess.CalledProcessError as e:
-        log.error(f"Error al ejecutar chromeKill.bat: {e.stderr}")
-    except FileNotFoundError:
-        log.error(f"Error: '{CHROME_KILL_SCRIPT}' no se encontró en la ruta.")
+        with open("/proc/loadavg") as f:
+            return float(f.read().split()[0]) / (os.cpu_count() or 1)
+    except (OSError, ValueError, IndexError):
+        return None
 
-def launch_workers(wallet_files: list, status_queue: Queue, delay_seconds: int) -> list:
+def leer_memoria_libre_mb():
+    """Memoria disponible (MemAvailable de /proc/meminfo) en MB, o None si no está disponible."""
+    try:
+        with open("/proc/meminfo") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def navegadores_arrancando(worker_slots: list) -> int:
+    """Procesos lanzados que aún no han reportado nada (ni sesión iniciada, ni timer, ni evento)."""
+    limite = time.time() - ARRANQUE_TIMEOUT_SECONDS
+    return len({id(slot["process"]) for slot in worker_slots
+                if slot["arrancando_desde"] is not None and slot["arrancando_desde"] >= limite})
+
+def motivo_para_esperar(worker_slots: list):
+    """Devuelve por qué no conviene lanzar otro navegador ahora, o None si el presupuesto lo permite."""
+    arrancando = navegadores_arrancando(worker_slots)
+    if arrancando >= MAX_ARRANQUES_SIMULTANEOS:
+        return f"{arrancando} navegadores arrancando"
+    carga = leer_carga_cpu()
+    if carga is not None and carga > CARGA_CPU_MAXIMA:
+        return f"carga de CPU {carga:.2f} por núcleo (máx. {CARGA_CPU_MAXIMA})"
+    memoria = leer_memoria_libre_mb()
+    if memoria is not None and memoria < MEMORIA_LIBRE_MINIMA_MB:
+        return f"solo {memoria:.0f} MB de memoria libre (mín. {MEMORIA_LIBRE_MINIMA_MB})"
+    return None
+
+def nuevo_slot(slot_id: int, wallet_id: int) -> dict:
+    """Diccionario de un slot (aún sin proceso) con 'wallet_id' como cartera principal."""
+    return {
+        "id": slot_id,
+        "process": None,
+        "conn": None,                     # Pipe con el navegador persistente (si REUTILIZAR_NAVEGADORES)
+        "current_wallet_id": wallet_id,   # La wallet que está corriendo AHORA
+        "principal_wallet_id": wallet_id, # La wallet principal de ESTE slot
+        "challenge_id": None,             # Challenge con el que empezó la sesión actual
+        "arrancando_desde": None,         # Momento del lanzamiento, hasta su primer reporte
+        "rotando_desde": None,            # Momento de la última rotación, hasta que la nueva cartera inicia sesión
+        "crashes": 0,                     # Fallos seguidos sin iniciar sesión (backoff y cuarentena)
+        "relanzar_en": None,              # Momento programado para relanzar el slot tras un fallo
+        "carteras_en_cuarentena": 0,      # Carteras principales descartadas seguidas en este slot
+        "cuarentena_hasta": None,         # Si el slot está en cuarentena, hasta cuándo
+        "aparcado": False,                # Desactivado por el autoescalado (sin proceso ni carteras)
+        "rss_mb": None                    # Último RSS medido de su árbol de procesos
+    }
+
+def preparar_lanzamiento(wallet_ids: list):
     """
-    Lanza una lista de workers, uno por cada wallet_file, y devuelve
-    una lista de diccionarios 'slot' para el seguimiento.
+    Crea un diccionario 'slot' (aún sin proceso) por cada wallet_id y los agrupa por
+    navegador. Devuelve (worker_slots, lanzador); el bucle del supervisor los va
+    lanzando con avanzar_lanzamiento.
     """
-    worker_slots = []
-    log.info(f"\nSe lanzarán {len(wallet_files)} workers (slots), con un retardo de {delay_seconds}s entre cada uno.\n")
-    time.sleep(3)
-    
-    for i, wallet_file in enumerate(wallet_files):
-        wallet_id_log = os.path.basename(wallet_file).split('.')[0]
-        
-        log.info(f"Iniciando Slot {i} con {wallet_id_log}...")
-        # Pasamos la cola de estado al nuevo proceso
-        p = Process(target=run_bot_worker, args=(wallet_file, status_queue))
-        p.start()
-        
-        worker_slots.append({
-            "id": i,
-            "process": p,
-            "current_wallet_file": wallet_file,   # La wallet que está corriendo AHORA
-            "principal_wallet_file": wallet_file  # La wallet principal de ESTE slot
-        })
-        
-        log.info(f"Slot {i} ({wallet_id_log}) lanzado. (Pausa de {delay_seconds}s)")
-        time.sleep(delay_seconds)
-        
-    return worker_slots
+    worker_slots = [nuevo_slot(i, wallet_id) for i, wallet_id in enumerate(wallet_ids)]
+    return worker_slots, agrupar_para_lanzar(worker_slots)
+
+def agrupar_para_lanzar(slots: list) -> dict:
+    """Agrupa 'slots' por navegador y devuelve el estado del lanzador que los irá lanzando."""
+    por_navegador = CARTERAS_POR_NAVEGADOR if REUTILIZAR_NAVEGADORES else 1
+    grupos = [slots[i:i + por_navegador] for i in range(0, len(slots), por_navegador)]
+
+    if LANZAMIENTO_ADAPTATIVO:
+        modo = (f"adaptativo: hasta {MAX_ARRANQUES_SIMULTANEOS} arranques a la vez, carga < {CARGA_CPU_MAXIMA}/núcleo, "
+                f">= {MEMORIA_LIBRE_MINIMA_MB} MB libres")
+    else:
+        modo = f"con un retardo fijo de {DELAY_BETWEEN_LAUNCHES_SECONDS}s entre cada navegador"
+    log.info(f"\nSe lanzarán {len(slots)} workers (slots) en {len(grupos)} navegadores"
+             f" ({por_navegador} slots por navegador), {modo}.\n")
+    return {"por_lanzar": grupos, "inicio": time.time(), "proximo": 0, "esperando": False, "completado": False}
+
+def lanzar_grupo(grupo: list, status_queue: Queue):
+    """
+    Lanza el navegador (o el proceso clásico) de un grupo de slots con su cartera
+    actual: la principal, salvo al reanudar un slot que estaba con otra.
+    """
+    # Pasamos la cola de estado al nuevo proceso (un Chrome por grupo de slots)
+    if len(grupo) > 1:
+        lanzar_navegador(grupo, status_queue)
+        for slot in grupo:
+            enviar_cartera(slot, slot["current_wallet_id"])
+    else:
+        lanzar_slot(grupo[0], grupo[0]["current_wallet_id"], status_queue)
+    for slot in grupo:
+        for wallet_id in {slot["principal_wallet_id"], slot["current_wallet_id"]}:
+            almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_EN_USO)
+
+    slots_log = ", ".join(f"{slot['id']} (wallet_{slot['current_wallet_id']})" for slot in grupo)
+    log.info(f"{'Slots' if len(grupo) > 1 else 'Slot'} {slots_log} lanzado{'s' if len(grupo) > 1 else ''}.")
+
+def avanzar_lanzamiento(lanzador: dict, worker_slots: list, status_queue: Queue) -> float:
+    """
+    Lanza los navegadores pendientes que permita el presupuesto de recursos (o el
+    retardo fijo) y devuelve cuántos segundos puede esperar el supervisor antes de
+    volver a llamarla. Cuando toda la flota ha arrancado, registra cuánto tardó.
+    """
+    while lanzador["por_lanzar"]:
+        if LANZAMIENTO_ADAPTATIVO:
+            motivo = motivo_para_esperar(worker_slots)
+            if motivo:
+                if not lanzador["esperando"]:
+                    log.info(f"[LANZADOR] Pausando lanzamientos: {motivo}.")
+                lanzador["esperando"] = True
+                return INTERVALO_RECURSOS_SECONDS
+        elif time.time() < lanzador["proximo"]:
+            return lanzador["proximo"] - time.time()
+        lanzador["esperando"] = False
+        lanzar_grupo(lanzador["por_lanzar"].pop(0), status_queue)
+        lanzador["proximo"] = time.time() + DELAY_BETWEEN_LAUNCHES_SECONDS
+
+    if not lanzador["completado"] and navegadores_arrancando(worker_slots) == 0:
+        lanzador["completado"] = True
+        log.info(f"--- ¡Flota completa! {len(worker_slots)} slots en marcha en {time.time() - lanzador['inicio']:.0f}s ---")
+    return MANAGER_SLEEP_SECONDS
+
+def detener_productor(productor, evento_parada):
+    """Pide al productor de carteras que termine y, si no lo hace, lo fuerza."""
+    if productor is None or not productor.is_alive():
+        return
+    evento_parada.set()
+    productor.join(timeout=WORKER_CLEAN_SHUTDOWN_TIMEOUT)
+    if productor.is_alive():
+        log.warning("El productor de carteras no respondió. Forzando terminate...")
+        productor.terminate()
+        productor.join()
+
+def detener_proceso(proceso):
+    """
+    Cierre limpio (terminate) de un único proceso; si no responde a tiempo, kill.
+    Después termina el navegador que dejara registrado.
+    """
+    if proceso.is_alive():
+        proceso.terminate()
+        proceso.join(timeout=WORKER_CLEAN_SHUTDOWN_TIMEOUT)
+        if proceso.is_alive():
+            log.warning(f"El proceso {proceso.pid} no respondió. Forzando kill...")
+            proceso.kill()
+            proceso.join()
+    limpiar_navegador_de(proceso)
 
 def shutdown_all_workers(worker_slots: list):
     """
-    Intenta un cierre limpio de todos los workers.
+    Intenta un cierre limpio de todos los workers. Los navegadores persistentes
+    reciben primero la orden de cierre (None por su Pipe) para que cierren Chrome
+    con driver.quit(); a los que no terminen en WORKER_CLEAN_SHUTDOWN_TIMEOUT, y a
+    los workers clásicos, se les envía terminate().
     """
-    log.info(f"Enviando señal de terminación a {len(worker_slots)} workers...")
+    # 0. Orden de cierre por el Pipe (una por navegador, aunque lo compartan varios slots)
+    persistentes = {}
+    for slot in worker_slots:
+        if slot["conn"] is not None and slot["process"] is not None and slot["process"].is_alive():
+            persistentes.setdefault(id(slot["process"]), (slot["process"], slot["conn"]))
+    if persistentes:
+        log.info(f"Enviando orden de cierre a {len(persistentes)} navegadores persistentes...")
+        for proceso, conn in persistentes.values():
+            try:
+                conn.send(None)
+            except (OSError, EOFError, ValueError):
+                pass # Pipe ya cerrado: el proceso se termina abajo
+        limite = time.time() + WORKER_CLEAN_SHUTDOWN_TIMEOUT
+        for proceso, _ in persistentes.values():
+            proceso.join(timeout=max(0, limite - time.time()))
+
+    vivos = sum(1 for slot in worker_slots if slot["process"] is not None and slot["process"].is_alive())
+    log.info(f"Enviando señal de terminación a {vivos} workers...")
     
     # 1. Enviar terminate() a todos para activar el 'finally' en el worker
     for slot in worker_slots:
-        if slot["process"].is_alive():
+        if slot["process"] is not None and slot["process"].is_alive():
             try:
                 slot["process"].terminate()
             except Exception as e:
@@ -512,7 +868,7 @@ def shutdown_all_workers(worker_slots: list):
 
     # 2. Esperar a que todos mueran
     for slot in worker_slots:
-        if slot["process"].is_alive():
+        if slot["process"] is not None and slot["process"].is_alive():
             log.info(f"Esperando al Slot {slot['id']} (PID: {slot['process'].pid}) por {WORKER_CLEAN_SHUTDOWN_TIMEOUT}s...")
             slot["process"].join(timeout=WORKER_CLEAN_SHUTDOWN_TIMEOUT)
             
@@ -521,159 +877,725 @@ def shutdown_all_workers(worker_slots: list):
                 log.warning(f"El Slot {slot['id']} no respondió. Forzando kill...")
                 slot["process"].kill()
                 slot["process"].join()
+
+    # 4. Terminar los chromedriver/Chrome que los workers no llegaron a cerrar
+    for proceso in {id(slot["process"]): slot["process"] for slot in worker_slots if slot["process"] is not None}.values():
+        limpiar_navegador_de(proceso)
     
     log.info("Todos los workers han sido detenidos.")
 
+# --- Reinicio escalonado ---
+
+def nuevo_planificador() -> dict:
+    """Estado del reinicio escalonado: slot_id -> momento programado / momento de inicio."""
+    return {"pendientes": {}, "en_curso": {}}
+
+def registrar_estado_slot(planificador: dict, slot: dict, status: dict):
+    """
+    Procesa un reporte de timer del slot. Si su challenge está por acabar (o ya
+    cambió), programa su reinicio para después del cambio + ESTABILIZACION_CHALLENGE_SECONDS.
+    """
+    slot_id = slot["id"]
+    timer_sec = status.get("timer_seconds", -1)
+    challenge_id = status.get("challenge_id")
+    if slot["challenge_id"] is None:
+        slot["challenge_id"] = challenge_id
+    if slot_id in planificador["pendientes"] or slot_id in planificador["en_curso"]:
+        return # Ya programado o reiniciándose
+
+    if 0 <= timer_sec < worker_bots.RESTART_TRIGGER_SECONDS:
+        motivo, momento = f"timer a {timer_sec}s", time.time() + timer_sec + worker_bots.ESTABILIZACION_CHALLENGE_SECONDS
+    elif challenge_id and slot["challenge_id"] and challenge_id != slot["challenge_id"]:
+        # No llegó a reportar el timer bajo (p. ej. modo sondeo), pero el challenge ya cambió
+        motivo, momento = f"nuevo challenge {challenge_id}", time.time() + worker_bots.ESTABILIZACION_CHALLENGE_SECONDS
+    else:
+        return
+    planificador["pendientes"][slot_id] = momento
+    log.info(f"[SUPERVISOR] Slot {slot_id}: reinicio programado dentro de {momento - time.time():.0f}s ({motivo}).")
+
+def terminar_reinicio(planificador: dict, slot: dict, wallet_id: int):
+    """El slot inició sesión con 'wallet_id': si es la que se le asignó, su reinicio ha terminado."""
+    if wallet_id != slot["current_wallet_id"]:
+        return # Sesión de una asignación anterior (la siguiente ya está en camino)
+    slot["challenge_id"] = None # Lo fija el primer reporte de la nueva sesión
+    inicio = planificador["en_curso"].pop(slot["id"], None)
+    if inicio is not None:
+        log.info(f"[SUPERVISOR] Slot {slot['id']} reiniciado en {time.time() - inicio:.0f}s "
+                 f"({len(planificador['pendientes'])} slots esperando turno).")
+
+def reciclar_slot(slot: dict, worker_slots: list, status_queue: Queue):
+    """
+    Reinicia UN slot con su cartera PRINCIPAL sin tocar al resto. Si su navegador
+    persistente sigue vivo basta con enviarle la asignación (interrumpe la sesión
+    actual sin relanzar Chrome); si no, se detiene solo su proceso y se relanza.
+    """
+    if slot["conn"] is not None and slot["process"].is_alive():
+        try:
+            enviar_cartera(slot, slot["principal_wallet_id"])
+            return
+        except (OSError, EOFError) as e:
+            log.warning(f"Slot {slot['id']}: el navegador persistente no acepta la cartera ({e}). Relanzando proceso...")
+    detener_proceso(slot["process"])
+    relanzar_tras_crash(slot, worker_slots, status_queue)
+
+def ejecutar_reinicios(planificador: dict, worker_slots: list, status_queue: Queue):
+    """
+    Avanza el reinicio escalonado: relanza a la fuerza los reinicios atascados y
+    arranca los programados que ya tocan, como mucho MAX_REINICIOS_SIMULTANEOS a la vez.
+    """
+    slots_por_id = {slot["id"]: slot for slot in worker_slots}
+    ahora = time.time()
+    for slot_id, inicio in list(planificador["en_curso"].items()):
+        if ahora - inicio >= worker_bots.REINICIO_TIMEOUT_SECONDS:
+            del planificador["en_curso"][slot_id]
+            slot = slots_por_id[slot_id]
+            if slot_en_espera(slot):
+                continue # Falló durante el reinicio: lo relanza el backoff
+            log.warning(f"[SUPERVISOR] Slot {slot_id} no completó su reinicio en {worker_bots.REINICIO_TIMEOUT_SECONDS}s. Relanzando su proceso...")
+            detener_proceso(slot["process"])
+            relanzar_tras_crash(slot, worker_slots, status_queue)
+
+    vencidos = sorted((momento, slot_id) for slot_id, momento in planificador["pendientes"].items() if momento <= ahora)
+    for _, slot_id in vencidos:
+        if len(planificador["en_curso"]) >= MAX_REINICIOS_SIMULTANEOS:
+            break # El resto espera a que termine la oleada actual
+        del planificador["pendientes"][slot_id]
+        slot = slots_por_id[slot_id]
+        if slot_en_espera(slot):
+            continue # Ya volverá a su cartera principal al relanzarse tras el backoff
+        planificador["en_curso"][slot_id] = time.time()
+        log.info(f"[SUPERVISOR] Reiniciando slot {slot_id} con wallet_{slot['principal_wallet_id']} "
+                 f"({len(planificador['en_curso'])}/{MAX_REINICIOS_SIMULTANEOS} en curso).")
+        reciclar_slot(slot, worker_slots, status_queue)
+
+def segundos_hasta_proximo_reinicio(planificador: dict) -> float:
+    """Cuánto puede dormir el supervisor antes de que toque avanzar el reinicio escalonado."""
+    momentos = [inicio + worker_bots.REINICIO_TIMEOUT_SECONDS for inicio in planificador["en_curso"].values()]
+    if len(planificador["en_curso"]) < MAX_REINICIOS_SIMULTANEOS:
+        momentos.extend(planificador["pendientes"].values())
+    return max(0, min(momentos) - time.time()) if momentos else MANAGER_SLEEP_SECONDS
+
+def procesar_estados(status_queue: Queue, slots_por_id: dict, planificador: dict, metricas: dict):
+    """
+    Consume los mensajes pendientes de status_queue: timers e inicios de sesión van
+    al planificador y las duraciones de los pasos del login a las métricas.
+    """
+    while True:
+        try:
+            status = status_queue.get_nowait()
+        except Empty:
+            return # La cola está vacía
+        slot = slots_por_id.get(status.get("slot"))
+        if slot is None:
+            continue
+        slot["arrancando_desde"] = None # Primer reporte: el arranque ha terminado
+        if status.get("tipo") == "sesion_iniciada":
+            slot["crashes"] = 0 # El slot funciona: se acaba la racha de fallos
+            slot["carteras_en_cuarentena"] = 0
+            if slot["rotando_desde"] is not None and status.get("wallet_id") == slot["current_wallet_id"]:
+                metricas_login.observar(metricas, metricas_login.PASO_ROTACION, time.time() - slot["rotando_desde"])
+                slot["rotando_desde"] = None
+            terminar_reinicio(planificador, slot, status.get("wallet_id"))
+        elif status.get("tipo") == "pasos_login":
+            metricas_login.registrar_login(metricas, status)
+        else:
+            registrar_estado_slot(planificador, slot, status)
+
+def procesar_eventos_navegador(conn, slots_por_id: dict, status_queue: Queue):
+    """Atiende los eventos pendientes de un navegador persistente (ROTACIÓN sin relanzar Chrome)."""
+    try:
+        while conn.poll():
+            evento = conn.recv()
+            slot = slots_por_id[evento["slot"]]
+            slot["arrancando_desde"] = None
+            old_wallet = f"wallet_{evento['wallet_id']}"
+            if evento["wallet_id"] != slot["current_wallet_id"]:
+                # Sesión de una asignación anterior (como en terminar_reinicio): su fallo no cuenta
+                # contra la nueva; si resolvió, la cartera se marca RESUELTA sin rotar el slot
+                if evento["evento"] == "resuelto":
+                    rotar_slot(slot, evento["wallet_id"], status_queue)
+                continue
+            if evento["evento"] == "resuelto":
+                log.info(f"Slot {slot['id']} ({old_wallet}) completó challenge. ROTANDO a NUEVA wallet (mismo navegador)...")
+                rotar_slot(slot, evento["wallet_id"], status_queue)
+            else:
+                log.warning(f"Slot {slot['id']} ({old_wallet}) falló. Volverá a su cartera PRINCIPAL (mismo navegador)...")
+                registro_logs.volcar_slot(slot["id"], f"fallo de {old_wallet}")
+                registrar_fallo(slot, [slot], list(slots_por_id.values()))
+    except (EOFError, OSError):
+        pass # El proceso ha muerto: se gestiona con su sentinel como crash
+
+def procesar_fin_de_proceso(slot: dict, worker_slots: list, status_queue: Queue):
+    """El proceso del slot terminó: rota (si resolvió) o programa su relanzamiento con la cartera principal."""
+    if slot["process"].is_alive() or slot_en_espera(slot):
+        return # Ya relanzado o programado (p. ej. junto con otro slot de su mismo navegador)
+    exit_code = slot["process"].exitcode
+    old_wallet = f"wallet_{slot['current_wallet_id']}"
+    slot_id = slot["id"]
+    limpiar_navegador_de(slot["process"]) # Si murió sin driver.quit(), su Chrome sigue vivo
+
+    # CASO 1: ÉXITO (Challenge Resuelto, Exit Code 0) - solo en modo un proceso por cartera
+    if exit_code == EXIT_CODE_SOLVED and slot["conn"] is None:
+        log.info(f"Slot {slot_id} ({old_wallet}) completó challenge. ROTANDO a NUEVA wallet...")
+        rotar_slot(slot, slot["current_wallet_id"], status_queue)
+
+    # CASO 2: CRASH (Cualquier otro Exit Code, o un navegador persistente que murió)
+    else:
+        log.warning(f"Slot {slot_id} ({old_wallet}) crasheó (Exitcode: {exit_code}). Se relanzará con la misma cartera PRINCIPAL...")
+        registro_logs.volcar_slot(slot_id, f"crash (exitcode {exit_code}) con {old_wallet}")
+        
+        # Siempre se reinicia con la wallet PRINCIPAL del slot (y de los que compartían su navegador)
+        hermanos = [s for s in worker_slots if s["process"] is slot["process"] and not slot_en_espera(s)]
+        registrar_fallo(slot, hermanos, worker_slots)
+
+# --- Backoff y cuarentena tras fallos ---
+
+def slot_en_espera(slot: dict) -> bool:
+    """True si el slot espera su relanzamiento tras un fallo, está en cuarentena o lo aparcó el autoescalado."""
+    return slot["relanzar_en"] is not None or slot["cuarentena_hasta"] is not None or slot["aparcado"]
+
+def segundos_backoff(crashes: int) -> float:
+    """Espera antes de relanzar tras 'crashes' fallos seguidos: exponencial, con tope y jitter."""
+    espera = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (max(crashes, 1) - 1))
+    return espera * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+
+def poner_en_cuarentena(slot: dict, worker_slots: list) -> bool:
+    """
+    El slot acumuló CRASHES_PARA_CUARENTENA fallos seguidos. La primera vez se descarta
+    su cartera principal (y sigue con una nueva); si vuelve a pasar, se aparca el slot
+    (y se detiene su navegador si no lo comparte con otros slots).
+    Devuelve True si el slot ha quedado aparcado.
+    """
+    wallet_id = slot["principal_wallet_id"]
+    slot["crashes"] = 0
+    if slot["carteras_en_cuarentena"] >= MAX_CARTERAS_EN_CUARENTENA_POR_SLOT:
+        slot["cuarentena_hasta"] = time.time() + CUARENTENA_SLOT_SECONDS
+        slot["relanzar_en"] = None
+        log.error(f"[SUPERVISOR] Slot {slot['id']} EN CUARENTENA durante {CUARENTENA_SLOT_SECONDS // 60} min: "
+                  f"falla con cualquier cartera (última: wallet_{wallet_id}).")
+        if not any(s is not slot and s["process"] is slot["process"] for s in worker_slots):
+            detener_proceso(slot["process"]) # Su Chrome no debe seguir gastando recursos
+        return True
+
+    almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_CUARENTENA)
+    almacen_carteras.borrar_sesion(wallet_id)
+    slot["carteras_en_cuarentena"] += 1
+    slot["principal_wallet_id"] = obtener_cartera_de_rotacion() # Ya queda marcada EN_USO
+    log.error(f"[SUPERVISOR] wallet_{wallet_id} EN CUARENTENA tras {CRASHES_PARA_CUARENTENA} fallos seguidos en el slot "
+              f"{slot['id']}. Nueva cartera principal del slot: wallet_{slot['principal_wallet_id']}.")
+    return False
+
+def registrar_fallo(slot: dict, hermanos: list, worker_slots: list):
+    """
+    Cuenta un fallo de 'slot' y programa su relanzamiento tras el backoff (o lo pone
+    en cuarentena). 'hermanos' son los slots que caen con él (incluido él mismo, p. ej.
+    los de su navegador compartido): esperan lo mismo, pero el fallo solo cuenta para 'slot'.
+    """
+    slot["crashes"] += 1
+    if slot["crashes"] >= CRASHES_PARA_CUARENTENA and poner_en_cuarentena(slot, worker_slots):
+        hermanos = [s for s in hermanos if s is not slot]
+    if not hermanos:
+        return
+    espera = segundos_backoff(slot["crashes"])
+    for hermano in hermanos:
+        hermano["relanzar_en"] = time.time() + espera
+    ids = ", ".join(str(h["id"]) for h in hermanos)
+    motivo = f"{slot['crashes']} fallo(s) seguido(s) del slot {slot['id']}" if slot["crashes"] else "nueva cartera principal"
+    log.info(f"[SUPERVISOR] {'Slots' if len(hermanos) > 1 else 'Slot'} {ids}: relanzamiento dentro de {espera:.0f}s (backoff, {motivo}).")
+
+def ejecutar_relanzamientos(worker_slots: list, status_queue: Queue):
+    """Relanza los slots cuyo backoff ha vencido y saca de cuarentena los que ya cumplieron."""
+    ahora = time.time()
+    for slot in worker_slots:
+        if slot["cuarentena_hasta"] is not None and slot["cuarentena_hasta"] <= ahora:
+            slot["cuarentena_hasta"] = None
+            slot["carteras_en_cuarentena"] = 0
+            slot["relanzar_en"] = ahora
+            log.info(f"[SUPERVISOR] Slot {slot['id']} sale de cuarentena. Reintentando con wallet_{slot['principal_wallet_id']}...")
+        if slot["relanzar_en"] is None or slot["relanzar_en"] > ahora:
+            continue # Sin relanzamiento pendiente, o ya relanzado junto con otro slot de su navegador
+        slot["relanzar_en"] = None
+        log.info(f"[SUPERVISOR] Relanzando slot {slot['id']} con su cartera PRINCIPAL wallet_{slot['principal_wallet_id']}...")
+        if slot["conn"] is not None and slot["process"].is_alive():
+            reiniciar_slot(slot, status_queue) # Solo falló la cartera: mismo navegador
+        else:
+            relanzar_tras_crash(slot, worker_slots, status_queue)
+
+def segundos_hasta_proximo_relanzamiento(worker_slots: list) -> float:
+    """Cuánto puede dormir el supervisor antes de que venza un backoff o una cuarentena."""
+    momentos = [m for slot in worker_slots for m in (slot["relanzar_en"], slot["cuarentena_hasta"]) if m is not None]
+    return max(0, min(momentos) - time.time()) if momentos else MANAGER_SLEEP_SECONDS
+
+def resumen_slots(worker_slots: list) -> str:
+    """Resumen de estado de la flota: slots por situación y lo que está en backoff o en cuarentena."""
+    ahora = time.time()
+    cuenta = {"trabajando": 0, "arrancando": 0, "en backoff": 0, "en cuarentena": 0, "por lanzar": 0, "aparcados": 0}
+    detalles = []
+    for slot in worker_slots:
+        if slot["aparcado"]:
+            cuenta["aparcados"] += 1
+        elif slot["cuarentena_hasta"] is not None:
+            cuenta["en cuarentena"] += 1
+            detalles.append(f"Slot {slot['id']}: EN CUARENTENA {(slot['cuarentena_hasta'] - ahora) / 60:.0f} min más "
+                            f"(principal wallet_{slot['principal_wallet_id']})")
+        elif slot["relanzar_en"] is not None:
+            cuenta["en backoff"] += 1
+            detalles.append(f"Slot {slot['id']}: se relanza en {max(0, slot['relanzar_en'] - ahora):.0f}s "
+                            f"({slot['crashes']} fallos seguidos)")
+        elif slot["process"] is None:
+            cuenta["por lanzar"] += 1
+        elif slot["arrancando_desde"] is not None:
+            cuenta["arrancando"] += 1
+        else:
+            cuenta["trabajando"] += 1
+    lineas = [f"[ESTADO] {len(worker_slots)} slots: " + ", ".join(f"{n} {estado}" for estado, n in cuenta.items() if n)]
+    medidos = [slot["rss_mb"] for slot in worker_slots if slot["rss_mb"] and not slot["aparcado"]]
+    if medidos:
+        lineas[0] += f". RSS por slot: mediana {statistics.median(medidos):.0f} MB, máx. {max(medidos):.0f} MB"
+    lineas += [f"  {detalle}" for detalle in detalles]
+    en_cuarentena = almacen_carteras.listar_ids(almacen_carteras.ESTADO_CUARENTENA)
+    if en_cuarentena:
+        lineas.append(f"  Carteras en cuarentena ({len(en_cuarentena)}): "
+                      + ", ".join(f"wallet_{wallet_id}" for wallet_id in en_cuarentena[-20:])
+                      + (" ..." if len(en_cuarentena) > 20 else ""))
+    return "\n".join(lineas)
+
+# --- Autoescalado por memoria y CPU ---
+
+def nuevo_autoescalador(maximo: int) -> dict:
+    """Estado del autoescalado: próximo momento de decidir, tope de slots activos y RSS típico de un slot."""
+    return {"proximo": time.time() + INTERVALO_AUTOESCALADO_SECONDS, "maximo": maximo, "rss_slot_mb": None}
+
+def medir_rss_slots(worker_slots: list):
+    """Mide (una lectura de /proc) el RSS del árbol de procesos de cada slot vivo y lo guarda en slot["rss_mb"]."""
+    vivos = [slot for slot in worker_slots if slot["process"] is not None and slot["process"].is_alive()]
+    rss = procesos_navegador.rss_arboles_mb([slot["process"].pid for slot in vivos])
+    for slot in vivos:
+        slot["rss_mb"] = rss.get(slot["process"].pid)
+
+def elegir_slots_para_aparcar(activos: list, cantidad: int) -> list:
+    """Los 'cantidad' slots que menos se pierde aparcando: sin lanzar, caídos, arrancando y, después, los últimos."""
+    def coste(slot):
+        if slot["process"] is None:
+            return (0, -slot["id"])
+        if slot_en_espera(slot):
+            return (1, -slot["id"])
+        if slot["arrancando_desde"] is not None:
+            return (2, -slot["id"])
+        return (3, -slot["id"])
+    return sorted(activos, key=coste)[:cantidad]
+
+def aparcar_slot(sup: dict, slot: dict, motivo: str):
+    """
+    Desactiva un slot: detiene su proceso (y su navegador), lo saca del lanzamiento
+    y del reinicio escalonado, y devuelve a la cola (NUEVAS) las carteras que seguían
+    EN_USO; las RESUELTAS o en CUARENTENA se quedan como están.
+    """
+    slot["aparcado"] = True
+    slot["relanzar_en"] = slot["cuarentena_hasta"] = None
+    slot["arrancando_desde"] = slot["rotando_desde"] = None
+    slot["rss_mb"] = None
+    sup["planificador"]["pendientes"].pop(slot["id"], None)
+    sup["planificador"]["en_curso"].pop(slot["id"], None)
+    lanzador = sup["lanzador"]
+    lanzador["por_lanzar"] = [[s for s in grupo if s is not slot] for grupo in lanzador["por_lanzar"]]
+    lanzador["por_lanzar"] = [grupo for grupo in lanzador["por_lanzar"] if grupo]
+    if slot["process"] is not None:
+        detener_proceso(slot["process"])
+    liberadas = sorted(wallet_id for wallet_id in {slot["principal_wallet_id"], slot["current_wallet_id"]}
+                       if liberar_cartera(wallet_id))
+    devueltas = ", ".join(f"wallet_{wallet_id}" for wallet_id in liberadas) or "Ninguna cartera"
+    devueltas += " vuelven a la cola" if len(liberadas) > 1 else " vuelve a la cola"
+    log.warning(f"[AUTOESCALADO] Slot {slot['id']} aparcado ({motivo}). {devueltas}.")
+
+def activar_slot(sup: dict, motivo: str):
+    """Activa un slot más (reutiliza uno aparcado o crea uno nuevo) con una cartera principal de la cola."""
+    worker_slots = sup["worker_slots"]
+    aparcados = [slot for slot in worker_slots if slot["aparcado"]]
+    wallet_id = obtener_cartera_de_rotacion() # Ya queda marcada EN_USO
+    if aparcados:
+        slot = aparcados[0]
+        slot.update(nuevo_slot(slot["id"], wallet_id)) # Estado limpio, sin rastro de la etapa anterior
+    else:
+        slot = nuevo_slot(max((s["id"] for s in worker_slots), default=-1) + 1, wallet_id)
+        worker_slots.append(slot)
+        sup["slots_por_id"][slot["id"]] = slot
+    log.info(f"[AUTOESCALADO] Activando slot {slot['id']} con wallet_{wallet_id} ({motivo}).")
+    lanzar_grupo([slot], sup["status_queue"])
+
+def autoescalar(sup: dict):
+    """
+    Mide el RSS por slot y, según la memoria libre y la carga de CPU, aparca slots
+    (tantos como haga falta para volver a MEMORIA_LIBRE_MINIMA_MB) o activa uno más.
+    """
+    auto = sup["autoescalador"]
+    auto["proximo"] = time.time() + INTERVALO_AUTOESCALADO_SECONDS
+    worker_slots = sup["worker_slots"]
+    medir_rss_slots(worker_slots)
+    medidos = [slot["rss_mb"] for slot in worker_slots if slot["rss_mb"] and not slot["aparcado"]]
+    if medidos:
+        auto["rss_slot_mb"] = statistics.median(medidos)
+    rss_slot = auto["rss_slot_mb"] or RSS_SLOT_ESTIMADO_MB
+
+    memoria, carga = leer_memoria_libre_mb(), leer_carga_cpu()
+    if memoria is None:
+        return # Sin /proc/meminfo (p. ej. Windows) no hay con qué decidir
+    activos = [slot for slot in worker_slots if not slot["aparcado"]]
+    estado = f"{memoria:.0f} MB libres, carga {f'{carga:.2f}' if carga is not None else '?'}/núcleo, ~{rss_slot:.0f} MB por slot"
+
+    if memoria < MEMORIA_LIBRE_MINIMA_MB or (carga is not None and carga > CARGA_CPU_MAXIMA):
+        sobran = math.ceil((MEMORIA_LIBRE_MINIMA_MB - memoria) / rss_slot) if memoria < MEMORIA_LIBRE_MINIMA_MB else 1
+        sobran = min(max(sobran, 1), len(activos) - MIN_SLOTS_AUTOESCALADO)
+        for slot in elegir_slots_para_aparcar(activos, sobran):
+            aparcar_slot(sup, slot, estado)
+    elif (len(activos) < auto["maximo"] and memoria - rss_slot >= MEMORIA_LIBRE_OBJETIVO_MB
+          and (carga is None or carga < CARGA_CPU_OBJETIVO)
+          and not sup["lanzador"]["por_lanzar"] and navegadores_arrancando(worker_slots) == 0):
+        activar_slot(sup, estado)
+
+# --- Instantánea del estado (--reanudar) ---
+
+def estado_para_instantanea(sup: dict) -> dict:
+    """Lo que se guarda del supervisor: los campos persistentes de cada slot y el tope del autoescalado."""
+    return {
+        "version": VERSION_ESTADO,
+        "slots": [{campo: slot[campo] for campo in CAMPOS_ESTADO_SLOT} for slot in sup["worker_slots"]],
+        "maximo_autoescalado": sup["autoescalador"]["maximo"] if sup["autoescalador"] is not None else None,
+    }
+
+def guardar_instantanea(sup: dict, ruta=None):
+    """
+    Reescribe la instantánea si el estado cambió desde la última: archivo temporal,
+    fsync y os.replace, así una caída (incluso del sistema) deja la anterior o la nueva, nunca una a medias.
+    """
+    estado = estado_para_instantanea(sup)
+    if estado == sup["ultima_instantanea"]:
+        return
+    ruta = ruta or ARCHIVO_ESTADO
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({**estado, "momento": round(time.time(), 3)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except OSError as e:
+        log.warning(f"No se pudo guardar el estado del supervisor en '{ruta}': {e}")
+        return
+    sup["ultima_instantanea"] = estado
+
+def cargar_instantanea(ruta=None):
+    """Lee la instantánea del supervisor. Devuelve None si no existe, no se puede leer o es de otro formato."""
+    ruta = ruta or ARCHIVO_ESTADO
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            instantanea = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"No se pudo leer el estado del supervisor '{ruta}': {e}")
+        return None
+    if (not isinstance(instantanea, dict) or instantanea.get("version") != VERSION_ESTADO
+            or not instantanea.get("slots")
+            or not all(isinstance(slot, dict) and set(CAMPOS_ESTADO_SLOT) <= set(slot) for slot in instantanea["slots"])):
+        log.warning(f"El estado del supervisor '{ruta}' no tiene el formato esperado (versión {VERSION_ESTADO}). Se ignora.")
+        return None
+    return instantanea
+
+def restaurar_slots(instantanea: dict) -> list:
+    """
+    Reconstruye los slots de una instantánea (aún sin proceso). Cada slot vuelve
+    con su cartera actual si sigue EN_USO en el almacén; si no (resuelta, borrada
+    o devuelta a la cola), con su principal. Las cuarentenas vencidas las levanta
+    ejecutar_relanzamientos en el primer paso del bucle.
+    """
+    worker_slots = []
+    for guardado in instantanea["slots"]:
+        slot = nuevo_slot(guardado["id"], guardado["principal_wallet_id"])
+        slot.update({campo: guardado[campo] for campo in CAMPOS_ESTADO_SLOT})
+        if slot["current_wallet_id"] != slot["principal_wallet_id"]:
+            cartera = almacen_carteras.obtener_cartera(slot["current_wallet_id"])
+            if cartera is None or cartera.get("status") != almacen_carteras.ESTADO_EN_USO:
+                slot["current_wallet_id"] = slot["principal_wallet_id"]
+        worker_slots.append(slot)
+    return worker_slots
+
+def liberar_carteras_sin_slot(worker_slots: list):
+    """
+    Devuelve a la cola las carteras EN_USO que no son la principal ni la actual de
+    ningún slot activo: las de rotación que se reservaron justo antes de que cayera
+    el supervisor anterior. Se llama una vez, con los slots ya preparados.
+    """
+    en_slots = {slot[campo] for slot in worker_slots if not slot["aparcado"]
+                for campo in ("principal_wallet_id", "current_wallet_id")}
+    liberadas = [wallet_id for wallet_id in almacen_carteras.listar_ids(almacen_carteras.ESTADO_EN_USO)
+                 if wallet_id not in en_slots and liberar_cartera(wallet_id)]
+    if liberadas:
+        log.info(f"{len(liberadas)} carteras EN_USO sin slot vuelven a la cola: "
+                 + ", ".join(f"wallet_{wallet_id}" for wallet_id in liberadas[:20]) + (" ..." if len(liberadas) > 20 else ""))
+
+# --- Bucle del supervisor ---
+
+def nuevo_supervisor(principal_wallets: list, instantanea: dict = None) -> dict:
+    """
+    Estado del supervisor para las carteras principales: cola de estado, slots (se
+    lanzan desde el propio bucle), lanzador, planificador de reinicios, métricas y,
+    con AUTOESCALADO, el autoescalador. Con 'instantanea' (--reanudar) los slots
+    salen de ella y solo se lanzan los que no estaban aparcados ni en cuarentena.
+    """
+    if instantanea is None:
+        worker_slots, lanzador = preparar_lanzamiento(principal_wallets)
+    else:
+        worker_slots = restaurar_slots(instantanea)
+        lanzador = agrupar_para_lanzar([slot for slot in worker_slots
+                                        if not slot["aparcado"] and slot["cuarentena_hasta"] is None])
+    autoescalador = None
+    if AUTOESCALADO and REUTILIZAR_NAVEGADORES and CARTERAS_POR_NAVEGADOR > 1:
+        log.warning("AUTOESCALADO necesita CARTERAS_POR_NAVEGADOR = 1 (un navegador por slot). Desactivado.")
+    elif AUTOESCALADO:
+        autoescalador = nuevo_autoescalador(MAX_SLOTS_AUTOESCALADO or (instantanea or {}).get("maximo_autoescalado")
+                                            or len(worker_slots))
+        log.info(f"[AUTOESCALADO] Activo: entre {MIN_SLOTS_AUTOESCALADO} y {autoescalador['maximo']} slots, "
+                 f">= {MEMORIA_LIBRE_MINIMA_MB} MB libres (objetivo {MEMORIA_LIBRE_OBJETIVO_MB} MB), "
+                 f"carga <= {CARGA_CPU_MAXIMA}/núcleo (objetivo {CARGA_CPU_OBJETIVO}).")
+    status_queue = Queue()
+    return {
+        "status_queue": status_queue,
+        "lector_estados": lector_de_cola(status_queue), # Lo que espera el bucle (None = mirar la cola cada poco)
+        "worker_slots": worker_slots,
+        "slots_por_id": {slot["id"]: slot for slot in worker_slots},
+        "lanzador": lanzador,
+        "planificador": nuevo_planificador(),
+        "metricas": metricas_login.nuevas_metricas(), # Latencia por paso del wizard (Prometheus + JSONL)
+        "proximo_resumen": time.time() + INTERVALO_RESUMEN_SECONDS, # Próximo resumen de estado en el log
+        "autoescalador": autoescalador,                # None = número de slots fijo
+        "ciclos": 0,                                  # Iteraciones del bucle
+        "segundos_ocupado": 0.0,                      # Tiempo atendiendo eventos, sin contar la espera
+        "ultima_instantanea": None,                   # Último estado guardado en ARCHIVO_ESTADO
+    }
+
+def lector_de_cola(cola):
+    """
+    Extremo de lectura de una multiprocessing.Queue sobre el que puede esperar
+    multiprocessing.connection.wait, o None. Queue no lo expone de forma pública
+    (en CPython es el atributo interno _reader): este es el único sitio que lo toca.
+    Con None el supervisor mira la cola cada SONDEO_ESTADOS_SECONDS.
+    """
+    lector = getattr(cola, "_reader", None)
+    return lector if callable(getattr(lector, "fileno", None)) else None
+
+def paso_supervisor(sup: dict):
+    """Una iteración del bucle: espera al siguiente evento (o tarea programada) y lo atiende."""
+    inicio = time.perf_counter()
+    status_queue, worker_slots, slots_por_id = sup["status_queue"], sup["worker_slots"], sup["slots_por_id"]
+
+    # Lanzar los navegadores pendientes que permita el presupuesto de recursos
+    espera_lanzamiento = avanzar_lanzamiento(sup["lanzador"], worker_slots, status_queue)
+
+    # Bloquear hasta que haya un mensaje de estado, un evento de un navegador,
+    # la muerte de un proceso (su sentinel) o le toque a un reinicio o lanzamiento.
+    # (Los procesos muertos que esperan su backoff o están en cuarentena no se vigilan: su sentinel ya está listo)
+    vigilados = [slot for slot in worker_slots
+                 if slot["process"] is not None and not (slot_en_espera(slot) and not slot["process"].is_alive())]
+    conexiones = {slot["conn"] for slot in vigilados if slot["conn"] is not None}
+    procesos = {slot["process"].sentinel: slot["process"] for slot in vigilados}
+    espera = min(MANAGER_SLEEP_SECONDS, segundos_hasta_proximo_reinicio(sup["planificador"]), espera_lanzamiento,
+                 segundos_hasta_proximo_relanzamiento(worker_slots), max(0, sup["proximo_resumen"] - time.time()))
+    if sup["autoescalador"] is not None:
+        espera = min(espera, max(0, sup["autoescalador"]["proximo"] - time.time()))
+    lector = sup["lector_estados"]
+    if lector is None:
+        espera = min(espera, SONDEO_ESTADOS_SECONDS)
+    antes_de_esperar = time.perf_counter()
+    listos = esperar_eventos([*([lector] if lector is not None else []), *conexiones, *procesos], timeout=espera)
+    despues_de_esperar = time.perf_counter()
+
+    # A. Mensajes de estado: los timers programan reinicios y los inicios de sesión los cierran
+    if lector is None or lector in listos:
+        procesar_estados(status_queue, slots_por_id, sup["planificador"], sup["metricas"])
+        metricas_login.exportar_si_toca(sup["metricas"])
+
+    # B. Eventos de los navegadores persistentes (ROTACIÓN sin relanzar Chrome)
+    for conn in conexiones:
+        if conn in listos:
+            procesar_eventos_navegador(conn, slots_por_id, status_queue)
+
+    # C. Procesos que han terminado: rotación (modo clásico) o crash
+    for sentinel, proceso in procesos.items():
+        if sentinel in listos:
+            for slot in worker_slots:
+                if slot["process"] is proceso:
+                    procesar_fin_de_proceso(slot, worker_slots, status_queue)
+
+    # D. Reinicio escalonado: los slots cuyo challenge terminó, en oleadas
+    ejecutar_reinicios(sup["planificador"], worker_slots, status_queue)
+
+    # E. Relanzamientos tras fallos cuyo backoff (o cuarentena) ha vencido
+    ejecutar_relanzamientos(worker_slots, status_queue)
+
+    # F. Autoescalado: aparcar o activar slots según la memoria y la CPU
+    if sup["autoescalador"] is not None and time.time() >= sup["autoescalador"]["proximo"]:
+        autoescalar(sup)
+
+    if time.time() >= sup["proximo_resumen"]:
+        if sup["autoescalador"] is None:
+            medir_rss_slots(worker_slots) # Con autoescalado ya se mide en cada decisión
+        log.info(resumen_slots(worker_slots))
+        sup["proximo_resumen"] = time.time() + INTERVALO_RESUMEN_SECONDS
+
+    # Instantánea del estado (solo se escribe si algo cambió en este paso)
+    guardar_instantanea(sup)
+
+    sup["ciclos"] += 1
+    sup["segundos_ocupado"] += (antes_de_esperar - inicio) + (time.perf_counter() - despues_de_esperar)
+
 # --- Fin Funciones de Ayuda ---
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lanzador de bots del wizard (supervisor + workers)")
+    parser.add_argument("--slots", type=int, help="slots (bots) a lanzar; sin él se pregunta por la terminal")
+    parser.add_argument("--config", help="archivo TOML con la configuración (ver configuracion.py)")
+    parser.add_argument("--set", dest="asignaciones", action="append", default=[], metavar="SECCION.CONSTANTE=VALOR",
+                        help="cambia una constante, p. ej. worker.monitor_poll_seconds=15 (repetible; gana al archivo)")
+    parser.add_argument("--mostrar-config", action="store_true", help="muestra la configuración efectiva en TOML y sale")
+    parser.add_argument("--reanudar", "--resume", action="store_true",
+                        help=f"reconstruye los slots desde la instantánea del supervisor ({ARCHIVO_ESTADO}) tras una caída")
+    args = parser.parse_args()
+    if args.slots is not None and args.slots < 1:
+        parser.error("--slots debe ser un número positivo")
+
+    # 0. Configuración: constantes por defecto < archivo TOML < --set
     try:
-        set_start_method('spawn')
-    except RuntimeError:
-        pass 
+        generales, ajustes = cargar_configuracion(args.config, args.asignaciones)
+    except ValueError as e:
+        log.error(f"Error fatal: {e}")
+        sys.exit(2)
+    cantidad_a_lanzar = args.slots or generales.get("slots") or 0
+    if args.mostrar_config:
+        print(configuracion.a_toml(configuracion.efectiva(modulos_configurables()), {"slots": cantidad_a_lanzar} if cantidad_a_lanzar else None), end="")
+        sys.exit(0)
+    instantanea = None
+    if args.reanudar:
+        instantanea = cargar_instantanea()
+        if instantanea is None:
+            log.warning(f"[REANUDAR] No hay un estado válido en '{ARCHIVO_ESTADO}'. Arranque normal.")
+    if not cantidad_a_lanzar and instantanea is None and not sys.stdin.isatty():
+        log.error("Error fatal: sin terminal hay que indicar cuántos slots lanzar (--slots o 'slots' en la configuración).")
+        sys.exit(2)
+
+    log.info(f"Método de arranque de los procesos: {configurar_arranque()}")
+
+    if worker_bots.PERFIL_NAVEGADOR not in PERFILES_NAVEGADOR:
+        log.error(f"Error fatal: PERFIL_NAVEGADOR='{worker_bots.PERFIL_NAVEGADOR}' no es válido (usa uno de {PERFILES_NAVEGADOR}).")
+        sys.exit(1)
+    log.info(f"Perfil del navegador: {worker_bots.PERFIL_NAVEGADOR}")
+
+    # 0. Resolver chromedriver una sola vez para todos los workers
+    try:
+        _ruta_chromedriver = resolver_chromedriver(CHROMEDRIVER_PATH)
+    except RuntimeError as e:
+        log.error(f"Error fatal: {e}. Define CHROMEDRIVER_PATH con una ruta válida para el modo offline.")
+        sys.exit(1)
+
+    # 0b. Logs de los workers: una cola hacia un único listener (JSONL + consola con límite por slot)
+    _cola_logs, listener_logs = registro_logs.iniciar()
+    # Configuración efectiva: los cambios en la consola y la configuración completa en el JSONL
+    log.info(f"[CONFIG] Cambios respecto a los valores por defecto: {configuracion.resumen_cambios(ajustes)}",
+             extra={"paso": "config", "campos": {"archivo": args.config, "slots": cantidad_a_lanzar or None,
+                                                 "config": configuracion.efectiva(modulos_configurables())}})
 
     # 1. Preguntar y gestionar carteras
-    cantidad_a_lanzar = 0
-    while True:
+    almacen_carteras.importar_si_vacio() # Migración única desde pool_de_carteras/wallet_N.json
+    procesos_navegador.barrer_huerfanos() # chromedriver/Chrome que dejara vivos una ejecución anterior
+    if instantanea is not None:
+        # Reanudar: los slots, sus carteras y sus cuarentenas salen de la instantánea; la cola
+        # de carteras (NUEVAS) y el contador de IDs ya están en carteras.db. Sin preguntar ni recorrer el pool.
+        principal_wallets = [slot["principal_wallet_id"] for slot in instantanea["slots"]]
+        log.info(f"[REANUDAR] Estado de hace {(time.time() - instantanea.get('momento', time.time())) / 60:.0f} min: "
+                 f"{len(principal_wallets)} slots ({sum(slot['aparcado'] for slot in instantanea['slots'])} aparcados). "
+                 f"{almacen_carteras.contar_carteras(almacen_carteras.ESTADO_NUEVA)} carteras nuevas listas para rotación.")
+        if args.slots:
+            log.warning("[REANUDAR] Se ignora --slots: el número de slots es el de la instantánea.")
+    while instantanea is None and cantidad_a_lanzar <= 0:
         try:
             cantidad_a_lanzar = int(input("¿Cuántos procesos (bots) quieres lanzar en TOTAL? "))
-            if cantidad_a_lanzar > 0:
-                log.info(f"Asegurando que existan al menos {cantidad_a_lanzar} carteras...")
-                gestionar_pool_de_carteras(cantidad_a_lanzar)
-                break
-            else:
+            if cantidad_a_lanzar <= 0:
                 log.warning("Por favor, introduce un número positivo.")
         except ValueError:
             log.warning("Entrada no válida. Introduce un número.")
+    if instantanea is None:
+        log.info(f"Asegurando que existan al menos {cantidad_a_lanzar} carteras utilizables como principales...")
+        utilizables = len(almacen_carteras.listar_ids(ESTADOS_PRINCIPAL, limite=cantidad_a_lanzar))
+        gestionar_pool_de_carteras(almacen_carteras.contar_carteras() + cantidad_a_lanzar - utilizables)
 
-    # 2. Preparar la lista inicial y la cola de carteras
-    try:
-        archivos_disponibles = [os.path.join(CARTERAS_DIR, f) 
-                                for f in os.listdir(CARTERAS_DIR) 
-                                if f.startswith('wallet_') and f.endswith('.json')]
-        
-        archivos_disponibles.sort(key=lambda x: int(os.path.basename(x).split('_')[1].split('.')[0])) 
+    # 2. Preparar la lista inicial y la cola de carteras (al reanudar, las principales vienen de la instantánea)
+    if instantanea is None:
+        try:
+            # Ya ordenados por ID; sin las RESUELTAS ni las que están en CUARENTENA (la cuarentena sobrevive al reinicio)
+            ids_disponibles = almacen_carteras.listar_ids(ESTADOS_PRINCIPAL, limite=cantidad_a_lanzar)
         
-        # Estas son las N carteras "principales" (serán las únicas que se relanzarán después del reinicio global)
-        principal_wallets = archivos_disponibles[:cantidad_a_lanzar]
+            # Estas son las N carteras "principales" (con ellas vuelve a arrancar cada slot tras un reinicio o crash)
+            principal_wallets = ids_disponibles[:cantidad_a_lanzar]
         
-        # Cola de carteras para rotación individual
-        wallet_queue = [f for f in archivos_disponibles if f not in principal_wallets]
-        log.info(f"{len(wallet_queue)} carteras en cola de reemplazo.")
-
-        next_wallet_id_to_gen = len(archivos_disponibles) + 1
+            # Las principales no deben salir nunca como cartera de rotación
+            for wallet_id in principal_wallets:
+                almacen_carteras.marcar_estado(wallet_id, almacen_carteras.ESTADO_EN_USO)
+            log.info(f"{almacen_carteras.contar_carteras(almacen_carteras.ESTADO_NUEVA)} carteras nuevas listas para rotación.")
         
-        if len(principal_wallets) < cantidad_a_lanzar:
-            log.error(f"Error fatal: No se pudieron preparar {cantidad_a_lanzar} carteras. Saliendo.")
-            sys.exit()
+            if len(principal_wallets) < cantidad_a_lanzar:
+                log.error(f"Error fatal: No se pudieron preparar {cantidad_a_lanzar} carteras. Saliendo.")
+                sys.exit()
             
-    except Exception as e:
-        log.error(f"Error al preparar las carteras: {e}.")
-        traceback.print_exc()
-        sys.exit()
+        except Exception as e:
+            log.error(f"Error al preparar las carteras: {e}.")
+            traceback.print_exc()
+            sys.exit()
 
-    # --- BUCLE DE SUPERVISOR PRINCIPAL ---
-    while True:
-        status_queue = Queue()
-        worker_slots = []
-        
+    # 2b. Caché de firmas: firmar por adelantado el texto de términos conocido (el login no tendrá que hacerlo)
+    if PREFIRMAR_AL_ARRANCAR:
         try:
-            # 3. Lanzar N procesos iniciales (solo las principales)
-            worker_slots = launch_workers(principal_wallets, status_queue, DELAY_BETWEEN_LAUNCHES_SECONDS)
+            prefirmar_carteras()
+        except Exception as e:
+            log.warning(f"No se pudo pre-firmar el pool (cada worker firmará al hacer login): {e}")
 
-            log.info(f"--- ¡{len(worker_slots)} workers están ahora ejecutándose! ---")
-            log.info(f"Iniciando bucle del Supervisor (comprobando cada {MANAGER_SLEEP_SECONDS}s).")
-            
-            global_restart_triggered = False
+    # 3. Productor de carteras en segundo plano (la rotación nunca bloquea al supervisor)
+    evento_parada_productor = Event()
+    productor = Process(target=run_productor_carteras, args=(MINIMO_CARTERAS_LISTAS, evento_parada_productor, _ajustes))
+    productor.start()
 
-            # 4. Bucle de Monitoreo (Manager Loop)
-            while not global_restart_triggered:
-                
-                # A. Comprobar la cola de estado para un reinicio GLOBAL
-                timers_nearing_zero = 0
-                temp_status_report = []
-                
-                # Consumimos todos los mensajes de la cola desde la última comprobación
-                while not status_queue.empty():
-                    try:
-                        status = status_queue.get_nowait()
-                        temp_status_report.append(status)
-                        
-                        # Contamos los workers que están a punto de terminar (criterio global)
-                        timer_sec = status.get("timer_seconds", 9999)
-                        if timer_sec < RESTART_TRIGGER_SECONDS and timer_sec >= 0:
-                            timers_nearing_zero += 1
-                            
-                    except Empty:
-                        break # La cola está vacía
-
-                # B. Activar el reinicio GLOBAL si se cumple la condición
-                if timers_nearing_zero >= RESTART_TRIGGER_COUNT:
-                    log.info(f"[SUPERVISOR] ¡REINICIO GLOBAL ACTIVADO! ({timers_nearing_zero} workers están a < {RESTART_TRIGGER_SECONDS}s).")
-                    global_restart_triggered = True
-                    break # Salir del bucle de monitoreo
-
-                # C. Comprobar si algún worker individual crasheó o se cerró (ROTACIÓN)
-                for slot in worker_slots:
-                    if not slot["process"].is_alive():
-                        exit_code = slot["process"].exitcode
-                        old_wallet = os.path.basename(slot["current_wallet_file"]).split('.')[0]
-                        slot_id = slot["id"]
-
-                        # CASO 1: ÉXITO (Challenge Resuelto, Exit Code 0)
-                        if exit_code == EXIT_CODE_SOLVED:
-                            log.info(f"Slot {slot_id} ({old_wallet}) completó challenge. ROTANDO a NUEVA wallet...")
-                            
-                            if wallet_queue:
-                                new_wallet_file = wallet_queue.pop(0)
-                                log.info(f"Siguiente cartera de la cola: {os.path.basename(new_wallet_file)}")
-                            else:
-                                log.info(f"Cola de carteras vacía. Generando nueva cartera: wallet_{next_wallet_id_to_gen}...")
-                                gestionar_pool_de_carteras(next_wallet_id_to_gen)
-                                new_wallet_file = os.path.join(CARTERAS_DIR, f"wallet_{next_wallet_id_to_gen}.json")
-                                next_wallet_id_to_gen += 1
-                            
-                            # Lanzar nuevo proceso en el slot
-                            p = Process(target=run_bot_worker, args=(new_wallet_file, status_queue))
-                            p.start()
-                            slot["process"] = p
-                            slot["current_wallet_file"] = new_wallet_file # Actualiza la wallet actual
-
-                        # CASO 2: CRASH (Cualquier otro Exit Code)
-                        else:
-                            log.warning(f"Slot {slot_id} ({old_wallet}) crasheó (Exitcode: {exit_code}). REINICIANDO con la misma cartera PRINCIPAL...")
-                            
-                            # Siempre se reinicia con la wallet PRINCIPAL del slot
-                            p = Process(target=run_bot_worker, args=(slot["principal_wallet_file"], status_queue))
-                            p.start()
-                            slot["process"] = p
-                            slot["current_wallet_file"] = slot["principal_wallet_file"] # Vuelve a la principal
-
-                time.sleep(MANAGER_SLEEP_SECONDS)
-
-            # 5. Salir del bucle de monitoreo para ejecutar el reinicio global
-            log.info("[SUPERVISOR] Iniciando secuencia de reinicio global...")
-            shutdown_all_workers(worker_slots)
-            run_chrome_kill()
-            log.info("[SUPERVISOR] Esperando 60 segundos para que el nuevo challenge se estabilice...")
-            time.sleep(60)
-            wallet_queue = [f for f in archivos_disponibles if f not in principal_wallets]
-            log.info("[SUPERVISOR] --- REINICIANDO EL CICLO ---")
-            # El bucle 'while True:' principal se repetirá
-
-        except KeyboardInterrupt:
-            # --- CIERRE LIMPIO ---
-            log.info("\n[SUPERVISOR] Cierre por Ctrl+C detectado. Dando tiempo a los workers para cerrar limpiamente...")
-            shutdown_all_workers(worker_slots)
-            run_chrome_kill()
-            log.info("[SUPERVISOR] Todos los workers han sido detenidos. Saliendo.")
-            break
-            
-        except Exception as e:
-            log.error(f"Error fatal en el Supervisor: {e}")
-            traceback.print_exc()
-            log.info("Intentando limpieza final forzada...")
-            shutdown_all_workers(worker_slots)
-            run_chrome_kill()
-            break
\ No newline at end of file
+    # --- BUCLE DE SUPERVISOR PRINCIPAL ---
+    # 4. Preparar los N slots iniciales (solo las principales, o los de la instantánea); se lanzan desde el propio bucle
+    supervisor = nuevo_supervisor(principal_wallets, instantanea)
+    liberar_carteras_sin_slot(supervisor["worker_slots"])
+    worker_slots = supervisor["worker_slots"]
+    metricas = supervisor["metricas"]
+
+    try:
+        log.info("Iniciando bucle del Supervisor (dirigido por eventos, reinicio escalonado por slot).")
+
+        # 5. Bucle de Monitoreo (Manager Loop)
+        while True:
+            paso_supervisor(supervisor)
+
+    except KeyboardInterrupt:
+        # --- CIERRE LIMPIO ---
+        log.info("\n[SUPERVISOR] Cierre por Ctrl+C detectado. Dando tiempo a los workers para cerrar limpiamente...")
+        shutdown_all_workers(worker_slots)
+        detener_productor(productor, evento_parada_productor)
+        procesos_navegador.barrer_huerfanos()
+        log.info(resumen_slots(worker_slots))
+        if metricas["pasos"]:
+            metricas_login.exportar_prometheus(metricas)
+            log.info(f"[SUPERVISOR] Latencia del login por paso (del más lento al más rápido):\n{metricas_login.resumen(metricas)}")
+        log.info("[SUPERVISOR] Todos los workers han sido detenidos. Saliendo.")
+        registro_logs.detener(listener_logs)
+
+    except Exception as e:
+        log.error(f"Error fatal en el Supervisor: {e}")
+        traceback.print_exc()
+        log.info("Intentando limpieza final forzada...")
+        shutdown_all_workers(worker_slots)
+        detener_productor(productor, evento_parada_productor)
+        procesos_navegador.barrer_huerfanos()
+        registro_logs.detener(listener_logs)
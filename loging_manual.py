@@ -1,12 +1,10 @@
-import os
-import json
 import traceback
 import logging
 from pycardano import PaymentSigningKey
 from pycardano.cip import cip8
+import almacen_carteras
 
 # --- Configuración ---
-CARTERAS_DIR = "pool_de_carteras"
 # Configuración de Logging simple para esta herramienta
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 log = logging.getLogger()
@@ -38,24 +36,24 @@ def iniciar_sesion_manual():
     
     # 1. Solicitar el ID de la cartera
     wallet_id = input("Introduce el ID de la cartera a cargar (ej: 1, 5, 20): ").strip()
-    wallet_filename = f"wallet_{wallet_id}.json"
-    wallet_file_path = os.path.join(CARTERAS_DIR, wallet_filename)
+    almacen_carteras.importar_si_vacio() # Por si aún se usa el antiguo pool_de_carteras/
     
-    if not os.path.exists(wallet_file_path):
-        log.error(f"Error: No se encontró el archivo '{wallet_file_path}'. Asegúrate de que el ID es correcto.")
+    try:
+        wallet_data = almacen_carteras.obtener_cartera(int(wallet_id))
+    except ValueError:
+        wallet_data = None
+    if wallet_data is None:
+        log.error(f"Error: No se encontró la cartera '{wallet_id}' en '{almacen_carteras.ALMACEN_DB}'. Asegúrate de que el ID es correcto.")
         return
 
     # 2. Cargar datos de la cartera
     try:
-        with open(wallet_file_path, 'r') as f:
-            wallet_data = json.load(f)
-        
         address = wallet_data.get("address")
         public_key = wallet_data.get("public_key_hex")
         private_key_hex = wallet_data.get("payment_private_key_hex")
         
         if not address or not public_key or not private_key_hex:
-            log.error("Error: El archivo JSON de la cartera está incompleto (faltan claves).")
+            log.error("Error: Los datos de la cartera están incompletos (faltan claves).")
             return
             
         private_key_bytes = bytes.fromhex(private_key_hex)
@@ -67,7 +65,7 @@ def iniciar_sesion_manual():
         log.info("---------------------------------------------------------------------------------------------------")
 
     except Exception as e:
-        log.error(f"Error al cargar o procesar el archivo de cartera: {e}")
+        log.error(f"Error al cargar o procesar la cartera: {e}")
         traceback.print_exc()
         return
 
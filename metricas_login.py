@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import math
+import time
+import logging
+from collections import deque
+
+# =============================================================================
+# MÉTRICAS DEL LOGIN (latencia por paso del wizard)
+# Los workers miden cada paso del wizard y envían las mediciones al supervisor
+# por status_queue ({"tipo": "pasos_login", "pasos": [...]}). Aquí se agregan en
+# histogramas y percentiles y se exportan como texto de Prometheus y JSONL.
+# =============================================================================
+
+log = logging.getLogger()
+
+ARCHIVO_PROMETHEUS = "metricas_login.prom"   # Para el textfile collector de node_exporter (se reescribe entero)
+ARCHIVO_JSONL = "metricas_login.jsonl"       # Una línea por paso medido (solo se añade)
+INTERVALO_EXPORTACION_SECONDS = 60           # Cada cuánto se reescribe el archivo de Prometheus
+LIMITES_HISTOGRAMA = (0.25, 0.5, 1, 2, 5, 10, 20, 40, 60, 120) # Buckets (segundos) de los histogramas
+MUESTRAS_POR_PASO = 2000                     # Últimas duraciones guardadas por paso para los percentiles
+PERCENTILES = (50, 90, 99)
+
+PASO_TOTAL = "login_total" # Paso sintético: suma de todos los pasos de un login
+PASO_ROTACION = "rotacion"  # Medido por el supervisor: de "resuelto" al login de la siguiente cartera
+
+
+def nuevas_metricas() -> dict:
+    """Estado vacío de las métricas: paso -> histograma, contadores por resultado y muestras."""
+    return {"pasos": {}, "proxima_exportacion": time.time() + INTERVALO_EXPORTACION_SECONDS}
+
+
+def _paso(metricas, nombre):
+    if nombre not in metricas["pasos"]:
+        metricas["pasos"][nombre] = {
+            "buckets": [0] * len(LIMITES_HISTOGRAMA), # Acumulados por 'le' (sin +Inf: es 'total')
+            "suma": 0.0,
+            "total": 0,
+            "resultados": {},                          # "ok" | "timeout" | "error" -> veces
+            "muestras": deque(maxlen=MUESTRAS_POR_PASO),
+        }
+    return metricas["pasos"][nombre]
+
+
+def observar(metricas: dict, nombre: str, segundos: float, resultado="ok"):
+    """Añade una duración al histograma, a los contadores y a las muestras de 'nombre'."""
+    paso = _paso(metricas, nombre)
+    for i, limite in enumerate(LIMITES_HISTOGRAMA):
+        if segundos <= limite:
+            paso["buckets"][i] += 1
+    paso["suma"] += segundos
+    paso["total"] += 1
+    paso["resultados"][resultado] = paso["resultados"].get(resultado, 0) + 1
+    paso["muestras"].append(segundos)
+
+
+def registrar_login(metricas: dict, mensaje: dict, ruta_jsonl=ARCHIVO_JSONL):
+    """
+    Agrega las mediciones de un login ({"slot", "wallet_id", "pasos": [{"paso",
+    "segundos", "resultado"}, ...]}) y las añade al archivo JSONL.
+    """
+    pasos = mensaje.get("pasos") or []
+    if not pasos:
+        return
+    momento = time.time()
+    for medicion in pasos:
+        observar(metricas, medicion["paso"], medicion["segundos"], medicion["resultado"])
+    # El login completo termina con el resultado de su último paso
+    observar(metricas, PASO_TOTAL, sum(m["segundos"] for m in pasos), pasos[-1]["resultado"])
+
+    try:
+        with open(ruta_jsonl, "a") as f:
+            for medicion in pasos:
+                f.write(json.dumps({"momento": momento, "slot": mensaje.get("slot"),
+                                    "wallet_id": mensaje.get("wallet_id"), **medicion}) + "\n")
+    except OSError as e:
+        log.warning(f"No se pudieron escribir las métricas en '{ruta_jsonl}': {e}")
+
+
+def percentil(muestras, p):
+    """Percentil 'p' (método del rango más cercano) de una colección de números, o None si está vacía."""
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return None
+    return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def texto_prometheus(metricas: dict) -> str:
+    """Genera el formato de exposición de texto de Prometheus con todas las métricas."""
+    lineas = [
+        "# HELP wizard_paso_segundos Duración de cada paso del wizard de login (y de cada rotación de cartera).",
+        "# TYPE wizard_paso_segundos histogram",
+    ]
+    for nombre, paso in sorted(metricas["pasos"].items()):
+        for limite, cuenta in zip(LIMITES_HISTOGRAMA, paso["buckets"]):
+            lineas.append(f'wizard_paso_segundos_bucket{{paso="{nombre}",le="{limite}"}} {cuenta}')
+        lineas.append(f'wizard_paso_segundos_bucket{{paso="{nombre}",le="+Inf"}} {paso["total"]}')
+        lineas.append(f'wizard_paso_segundos_sum{{paso="{nombre}"}} {paso["suma"]:.3f}')
+        lineas.append(f'wizard_paso_segundos_count{{paso="{nombre}"}} {paso["total"]}')
+
+    lineas += ["# HELP wizard_paso_resultados_total Pasos del wizard por resultado (ok, timeout, error).",
+               "# TYPE wizard_paso_resultados_total counter"]
+    for nombre, paso in sorted(metricas["pasos"].items()):
+        for resultado, cuenta in sorted(paso["resultados"].items()):
+            lineas.append(f'wizard_paso_resultados_total{{paso="{nombre}",resultado="{resultado}"}} {cuenta}')
+
+    lineas += [f"# HELP wizard_paso_segundos_percentil Percentiles de las últimas {MUESTRAS_POR_PASO} duraciones de cada paso.",
+               "# TYPE wizard_paso_segundos_percentil gauge"]
+    for nombre, paso in sorted(metricas["pasos"].items()):
+        for p in PERCENTILES:
+            valor = percentil(paso["muestras"], p)
+            if valor is not None:
+                lineas.append(f'wizard_paso_segundos_percentil{{paso="{nombre}",percentil="{p}"}} {valor:.3f}')
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_prometheus(metricas: dict, ruta=ARCHIVO_PROMETHEUS):
+    """Reescribe el archivo de Prometheus de forma atómica (el collector nunca lee uno a medias)."""
+    temporal = ruta + ".tmp"
+    try:
+        with open(temporal, "w") as f:
+            f.write(texto_prometheus(metricas))
+        os.replace(temporal, ruta)
+    except OSError as e:
+        log.warning(f"No se pudieron exportar las métricas a '{ruta}': {e}")
+    metricas["proxima_exportacion"] = time.time() + INTERVALO_EXPORTACION_SECONDS
+
+
+def exportar_si_toca(metricas: dict, ruta=ARCHIVO_PROMETHEUS):
+    """Exporta a Prometheus si ha pasado INTERVALO_EXPORTACION_SECONDS desde la última vez."""
+    if time.time() >= metricas["proxima_exportacion"]:
+        exportar_prometheus(metricas, ruta)
+
+
+def resumen(metricas: dict) -> str:
+    """Tabla de texto con los pasos ordenados del más lento al más rápido (por p90)."""
+    filas = []
+    for nombre, paso in metricas["pasos"].items():
+        p50, p90, p99 = (percentil(paso["muestras"], p) or 0 for p in PERCENTILES)
+        fallos = paso["total"] - paso["resultados"].get("ok", 0)
+        filas.append((p90, f"{nombre:<22} n={paso['total']:<6} p50={p50:6.2f}s p90={p90:6.2f}s p99={p99:6.2f}s fallos={fallos}"))
+    return "\n".join(fila for _, fila in sorted(filas, reverse=True))
+
+
+if __name__ == "__main__":
+    # Uso: python metricas_login.py [metricas_login.jsonl]
+    # Reconstruye las métricas a partir del JSONL y muestra el resumen por paso.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    metricas = nuevas_metricas()
+    logins = {}
+    with open(sys.argv[1] if len(sys.argv) > 1 else ARCHIVO_JSONL) as f:
+        for linea in f:
+            medicion = json.loads(linea)
+            observar(metricas, medicion["paso"], medicion["segundos"], medicion["resultado"])
+            clave = (medicion.get("momento"), medicion.get("slot"))
+            logins.setdefault(clave, []).append(medicion)
+    for pasos in logins.values():
+        observar(metricas, PASO_TOTAL, sum(m["segundos"] for m in pasos), pasos[-1]["resultado"])
+    print(resumen(metricas))
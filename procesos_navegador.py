@@ -0,0 +1,242 @@
+import os
+import time
+import signal
+import logging
+import subprocess
+
+import almacen_carteras
+
+# =============================================================================
+# PROCESOS DE NAVEGADOR (chromedriver + Chrome) POR WORKER
+# Cada worker registra en el almacén el PID de su chromedriver (que arranca en
+# su propio grupo de procesos en POSIX) y el de su Chrome. El supervisor mata
+# exactamente ese árbol cuando el worker termina, crashea o se recicla, y al
+# arrancar barre los que quedaran registrados de una ejecución anterior.
+# Sustituye a chromeKill.bat (taskkill /im chrome.exe /f), que mataba TODOS
+# los Chrome de la máquina y no hacía nada fuera de Windows.
+# =============================================================================
+
+log = logging.getLogger()
+
+ESPERA_TRAS_SIGTERM_SECONDS = 3  # Margen para que Chrome cierre solo antes del SIGKILL
+NOMBRES_NAVEGADOR = ("chrome", "chromium", "chromedriver") # Un PID registrado solo se mata si sigue siendo uno de estos
+
+_HAY_PROC = os.path.isdir("/proc")
+
+
+def _ppids():
+    """pid -> ppid de todos los procesos (Linux, /proc). Vacío si /proc no existe."""
+    padres = {}
+    for nombre in os.listdir("/proc") if _HAY_PROC else []:
+        if not nombre.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nombre}/stat") as f:
+                # El nombre del ejecutable va entre paréntesis y puede contener espacios
+                padres[int(nombre)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            pass
+    return padres
+
+
+def descendientes(pid, padres=None):
+    """PIDs de todos los descendientes de 'pid' (Linux). 'padres' permite reutilizar una lectura de _ppids()."""
+    hijos = {}
+    for hijo, padre in (padres if padres is not None else _ppids()).items():
+        hijos.setdefault(padre, []).append(hijo)
+    encontrados, pendientes = [], list(hijos.get(pid, []))
+    while pendientes:
+        actual = pendientes.pop()
+        encontrados.append(actual)
+        pendientes.extend(hijos.get(actual, []))
+    return encontrados
+
+
+def rss_mb(pid):
+    """RSS (MB) de un proceso (Linux, VmRSS de /proc/<pid>/status), o 0 si ya no existe."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def rss_arbol_mb(pid=None):
+    """RSS total (MB) de los descendientes de 'pid' (por defecto, este proceso), o None sin /proc."""
+    padres = _ppids()
+    if not padres:
+        return None
+    return sum(rss_mb(hijo) for hijo in descendientes(pid or os.getpid(), padres))
+
+
+def rss_arboles_mb(pids) -> dict:
+    """
+    RSS total (MB) del árbol de cada pid (el proceso y todos sus descendientes),
+    con una sola lectura de /proc. Vacío si /proc no existe.
+    """
+    padres = _ppids()
+    if not padres:
+        return {}
+    return {pid: rss_mb(pid) + sum(rss_mb(hijo) for hijo in descendientes(pid, padres)) for pid in pids}
+
+
+def proceso_existe(pid) -> bool:
+    """True si hay un proceso vivo con ese PID (sin enviarle nada: en Windows os.kill lo terminaría)."""
+    if _HAY_PROC:
+        return os.path.exists(f"/proc/{pid}")
+    if os.name == "nt":
+        try:
+            salida = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/NH", "/FO", "CSV"],
+                                    capture_output=True, text=True, timeout=15).stdout
+        except (subprocess.SubprocessError, OSError):
+            return False
+        return f'"{pid}"' in salida
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def es_navegador(pid) -> bool:
+    """True si 'pid' existe y es chrome/chromedriver (evita matar un PID reutilizado por otro programa)."""
+    if _HAY_PROC:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                ejecutable = f.read().split(b"\0", 1)[0].decode(errors="replace")
+        except OSError:
+            return False
+        return any(nombre in os.path.basename(ejecutable).lower() for nombre in NOMBRES_NAVEGADOR)
+    if os.name == "nt":
+        try:
+            salida = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/NH", "/FO", "CSV"],
+                                    capture_output=True, text=True, timeout=15).stdout.lower()
+        except (subprocess.SubprocessError, OSError):
+            return False
+        return any(nombre in salida for nombre in NOMBRES_NAVEGADOR)
+    return proceso_existe(pid) # Sin /proc (macOS...): solo se puede comprobar que existe
+
+
+def miembros_del_grupo(pgid):
+    """PIDs cuyo grupo de procesos es 'pgid' (Linux)."""
+    miembros = []
+    for nombre in os.listdir("/proc") if _HAY_PROC else []:
+        if not nombre.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nombre}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[3]) == pgid:
+                    miembros.append(int(nombre))
+        except (OSError, IndexError, ValueError):
+            pass
+    return miembros
+
+
+def pids_del_arbol(pid_driver, pgid=None, pid_chrome=None):
+    """PIDs vivos del árbol de navegador registrado: su grupo, chromedriver, Chrome y sus descendientes."""
+    padres = _ppids()
+    pids = set(miembros_del_grupo(pgid)) if pgid else set()
+    for raiz in (pid_driver, pid_chrome):
+        if raiz and raiz in padres:
+            pids.add(raiz)
+            pids.update(descendientes(raiz, padres))
+    return [pid for pid in pids if es_navegador(pid)]
+
+
+def matar_arbol(pid_driver, pgid=None, pid_chrome=None) -> int:
+    """
+    Termina el árbol chromedriver + Chrome de UN worker (SIGTERM y, si no basta,
+    SIGKILL; en Windows taskkill /T /F sobre cada raíz). Devuelve cuántos procesos
+    se encontraron vivos.
+    """
+    if os.name == "nt":
+        raices = [pid for pid in (pid_driver, pid_chrome) if pid and es_navegador(pid)]
+        for pid in raices:
+            subprocess.run(["taskkill", "/PID", str(pid), "/T", "/F"], capture_output=True)
+        return len(raices)
+
+    if not _HAY_PROC:
+        # Sin /proc no se puede listar el árbol: se mata el grupo entero de chromedriver
+        if not pgid or not es_navegador(pid_driver):
+            return 0
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except OSError:
+            return 0
+        return 1
+
+    pids = pids_del_arbol(pid_driver, pgid, pid_chrome)
+    encontrados = len(pids)
+    for senal in (signal.SIGTERM, signal.SIGKILL):
+        for pid in pids:
+            try:
+                os.kill(pid, senal)
+            except OSError:
+                pass # Ya terminó
+        limite = time.time() + ESPERA_TRAS_SIGTERM_SECONDS
+        while senal == signal.SIGTERM and time.time() < limite and any(es_navegador(pid) for pid in pids):
+            time.sleep(0.1)
+        pids = [pid for pid in pids if es_navegador(pid)]
+        if not pids:
+            break
+    return encontrados
+
+
+def opciones_servicio() -> dict:
+    """Argumentos extra para el Service de chromedriver: en POSIX arranca en su propio grupo de procesos."""
+    return {"popen_kw": {"start_new_session": True}} if os.name == "posix" else {}
+
+
+def registrar(driver, slot_id=None):
+    """
+    Guarda en el almacén el árbol de navegador del driver recién creado (llamar
+    desde el worker que lo creó). Devuelve el PID de chromedriver, o None si no se pudo.
+    """
+    try:
+        pid_driver = driver.service.process.pid
+    except AttributeError:
+        return None
+    pgid = os.getpgid(pid_driver) if os.name == "posix" else None
+    # El Chrome principal es el hijo directo de chromedriver (solo se puede ver con /proc)
+    pid_chrome = next((pid for pid, padre in _ppids().items() if padre == pid_driver and es_navegador(pid)), None)
+    almacen_carteras.registrar_navegador(pid_driver, os.getpid(), slot_id, pgid, pid_chrome)
+    return pid_driver
+
+
+def desregistrar(pid_driver):
+    """El worker cerró su navegador limpiamente (driver.quit): ya no hay nada que limpiar."""
+    if pid_driver:
+        almacen_carteras.borrar_navegador(pid_driver)
+
+
+def limpiar_worker(pid_worker) -> int:
+    """Mata los navegadores registrados por el worker 'pid_worker' (que ya no debe estar vivo). Devuelve cuántos."""
+    matados = 0
+    for fila in almacen_carteras.listar_navegadores(pid_worker=pid_worker):
+        if matar_arbol(fila["pid_driver"], fila["pgid"], fila["pid_chrome"]):
+            matados += 1
+            log.info(f"Navegador huérfano del worker {pid_worker} (slot {fila['slot_id']}, chromedriver {fila['pid_driver']}) terminado.")
+        almacen_carteras.borrar_navegador(fila["pid_driver"])
+    return matados
+
+
+def barrer_huerfanos() -> int:
+    """
+    Mata los navegadores que sigan registrados (de una ejecución anterior que no
+    cerró bien, o de workers que murieron sin limpiar). Respeta los de workers que
+    sigan vivos (p. ej. otro lanzador en el mismo directorio). Devuelve cuántos
+    árboles se terminaron.
+    """
+    matados = 0
+    for fila in almacen_carteras.listar_navegadores():
+        if proceso_existe(fila["pid_worker"]):
+            continue
+        if matar_arbol(fila["pid_driver"], fila["pgid"], fila["pid_chrome"]):
+            matados += 1
+        almacen_carteras.borrar_navegador(fila["pid_driver"])
+    if matados:
+        log.warning(f"Barrido de huérfanos: {matados} navegadores (chromedriver + Chrome) terminados.")
+    return matados
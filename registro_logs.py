@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import logging
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import Queue
+
+# =============================================================================
+# LOGS DE LOS WORKERS (una cola, un único escritor en el supervisor)
+# Los workers no escriben en la terminal: envían sus registros por una Queue
+# (QueueHandler) con campos estructurados (slot, wallet_id, paso, campos). En el
+# supervisor un QueueListener los escribe en JSONL, muestra en consola solo los
+# avisos y errores (con límite por slot) más un resumen periódico, y guarda los
+# últimos registros de cada slot para volcarlos a un archivo si el slot crashea.
+# Uso en un registro: log.info("texto", extra={"slot": 3, "wallet_id": 12,
+#                                              "paso": "progreso", "campos": {...}})
+# =============================================================================
+
+log = logging.getLogger()
+
+ARCHIVO_LOGS_JSONL = "logs_workers.jsonl"  # Todos los registros de los workers (y del supervisor), uno por línea
+DIRECTORIO_VOLCADOS = "volcados_slots"     # Últimos registros de un slot cuando crashea
+REGISTROS_POR_SLOT = 200                   # Tamaño del buffer circular de cada slot
+NIVEL_CONSOLA_WORKERS = logging.WARNING    # Los registros de workers por debajo de este nivel solo van al JSONL
+MAX_CONSOLA_POR_SLOT = 5                   # Avisos/errores de un mismo slot mostrados por intervalo (el resto se cuenta)
+INTERVALO_RESUMEN_CONSOLA_SECONDS = 60     # Cada cuánto se muestra el resumen de la actividad de los workers
+
+# Atributos propios de un LogRecord (lo que no esté aquí y venga en 'extra' va al JSONL)
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "origen"}
+
+_manejador = None # El ManejadorRegistros del supervisor (ver iniciar)
+
+
+def configurar_worker(cola_logs, slot_id=None, nivel=logging.INFO):
+    """
+    Llamar al empezar cada proceso worker: sustituye los handlers que dejó
+    logging.basicConfig por un único QueueHandler hacia el supervisor. 'slot_id'
+    se añade a los registros que no traigan el suyo.
+    """
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    handler = QueueHandler(cola_logs)
+
+    def marcar(record):
+        record.origen = "worker"
+        if getattr(record, "slot", None) is None:
+            record.slot = slot_id
+        return True
+    handler.addFilter(marcar)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+
+
+def registro_a_dict(record) -> dict:
+    """Un LogRecord como dict plano para el JSONL: momento, nivel, slot, wallet_id, paso, mensaje y campos."""
+    datos = {
+        "momento": round(record.created, 3),
+        "nivel": record.levelname,
+        "proceso": record.processName,
+        "slot": getattr(record, "slot", None),
+        "wallet_id": getattr(record, "wallet_id", None),
+        "paso": getattr(record, "paso", None),
+        "mensaje": record.getMessage(),
+    }
+    datos.update(getattr(record, "campos", None) or {})
+    for clave, valor in vars(record).items():
+        if clave not in _ATRIBUTOS_RECORD and clave not in datos and clave != "campos":
+            datos[clave] = valor
+    return datos
+
+
+def texto_consola(record) -> str:
+    """Línea de consola de un registro de worker: hora, nivel, [slot_X][wallet_Y] y mensaje."""
+    prefijo = ""
+    if getattr(record, "slot", None) is not None:
+        prefijo += f"[slot_{record.slot}]"
+    if getattr(record, "wallet_id", None) is not None:
+        prefijo += f"[wallet_{record.wallet_id}]"
+    momento = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+    return f"{momento} [{record.levelname}] {prefijo} {record.getMessage()}"
+
+
+class ManejadorRegistros(logging.Handler):
+    """
+    Destino único de los registros: JSONL para todos; para los de workers, además,
+    buffer circular por slot, consola con límite por slot y resumen periódico.
+    """
+
+    def __init__(self, ruta_jsonl=ARCHIVO_LOGS_JSONL):
+        super().__init__()
+        self.archivo = open(ruta_jsonl, "a", encoding="utf-8")
+        self.buffers = {}     # slot -> deque de dicts (últimos REGISTROS_POR_SLOT)
+        self.en_consola = {}  # slot -> registros mostrados en el intervalo actual
+        self.contadores = {"registros": 0, "avisos": 0, "errores": 0, "suprimidos": 0}
+        self.slots_activos = set()
+        self.proximo_resumen = time.time() + INTERVALO_RESUMEN_CONSOLA_SECONDS
+
+    def emit(self, record):
+        try:
+            datos = registro_a_dict(record)
+            self.archivo.write(json.dumps(datos, ensure_ascii=False, default=str) + "\n")
+            if getattr(record, "origen", None) != "worker":
+                return # Los del supervisor ya salen por su propia consola
+            slot = datos["slot"]
+            self.buffers.setdefault(slot, deque(maxlen=REGISTROS_POR_SLOT)).append(datos)
+            self.slots_activos.add(slot)
+            self.contadores["registros"] += 1
+            if record.levelno >= logging.ERROR:
+                self.contadores["errores"] += 1
+            elif record.levelno >= logging.WARNING:
+                self.contadores["avisos"] += 1
+            if record.levelno >= NIVEL_CONSOLA_WORKERS:
+                mostrados = self.en_consola.get(slot, 0)
+                if mostrados < MAX_CONSOLA_POR_SLOT:
+                    print(texto_consola(record), flush=True)
+                else:
+                    self.contadores["suprimidos"] += 1
+                self.en_consola[slot] = mostrados + 1
+            if time.time() >= self.proximo_resumen:
+                self.resumir()
+        except Exception:
+            self.handleError(record)
+
+    def resumir(self):
+        """Muestra el resumen del intervalo y reinicia los contadores y los límites de consola."""
+        c = self.contadores
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} [INFO] [LOGS] Últimos {INTERVALO_RESUMEN_CONSOLA_SECONDS}s: "
+              f"{c['registros']} registros de {len(self.slots_activos)} slots ({c['avisos']} avisos, {c['errores']} errores, "
+              f"{c['suprimidos']} no mostrados). Detalle en '{self.archivo.name}'.", flush=True)
+        self.contadores = dict.fromkeys(c, 0)
+        self.slots_activos.clear()
+        self.en_consola.clear()
+        self.archivo.flush()
+        self.proximo_resumen = time.time() + INTERVALO_RESUMEN_CONSOLA_SECONDS
+
+    def volcar(self, slot, motivo) -> str:
+        """Escribe el buffer del slot en DIRECTORIO_VOLCADOS y devuelve la ruta (None si está vacío)."""
+        with self.lock:
+            registros = list(self.buffers.get(slot, ()))
+        if not registros:
+            return None
+        os.makedirs(DIRECTORIO_VOLCADOS, exist_ok=True)
+        ruta = os.path.join(DIRECTORIO_VOLCADOS, f"slot_{slot}_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"motivo": motivo, "momento": time.time(), "registros": len(registros)}) + "\n")
+            for datos in registros:
+                f.write(json.dumps(datos, ensure_ascii=False, default=str) + "\n")
+        return ruta
+
+    def close(self):
+        with self.lock:
+            if not self.archivo.closed:
+                self.archivo.close()
+        super().close()
+
+
+def iniciar(ruta_jsonl=ARCHIVO_LOGS_JSONL):
+    """
+    En el supervisor: crea la cola de logs y arranca el QueueListener. Los registros
+    del propio supervisor también van al JSONL (además de a su consola).
+    Devuelve (cola_logs, listener); la cola se pasa a cada worker.
+    """
+    global _manejador
+    _manejador = ManejadorRegistros(ruta_jsonl)
+    logging.getLogger().addHandler(_manejador)
+    cola_logs = Queue()
+    listener = QueueListener(cola_logs, _manejador)
+    listener.start()
+    return cola_logs, listener
+
+
+def volcar_slot(slot_id, motivo):
+    """Vuelca los últimos registros del slot (si el listener está activo) y registra dónde."""
+    if _manejador is None:
+        return
+    try:
+        ruta = _manejador.volcar(slot_id, motivo)
+    except OSError as e:
+        log.warning(f"No se pudieron volcar los registros del slot {slot_id}: {e}")
+        return
+    if ruta:
+        log.warning(f"Últimos registros del slot {slot_id} ({motivo}) volcados en '{ruta}'.")
+
+
+def detener(listener):
+    """Procesa lo que quede en la cola, para el listener y cierra el JSONL."""
+    global _manejador
+    listener.stop()
+    if _manejador is not None:
+        logging.getLogger().removeHandler(_manejador)
+        _manejador.close()
+        _manejador = None
@@ -0,0 +1,280 @@
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+
+# =============================================================================
+# SERVIDOR LOCAL QUE IMITA EL WIZARD DE sm.midnight.gd
+# Reproduce el contrato de DOM del que depende el bot (botones, placeholders,
+# #accept-terms, el texto de términos, solved-count, el timer...) para poder
+# medir workers y supervisor sin tocar el sitio real. Los tiempos de resolución
+# y la duración de cada challenge son configurables.
+# Uso: python servidor_wizard.py --puerto 8765  y lanzar el bot con
+#      URL_ORIGEN=http://127.0.0.1:8765 python lanzador_bots.py
+# =============================================================================
+
+log = logging.getLogger()
+
+PUERTO = 8765
+SOLVE_MIN_SECONDS = 60     # Tiempo mínimo desde 'Start session' hasta que la sesión resuelve un challenge
+SOLVE_MAX_SECONDS = 180    # Tiempo máximo (se elige al azar entre ambos por sesión)
+CHALLENGE_SECONDS = 600    # Duración de cada challenge (el timer vuelve a empezar al cambiar)
+LATENCIA_MS = 300          # Retardo artificial entre pantallas del wizard
+
+# Con recursos_pesados la página carga además una imagen, una fuente, un vídeo y un
+# script de analítica (como la web real) para medir lo que ahorra el perfil ligero.
+# ruta -> (Content-Type, tamaño en KB)
+RECURSOS_PESADOS = {
+    "/static/fondo.jpg": ("image/jpeg", 400),
+    "/static/logo.svg": ("image/svg+xml", 40),
+    "/static/fuente.woff2": ("font/woff2", 120),
+    "/static/intro.mp4": ("video/mp4", 1500),
+    "/static/analytics.js": ("application/javascript", 80),
+}
+ETIQUETAS_PESADAS = """<style>@font-face { font-family: Marca; src: url(/static/fuente.woff2) format("woff2"); }
+body { font-family: Marca, sans-serif; background: url(/static/fondo.jpg); }</style>
+<img src="/static/logo.svg" alt=""><video src="/static/intro.mp4" autoplay muted loop></video>
+<script src="/static/analytics.js" async></script>"""
+
+TEXTO_TERMINOS = "I agree to abide by the terms and conditions of the Scavenger Mine."
+
+# Página única: el wizard y el panel se dibujan en el navegador. Los textos,
+# placeholders e ids son los que buscan los XPath de lanzador_bots.py.
+PAGINA = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Scavenger Mine (local)</title></head>
+<body>__RECURSOS__<div id="app"></div>
+<script>
+const LATENCIA_MS = __LATENCIA_MS__;
+const TERMINOS = __TERMINOS__;
+const app = document.getElementById("app");
+let direccion = null;
+
+const pantalla = (html, alMontar) => setTimeout(() => { app.innerHTML = html; if (alMontar) alMontar(); }, LATENCIA_MS);
+// Al pulsar, el botón se desactiva (como en la web real) salvo que la acción devuelva false
+const boton = (texto, accion) => {
+    for (const b of app.querySelectorAll("button")) if (b.textContent === texto)
+        b.onclick = () => { b.disabled = true; if (accion() === false) b.disabled = false; };
+};
+const formatear = (s) => [Math.floor(s / 86400), Math.floor(s / 3600) % 24, Math.floor(s / 60) % 60, s % 60]
+    .map(n => String(n).padStart(2, "0")).join(":");
+const fijarTexto = (id, texto) => { const n = document.getElementById(id); if (n && n.textContent !== texto) n.textContent = texto; };
+
+function inicio() {
+    pantalla('<button>Enter an address manually</button>', () => boton("Enter an address manually", direccionManual));
+}
+function direccionManual() {
+    pantalla('<input placeholder="Please enter an unused Cardano address"><button>Continue</button>', () => boton("Continue", () => {
+        direccion = app.querySelector("input").value.trim();
+        if (!direccion) return false;
+        pantalla('<p>Paso 1</p><button>Next</button>', () => boton("Next", () =>
+            pantalla('<p>Paso 2</p><button>Next</button>', () => boton("Next", terminos))));
+    }));
+}
+function terminos() {
+    pantalla('<input type="checkbox" id="accept-terms"><label for="accept-terms">Accept</label><button>Accept and sign</button>', () =>
+        boton("Accept and sign", () => document.getElementById("accept-terms").checked ? firma() : false));
+}
+function firma() {
+    pantalla('<div>' + TERMINOS + '</div>' +
+             '<textarea placeholder="Please enter the signature generated by your wallet"></textarea>' +
+             '<input placeholder="Please enter a public key"><button>Sign</button>', () => boton("Sign", () => {
+        const firmaHex = app.querySelector("textarea").value.trim();
+        const clave = app.querySelector("input").value.trim();
+        if (!firmaHex || !clave) return false;
+        pantalla('<button>Start session</button>', () => boton("Start session", () =>
+            fetch("/api/sesion", {method: "POST", body: JSON.stringify({address: direccion, signature: firmaHex, public_key: clave})})
+                .then(() => { localStorage.setItem("sesion_address", direccion); panel(); })));
+    }));
+}
+function panel() {
+    pantalla('<div><span>Miner status</span><span><span id="estado">Starting</span></span></div>' +
+             '<div><span>Current challenge:</span><span id="challenge"></span></div>' +
+             '<div><span>Next challenge in:</span><span id="timer"></span></div>' +
+             '<div><span>Your estimated claim:</span><span id="claim"></span></div>' +
+             '<div><span>Your submitted solutions:</span><span id="mias"></span></div>' +
+             '<div><span>All submitted solutions:</span><span id="todas"></span></div>' +
+             '<div>Solved: <span data-testid="solved-count" id="solved"></span></div>', () => {
+        const actualizar = () => fetch("/api/estado?address=" + encodeURIComponent(direccion)).then(r => r.json()).then(e => {
+            fijarTexto("estado", e.miner_status);
+            fijarTexto("challenge", e.challenge_id);
+            fijarTexto("timer", formatear(e.segundos_restantes));
+            fijarTexto("claim", e.claim);
+            fijarTexto("mias", String(e.my_solutions));
+            fijarTexto("todas", String(e.all_solutions));
+            fijarTexto("solved", String(e.solved));
+        }).catch(() => {});
+        actualizar();
+        setInterval(actualizar, 1000);
+    });
+}
+
+direccion = localStorage.getItem("sesion_address");
+if (direccion) panel(); else inicio();
+</script></body></html>
+"""
+
+
+def nuevo_estado(solve_min=SOLVE_MIN_SECONDS, solve_max=SOLVE_MAX_SECONDS,
+                 challenge_seconds=CHALLENGE_SECONDS, latencia_ms=LATENCIA_MS, recursos_pesados=False) -> dict:
+    """Estado compartido del servidor: configuración, carteras vistas y contadores."""
+    return {
+        "solve_min": solve_min, "solve_max": solve_max,
+        "challenge_seconds": challenge_seconds, "latencia_ms": latencia_ms,
+        "recursos_pesados": recursos_pesados,
+        "inicio": time.time(),
+        "carteras": {},   # address -> {"solved", "resolver_en"}
+        # bytes_enviados: todo el tráfico servido (la parte de RECURSOS_PESADOS también va en bytes_estaticos)
+        "contadores": {"sesiones": 0, "resueltos": 0, "peticiones_estado": 0, "bytes_enviados": 0, "bytes_estaticos": 0},
+        "cerrojo": threading.Lock(),
+    }
+
+
+def challenge_actual(estado: dict):
+    """Devuelve (challenge_id, segundos_restantes) del challenge en curso."""
+    transcurrido = time.time() - estado["inicio"]
+    numero = int(transcurrido // estado["challenge_seconds"]) + 1
+    restantes = estado["challenge_seconds"] - int(transcurrido % estado["challenge_seconds"])
+    return f"**D01C{numero:02d}", restantes
+
+
+def iniciar_sesion(estado: dict, address: str):
+    """'Start session': programa cuándo resolverá esta cartera su siguiente challenge."""
+    with estado["cerrojo"]:
+        cartera = estado["carteras"].setdefault(address, {"solved": 0, "resolver_en": None})
+        cartera["resolver_en"] = time.time() + random.uniform(estado["solve_min"], estado["solve_max"])
+        estado["contadores"]["sesiones"] += 1
+
+
+def estado_cartera(estado: dict, address: str) -> dict:
+    """Lo que muestra el panel para 'address' (resuelve el challenge si ya le tocaba)."""
+    challenge_id, restantes = challenge_actual(estado)
+    with estado["cerrojo"]:
+        estado["contadores"]["peticiones_estado"] += 1
+        cartera = estado["carteras"].setdefault(address, {"solved": 0, "resolver_en": None})
+        if cartera["resolver_en"] is not None and time.time() >= cartera["resolver_en"]:
+            cartera["solved"] += 1
+            cartera["resolver_en"] = None # Una solución por sesión
+            estado["contadores"]["resueltos"] += 1
+        todas = sum(c["solved"] for c in estado["carteras"].values())
+    return {
+        "miner_status": "Active" if cartera["resolver_en"] is not None else "Idle",
+        "challenge_id": challenge_id,
+        "segundos_restantes": restantes,
+        "claim": f"{cartera['solved'] * 1000} NIGHT",
+        "my_solutions": cartera["solved"],
+        "all_solutions": todas,
+        "solved": cartera["solved"],
+    }
+
+
+@lru_cache(maxsize=None)
+def contenido_recurso(ruta: str, kb: int) -> bytes:
+    """Contenido de relleno de un recurso pesado (el mismo en cada petición, para no gastar CPU)."""
+    if ruta.endswith(".js"):
+        return (b"/* relleno */\n" * (kb * 1024 // 14 + 1))[:kb * 1024]
+    return random.Random(ruta).randbytes(kb * 1024)
+
+
+class ManejadorWizard(BaseHTTPRequestHandler):
+    """Sirve la página del wizard y la pequeña API que usa (/api/sesion, /api/estado, /api/metricas)."""
+
+    def _responder(self, codigo, cuerpo, tipo="application/json"):
+        if isinstance(cuerpo, bytes):
+            datos, tipo_completo = cuerpo, tipo
+        else:
+            datos = cuerpo.encode("utf-8") if isinstance(cuerpo, str) else json.dumps(cuerpo).encode("utf-8")
+            tipo_completo = f"{tipo}; charset=utf-8"
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo_completo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(datos)
+        estado = self.server.estado
+        with estado["cerrojo"]:
+            estado["contadores"]["bytes_enviados"] += len(datos)
+            if isinstance(cuerpo, bytes):
+                estado["contadores"]["bytes_estaticos"] += len(datos)
+
+    def do_GET(self):
+        estado = self.server.estado
+        url = urlparse(self.path)
+        if url.path in ("/", "/wizard/mine"):
+            pagina = (PAGINA.replace("__LATENCIA_MS__", str(int(estado["latencia_ms"])))
+                            .replace("__TERMINOS__", json.dumps(TEXTO_TERMINOS))
+                            .replace("__RECURSOS__", ETIQUETAS_PESADAS if estado["recursos_pesados"] else ""))
+            self._responder(200, pagina, "text/html")
+        elif url.path in RECURSOS_PESADOS and estado["recursos_pesados"]:
+            tipo, kb = RECURSOS_PESADOS[url.path]
+            self._responder(200, contenido_recurso(url.path, kb), tipo)
+        elif url.path == "/api/estado":
+            address = parse_qs(url.query).get("address", [""])[0]
+            self._responder(200, estado_cartera(estado, address))
+        elif url.path == "/api/metricas":
+            with estado["cerrojo"]:
+                metricas = {**estado["contadores"], "carteras": len(estado["carteras"])}
+            self._responder(200, metricas) # Fuera del cerrojo: _responder lo toma para contar los bytes
+        else:
+            self._responder(404, {"error": "no encontrado"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/api/sesion":
+            self._responder(404, {"error": "no encontrado"})
+            return
+        try:
+            datos = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            address = datos["address"]
+        except (ValueError, KeyError):
+            self._responder(400, {"error": "falta 'address'"})
+            return
+        iniciar_sesion(self.server.estado, address)
+        self._responder(200, {"ok": True})
+
+    def log_message(self, formato, *args):
+        log.debug(f"[servidor_wizard] {self.address_string()} {formato % args}")
+
+
+def crear_servidor(puerto=PUERTO, host="127.0.0.1", **config) -> ThreadingHTTPServer:
+    """Crea el servidor (puerto 0 = uno libre). 'config' se pasa a nuevo_estado."""
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorWizard)
+    servidor.daemon_threads = True
+    servidor.estado = nuevo_estado(**config)
+    return servidor
+
+
+def iniciar_en_hilo(puerto=0, **config):
+    """Arranca el servidor en un hilo de fondo. Devuelve (servidor, url_origen)."""
+    servidor = crear_servidor(puerto, **config)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, puerto_real = servidor.server_address[:2]
+    return servidor, f"http://{host}:{puerto_real}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description="Servidor local que imita el wizard de sm.midnight.gd")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--solve-min", type=float, default=SOLVE_MIN_SECONDS, help="segundos mínimos hasta resolver")
+    parser.add_argument("--solve-max", type=float, default=SOLVE_MAX_SECONDS, help="segundos máximos hasta resolver")
+    parser.add_argument("--challenge", type=int, default=CHALLENGE_SECONDS, help="duración de cada challenge (s)")
+    parser.add_argument("--latencia-ms", type=int, default=LATENCIA_MS, help="retardo entre pantallas del wizard")
+    parser.add_argument("--recursos-pesados", action="store_true", help="servir imagen, fuente, vídeo y analítica con la página")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.puerto, args.host, solve_min=args.solve_min, solve_max=args.solve_max,
+                              challenge_seconds=args.challenge, latencia_ms=args.latencia_ms,
+                              recursos_pesados=args.recursos_pesados)
+    log.info(f"Wizard local escuchando en http://{args.host}:{args.puerto}/wizard/mine "
+             f"(resolución {args.solve_min}-{args.solve_max}s, challenge de {args.challenge}s)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Cerrando servidor.")
+        sys.exit(0)
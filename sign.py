@@ -1,6 +1,11 @@
+import os
 import sys
+import json
+import time
 import traceback
 import logging
+from functools import lru_cache
+from multiprocessing import Pool
 from pycardano import PaymentSigningKey, HDWallet, PaymentVerificationKey
 from pycardano.cip import cip8
 from mnemonic.mnemonic import Mnemonic
@@ -10,22 +15,26 @@ from typing import Tuple
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 log = logging.getLogger()
 PAYMENT_DERIVATION_PATH = "m/1852'/1815'/0'/0/0"
+PROCESOS_LOTE = os.cpu_count() or 1 # Procesos del modo por lotes (--lote)
+CHUNK_LOTE = 16                     # Registros que se envían juntos a cada proceso (menos IPC)
 # ---------------------
 
-def derivar_claves_desde_semilla(seed_phrase: str) -> Tuple[PaymentSigningKey, str]:
+mnemo_lib = Mnemonic("english") # La lista de palabras se carga una sola vez por proceso
+
+def derivar_claves_desde_semilla(seed_phrase: str, derivation_path: str = PAYMENT_DERIVATION_PATH,
+                                 registrar_errores: bool = True) -> Tuple[PaymentSigningKey, str]:
     """
     Deriva la clave de firma de pago (Signing Key) y la clave pública (HEX) 
     a partir de la frase semilla.
     """
     try:
         # 1. Convierte la frase en semilla BIP39 (64 bytes) -> HEX (Lógica que funciona en tu entorno)
-        mnemo_lib = Mnemonic("english")
         seed_bytes = mnemo_lib.to_seed(seed_phrase)
         seed_hex_string = seed_bytes.hex()
         root_key = HDWallet.from_seed(seed_hex_string)
 
-        # 2. Deriva la clave de pago (m/1852'/1815'/0'/0/0)
-        payment_derived_key = root_key.derive_from_path(PAYMENT_DERIVATION_PATH)
+        # 2. Deriva la clave de pago (por defecto m/1852'/1815'/0'/0/0)
+        payment_derived_key = root_key.derive_from_path(derivation_path)
         
         # 3. Obtiene la clave privada (FIX: usando .xprivate_key y slicing para tu versión)
         payment_private_key_seed_32 = payment_derived_key.xprivate_key[0:32]
@@ -38,8 +47,9 @@ def derivar_claves_desde_semilla(seed_phrase: str) -> Tuple[PaymentSigningKey, s
         return payment_signing_key, public_key_hex
 
     except Exception as e:
-        log.error(f"Error en la derivación de claves: {e}")
-        traceback.print_exc()
+        if registrar_errores:
+            log.error(f"Error en la derivación de claves: {e}")
+            traceback.print_exc()
         raise
 
 def firmar_mensaje_cip8(payment_signing_key: PaymentSigningKey, message_str: str) -> str:
@@ -55,11 +65,94 @@ def mostrar_uso_y_salir():
     """Muestra la sintaxis correcta del comando y sale."""
     print("\n--- Herramienta de Firma CIP-8 CLI (Por Frase Semilla) ---")
     print("Uso: py sign_by_seed.py \"<FRASE_SEMILLA_COMPLETA>\" \"<MENSAJE_A_FIRMAR>\"")
+    print("     py sign.py --lote [ARCHIVO.jsonl | -] [--procesos N]")
     print("\nEjemplo:")
     print("py sign_by_seed.py \"word1 word2 ... word24\" \"I agree to abide by the terms\"")
     print("\nNota: Usa comillas dobles (\") para encerrar la frase y el mensaje.")
+    print("\nModo por lotes: cada línea de entrada es {\"seed\": ..., \"message\": ...} (opcionales \"id\" y \"path\").")
+    print("Cada línea de salida es {\"index\", \"id\", \"public_key\", \"signature\"} o {\"index\", \"id\", \"error\"},")
+    print("en el mismo orden que la entrada ('index' es el número de línea). Sin archivo (o con '-') lee stdin.")
     sys.exit(1)
 
+# --- MODO POR LOTES (JSONL) ---
+
+@lru_cache(maxsize=256)
+def _derivar_cacheado(seed_phrase: str, derivation_path: str) -> Tuple[PaymentSigningKey, str]:
+    """Derivación sin logs, reutilizada si la misma semilla firma varios mensajes en un proceso."""
+    return derivar_claves_desde_semilla(seed_phrase, derivation_path, registrar_errores=False)
+
+def firmar_registro(entrada) -> dict:
+    """
+    Procesa una línea (indice, texto_json) del lote y devuelve su resultado.
+    Nunca lanza: cualquier fallo del registro se devuelve en "error".
+    """
+    indice, linea = entrada
+    resultado = {"index": indice}
+    try:
+        registro = json.loads(linea)
+        if "id" in registro:
+            resultado["id"] = registro["id"]
+        seed_phrase, mensaje = registro["seed"], registro["message"]
+        if not isinstance(seed_phrase, str) or not mnemo_lib.check(seed_phrase):
+            raise ValueError("frase semilla no válida (palabras o checksum BIP39)")
+        signing_key, public_key_hex = _derivar_cacheado(seed_phrase, registro.get("path") or PAYMENT_DERIVATION_PATH)
+        resultado["public_key"] = public_key_hex
+        resultado["signature"] = firmar_mensaje_cip8(signing_key, mensaje)
+    except KeyError as e:
+        resultado["error"] = f"falta el campo {e}"
+    except Exception as e:
+        resultado["error"] = f"{type(e).__name__}: {e}"
+    return resultado
+
+def ejecutar_lote(origen: str = "-", procesos: int = PROCESOS_LOTE) -> int:
+    """
+    Firma todos los registros JSONL de 'origen' ('-' = stdin) repartidos entre
+    'procesos' procesos y escribe cada resultado en stdout (JSONL) en el orden de
+    entrada, según van estando listos. Devuelve el número de registros con error.
+    """
+    entrada = sys.stdin if origen == "-" else open(origen, "r", encoding="utf-8")
+    lineas = ((indice, linea) for indice, linea in enumerate(entrada, 1) if linea.strip())
+    pool = Pool(procesos) if procesos > 1 else None
+    resultados = pool.imap(firmar_registro, lineas, chunksize=CHUNK_LOTE) if pool else map(firmar_registro, lineas)
+
+    inicio = time.time()
+    total = errores = 0
+    try:
+        for resultado in resultados: # imap conserva el orden de entrada
+            sys.stdout.write(json.dumps(resultado) + "\n")
+            sys.stdout.flush()
+            total += 1
+            errores += "error" in resultado
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if entrada is not sys.stdin:
+            entrada.close()
+
+    duracion = max(time.time() - inicio, 1e-9)
+    log.info(f"Lote terminado: {total} registros ({errores} con error) en {duracion:.1f}s "
+             f"({total / duracion:.1f} firmas/s, {procesos} procesos).")
+    return errores
+
+def ejecutar_lote_desde_argv(argumentos: list):
+    """Interpreta '[ARCHIVO | -] [--procesos N]' y ejecuta el modo por lotes."""
+    origen, procesos = "-", PROCESOS_LOTE
+    try:
+        while argumentos:
+            argumento = argumentos.pop(0)
+            if argumento == "--procesos":
+                procesos = max(1, int(argumentos.pop(0)))
+            else:
+                origen = argumento
+    except (IndexError, ValueError):
+        mostrar_uso_y_salir()
+    try:
+        ejecutar_lote(origen, procesos)
+    except OSError as e:
+        log.error(f"No se pudo leer la entrada del lote: {e}")
+        sys.exit(1)
+
 def ejecutar_firma_por_seed():
     """
     Ejecuta el proceso de firma usando la frase semilla y el mensaje de línea de comandos.
@@ -98,4 +191,7 @@ def ejecutar_firma_por_seed():
 
 
 if __name__ == "__main__":
-    ejecutar_firma_por_seed()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "--lote":
+        ejecutar_lote_desde_argv(sys.argv[2:])
+    else:
+        ejecutar_firma_por_seed()
@@ -0,0 +1,35 @@
+import json
+from urllib.request import urlopen
+
+import pytest
+
+import servidor_wizard
+
+
+@pytest.fixture
+def servidor():
+    servidor, url = servidor_wizard.iniciar_en_hilo(latencia_ms=0)
+    yield servidor, url
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def pedir(url, ruta):
+    with urlopen(url + ruta, timeout=5) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def test_metricas_no_bloquean_las_peticiones_siguientes(servidor):
+    _, url = servidor
+    metricas = pedir(url, "/api/metricas")
+    assert metricas["carteras"] == 0
+    estado = pedir(url, "/api/estado?address=addr_test1")
+    assert estado["solved"] == 0
+    assert pedir(url, "/api/metricas")["carteras"] == 1
+
+
+def test_metricas_cuentan_los_bytes_enviados(servidor):
+    _, url = servidor
+    primera = pedir(url, "/api/metricas")
+    segunda = pedir(url, "/api/metricas")
+    assert segunda["bytes_enviados"] > primera["bytes_enviados"]
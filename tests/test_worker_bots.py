@@ -0,0 +1,75 @@
+import pytest
+
+from worker_bots import XPATHS_MONITOREO, parse_timer_to_seconds, parsear_snapshot
+
+
+def snapshot_completo(**cambios):
+    """Snapshot crudo de un dashboard normal (lo que devuelve SCRIPT_SNAPSHOT_DOM)."""
+    crudo = {
+        "claim": "12.5 NIGHT",
+        "my_solutions": "3",
+        "all_solutions": "10450",
+        "solved_count": "3",
+        "next_challenge_in": "00:00:14:05",
+        "miner_status": "Active",
+        "challenge_id": "**D07C15",
+    }
+    crudo.update(cambios)
+    return crudo
+
+
+@pytest.mark.parametrize("texto, segundos", [
+    ("00:00:00:00", 0),
+    ("00:00:14:05", 845),
+    ("01:03:46:39", 99999), # El antiguo valor de error es un timer válido
+    ("2:1:0:5", 2 * 86400 + 3600 + 5),
+])
+def test_parse_timer_validos(texto, segundos):
+    assert parse_timer_to_seconds(texto) == segundos
+
+
+@pytest.mark.parametrize("texto", ["", "14:05", "00:00:14:05:00", "00:00:aa:05", "00:-1:00:00", None])
+def test_parse_timer_malformados(texto):
+    assert parse_timer_to_seconds(texto) is None
+
+
+def test_snapshot_normal():
+    estado, faltantes = parsear_snapshot(snapshot_completo())
+    assert faltantes == []
+    assert estado["solved"] == 3
+    assert estado["timer_seconds"] == 845
+    assert estado["challenge_id"] == "**D07C15"
+
+
+def test_snapshot_timer_de_99999_segundos():
+    estado, faltantes = parsear_snapshot(snapshot_completo(next_challenge_in="01:03:46:39"))
+    assert faltantes == []
+    assert estado["timer_seconds"] == 99999
+
+
+@pytest.mark.parametrize("crudo", [None, {}])
+def test_snapshot_sin_elementos(crudo):
+    estado, faltantes = parsear_snapshot(crudo)
+    assert sorted(faltantes) == sorted(XPATHS_MONITOREO)
+    assert estado["solved"] is None
+    assert estado["timer_seconds"] is None
+
+
+def test_snapshot_elementos_vacios_cuentan_como_faltantes():
+    estado, faltantes = parsear_snapshot(snapshot_completo(miner_status="", challenge_id=None))
+    assert sorted(faltantes) == ["challenge_id", "miner_status"]
+    assert estado["miner_status"] is None and estado["challenge_id"] is None
+
+
+def test_snapshot_solved_no_numerico():
+    estado, faltantes = parsear_snapshot(snapshot_completo(solved_count="--"))
+    assert faltantes == ["solved_count"]
+    assert estado["solved"] is None
+    assert estado["timer_seconds"] == 845
+
+
+def test_snapshot_timer_malformado():
+    estado, faltantes = parsear_snapshot(snapshot_completo(next_challenge_in="Calculating..."))
+    assert faltantes == ["next_challenge_in"]
+    assert estado["timer_seconds"] is None
+    assert estado["solved"] == 3
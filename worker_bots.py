@@ -0,0 +1,901 @@
+import os
+import sys
+import time
+import logging
+import traceback
+from multiprocessing import Queue
+from contextlib import contextmanager
+
+# --- Dependencias de Selenium ---
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+# --- Almacén de carteras (SQLite) ---
+import almacen_carteras
+# --- Árbol de procesos (chromedriver + Chrome) de cada worker ---
+import procesos_navegador
+# --- Logs de los workers por una cola hacia el supervisor ---
+import registro_logs
+# --- Configuración (TOML / línea de comandos) que envía el supervisor ---
+import configuracion
+
+# =============================================================================
+# LÓGICA DEL BOT (WORKER)
+# Todo lo que necesita un proceso worker: navegador, login en el wizard y
+# monitoreo de la cartera. Con el arranque 'spawn' cada worker importa sus
+# módulos desde cero (en cada rotación y en cada crash), así que aquí no entra
+# nada del supervisor ni de la generación de carteras, y pycardano (unos 2.5 s
+# de importación) solo se importa si hay que firmar sin la caché de firmas.
+# =============================================================================
+
+log = logging.getLogger()
+
+# Código de Salida Especial para "Challenge Resuelto"
+EXIT_CODE_SOLVED = 0
+EXIT_CODE_ERROR = 1 # Cualquier fallo del worker (carga de cartera, navegador, wizard...)
+
+# Sitio del wizard. Se puede apuntar a otro (p. ej. servidor_wizard.py en local) con la variable de entorno URL_ORIGEN.
+URL_ORIGEN = (os.environ.get("URL_ORIGEN") or "https://sm.midnight.gd").rstrip("/")
+URL_WIZARD = URL_ORIGEN + "/wizard/mine"
+
+# --- Reinicio escalonado (compartido con el supervisor, que lo importa de aquí) ---
+RESTART_TRIGGER_SECONDS = 20          # Se programa el reinicio del slot cuando su timer baja de X segundos
+ESTABILIZACION_CHALLENGE_SECONDS = 60 # Espera tras el cambio de challenge antes de reiniciar el slot
+REINICIO_TIMEOUT_SECONDS = 300        # Si el slot no vuelve a iniciar sesión en X s, se relanza su proceso a la fuerza
+
+# --- ¡FUNCIÓN DE FIRMA CIP-8! ---
+def clave_de_pago(private_key_hex: str):
+    """PaymentSigningKey de pycardano a partir del hex guardado en el almacén."""
+    from pycardano import PaymentSigningKey # Import diferido: solo se paga si hay que firmar
+    return PaymentSigningKey(bytes.fromhex(private_key_hex))
+
+def firmar_mensaje_cip8(payment_signing_key, message_str: str) -> str:
+    """
+    Firma un mensaje usando el estándar CIP-8 con la Payment Signing Key (ver clave_de_pago).
+    """
+    try:
+        from pycardano.cip import cip8
+        signed_message_hex = cip8.sign(
+            message=message_str,
+            signing_key=payment_signing_key, # USAMOS LA CLAVE DE PAGO
+            attach_cose_key=False # Usamos False porque pegaremos la Public Key por separado
+        )
+        return signed_message_hex
+    except Exception as e:
+        log.error(f"Error al firmar el mensaje CIP-8: {e}")
+        return ""
+# --- FIN DE FUNCIÓN AÑADIDA ---
+
+def parse_timer_to_seconds(timer_str: str):
+    """
+    Convierte un string de tiempo 'dd:hh:mm:ss' en segundos totales.
+    Devuelve None si el texto no tiene ese formato (cualquier entero >= 0 es un timer válido).
+    """
+    try:
+        parts = timer_str.split(':')
+        if len(parts) != 4:
+            return None
+        
+        days = int(parts[0])
+        hours = int(parts[1])
+        minutes = int(parts[2])
+        seconds = int(parts[3])
+        
+        if min(days, hours, minutes, seconds) < 0:
+            return None
+        total_seconds = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
+        return total_seconds
+    except (ValueError, AttributeError):
+        return None
+
+# --- SNAPSHOT DEL DOM (una sola llamada a WebDriver por iteración) ---
+# Campo del snapshot -> XPath del elemento cuyo texto se lee
+XPATHS_MONITOREO = {
+    "claim": "//*[contains(text(), 'Your estimated claim:')]/following-sibling::span",
+    "my_solutions": "//*[contains(text(), 'Your submitted solutions:')]/following-sibling::span",
+    "all_solutions": "//*[contains(text(), 'All submitted solutions:')]/following-sibling::span",
+    "solved_count": "//span[@data-testid='solved-count']",
+    "next_challenge_in": "//div[contains(span, 'Next challenge in:')]/span[2]",
+    "miner_status": "//*[contains(text(), 'Miner status')]/following-sibling::span//span[1]",
+    "challenge_id": "//*[contains(text(), 'Current challenge:')]/following-sibling::span",
+}
+
+# Evalúa todos los XPath en el navegador y devuelve {campo: texto o null}
+SCRIPT_SNAPSHOT_DOM = """
+const xpaths = arguments[0];
+const snapshot = {};
+for (const [campo, xpath] of Object.entries(xpaths)) {
+    const nodo = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    snapshot[campo] = nodo ? (nodo.innerText || nodo.textContent || "").trim() : null;
+}
+return snapshot;
+"""
+
+def parsear_snapshot(crudo: dict):
+    """
+    Convierte el resultado de SCRIPT_SNAPSHOT_DOM en un estado tipado.
+    Devuelve (estado, faltantes): 'faltantes' lista los campos que no se encontraron
+    o no se pudieron parsear (su valor en 'estado' es None).
+    """
+    crudo = crudo or {}
+    estado = {campo: (crudo.get(campo) or None) for campo in XPATHS_MONITOREO}
+    faltantes = [campo for campo, valor in estado.items() if valor is None]
+
+    # solved_count -> int
+    estado["solved"] = None
+    if estado["solved_count"] is not None:
+        try:
+            estado["solved"] = int(estado["solved_count"])
+        except ValueError:
+            faltantes.append("solved_count")
+
+    # next_challenge_in ('dd:hh:mm:ss') -> segundos
+    estado["timer_seconds"] = None
+    if estado["next_challenge_in"] is not None:
+        estado["timer_seconds"] = parse_timer_to_seconds(estado["next_challenge_in"])
+        if estado["timer_seconds"] is None:
+            faltantes.append("next_challenge_in")
+
+    return estado, faltantes
+
+# --- VIGILANCIA POR EVENTOS (MutationObserver en la página) ---
+MONITOR_POLL_SECONDS = 30          # Intervalo fijo del bucle de monitoreo cuando no hay vigilancia por eventos
+MODO_VIGILANCIA = True             # True: el worker despierta en cuanto cambia 'solved-count' o el timer cruza el umbral
+INTERVALO_VIGILANCIA_SECONDS = 120 # Sin cambios en la página, despertar (y reportar) como mucho cada X segundos
+INTERVALO_ALERTA_SECONDS = 10      # Cerca del cambio de challenge, despertar cada X s para atender un reinicio del supervisor
+
+# Instala (una vez por carga de página) un MutationObserver que apunta los eventos
+# "solved" (cambia solved-count), "timer" (el timer baja de arguments[1]) y
+# "rollover" (el timer salta hacia arriba: nuevo challenge). Después espera de
+# forma asíncrona hasta que haya eventos o pasen arguments[0] ms ("timeout").
+SCRIPT_ESPERAR_CAMBIO = """
+const timeoutMs = arguments[0];
+const umbralTimer = arguments[1];
+const xpathTimer = arguments[2];
+const solvedConocido = arguments[3];
+const done = arguments[arguments.length - 1];
+const leerTimer = () => {
+    const nodo = document.evaluate(xpathTimer, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!nodo) return null;
+    const partes = (nodo.textContent || "").trim().split(":").map(Number);
+    if (partes.length !== 4 || partes.some(isNaN)) return null;
+    return ((partes[0] * 24 + partes[1]) * 60 + partes[2]) * 60 + partes[3];
+};
+const leerSolved = () => {
+    const nodo = document.querySelector("[data-testid='solved-count']");
+    return nodo ? (nodo.textContent || "").trim() : null;
+};
+let v = window.__vigilante;
+if (!v) {
+    v = window.__vigilante = {eventos: [], esperando: null, temporizador: null,
+                              solved: solvedConocido !== null ? String(solvedConocido) : leerSolved(),
+                              timer: leerTimer(), avisoTimer: false};
+    const notificar = (evento) => {
+        v.eventos.push(evento);
+        if (v.esperando) { const entregar = v.esperando; v.esperando = null; entregar(); }
+    };
+    new MutationObserver(() => {
+        const solved = leerSolved();
+        if (solved !== null && solved !== v.solved) { v.solved = solved; notificar("solved"); }
+        const timer = leerTimer();
+        if (timer !== null) {
+            if (v.timer !== null && timer > v.timer + 60) { v.avisoTimer = false; notificar("rollover"); }
+            if (timer < umbralTimer && !v.avisoTimer) { v.avisoTimer = true; notificar("timer"); }
+            v.timer = timer;
+        }
+    }).observe(document.body, {subtree: true, childList: true, characterData: true});
+}
+clearTimeout(v.temporizador);
+const entregar = () => {
+    clearTimeout(v.temporizador);
+    const eventos = v.eventos;
+    v.eventos = [];
+    done(eventos.length ? eventos : ["timeout"]);
+};
+if (v.eventos.length) { entregar(); }
+else {
+    v.esperando = entregar;
+    v.temporizador = setTimeout(() => { v.esperando = null; entregar(); }, timeoutMs);
+}
+"""
+
+def esperar_cambio_en_pagina(driver, segundos_max: int, solved_conocido):
+    """
+    Bloquea hasta que la página notifica un cambio relevante o pasan 'segundos_max'.
+    Devuelve la lista de eventos (["timeout"] si no hubo ninguno) o None si la
+    vigilancia no está disponible (el llamador debe volver al sondeo fijo).
+    """
+    try:
+        return driver.execute_async_script(
+            SCRIPT_ESPERAR_CAMBIO,
+            int(segundos_max * 1000),
+            RESTART_TRIGGER_SECONDS,
+            XPATHS_MONITOREO["next_challenge_in"],
+            solved_conocido
+        )
+    except Exception as e:
+        log.debug(f"Vigilancia por eventos no disponible: {e}")
+        return None
+
+
+# --- PERFIL DEL NAVEGADOR ---
+# Del sitio solo se lee texto: con el perfil "ligero" Chrome no descarga imágenes
+# raster, fuentes, media ni los scripts de los servicios de analítica conocidos, usa
+# una ventana pequeña y apaga funciones que no se usan. "completo" es el perfil
+# original y sigue siendo el de por defecto hasta que la comparación con
+# benchmark_bots.py --recursos-pesados --perfil dé números y "ligero" se valide en
+# el sitio real. Se lee del entorno para que los workers lo hereden.
+PERFILES_NAVEGADOR = ("ligero", "completo")
+PERFIL_NAVEGADOR = os.environ.get("PERFIL_NAVEGADOR") or "completo"
+VENTANA_LIGERO = "1024,768"
+# Servicios de analítica/telemetría de terceros que bloquea el perfil ligero (el host y sus subdominios)
+HOSTS_ANALITICA_LIGERO = ("google-analytics.com", "googletagmanager.com", "doubleclick.net",
+                          "hotjar.com", "clarity.ms", "sentry.io")
+# Bloqueadas por CDP (Network.setBlockedURLs) en cada pestaña; '*' es comodín.
+# Los SVG no se bloquean: el wizard puede usarlos en sus controles.
+URLS_BLOQUEADAS_LIGERO = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",  # Imágenes raster
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*://fonts.googleapis.com/*", "*://fonts.gstatic.com/*",  # Fuentes
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav", "*.m3u8",  # Media
+] + [f"*://{prefijo}{host}/*" for host in HOSTS_ANALITICA_LIGERO for prefijo in ("", "*.")]  # Analítica
+# Content settings: 2 = bloquear
+PREFERENCIAS_LIGERO = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+    "profile.default_content_setting_values.media_stream": 2,
+}
+ARGUMENTOS_LIGERO = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--no-first-run",
+    "--mute-audio",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,InterestFeedContentSuggestions",
+]
+
+def bloquear_recursos(driver):
+    """Con el perfil ligero, bloquea URLS_BLOQUEADAS_LIGERO en la pestaña actual (hay que repetirlo en cada pestaña nueva)."""
+    if PERFIL_NAVEGADOR != "ligero":
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": URLS_BLOQUEADAS_LIGERO})
+    except Exception as e:
+        log.warning(f"No se pudieron bloquear los recursos pesados en esta pestaña: {e}")
+
+def crear_navegador(driver_path: str, slot_id=None):
+    """
+    Configura y arranca un Chrome headless controlado por Selenium y registra su
+    árbol de procesos (ver procesos_navegador) para que el supervisor pueda
+    limpiarlo si el worker muere sin cerrarlo.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--headless") 
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/5.37.36 (KHTML, like Gecko) Chrome/90.0.4430.85 Safari/537.36")
+    if PERFIL_NAVEGADOR == "ligero":
+        chrome_options.add_argument(f"--window-size={VENTANA_LIGERO}")
+        for argumento in ARGUMENTOS_LIGERO:
+            chrome_options.add_argument(argumento)
+        chrome_options.add_experimental_option("prefs", PREFERENCIAS_LIGERO)
+    else:
+        chrome_options.add_argument("--window-size=1920,1080")
+
+    # Resuelto una vez por el supervisor (resolver_chromedriver); en POSIX, en su propio grupo de procesos
+    service = Service(driver_path, **procesos_navegador.opciones_servicio())
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    try:
+        procesos_navegador.registrar(driver, slot_id)
+    except Exception as e:
+        log.warning(f"No se pudo registrar el navegador (no se limpiará si el worker muere): {e}")
+    bloquear_recursos(driver)
+    return driver
+
+def cerrar_navegador(driver):
+    """driver.quit() y olvida su registro: ya no queda nada que limpiar."""
+    driver.quit()
+    procesos_navegador.desregistrar(getattr(driver.service.process, "pid", None))
+
+def limpiar_sesion_navegador(driver):
+    """
+    Borra el estado de sesión (cookies, localStorage, IndexedDB, caché...) del sitio
+    para que el mismo Chrome pueda usarse con otra cartera sin relanzarlo.
+    Lanza excepción si el navegador ya no responde.
+    """
+    driver.get("about:blank")
+    try:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": URL_ORIGEN, "storageTypes": "all"})
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except Exception:
+        # Sin CDP: limpiar a mano desde el propio origen
+        driver.get(URL_ORIGEN)
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        driver.get("about:blank")
+
+# --- PERSISTENCIA DE SESIÓN POR CARTERA ---
+REANUDAR_SESIONES = True             # Guardar cookies + storage tras 'Start session' y, al relanzar la cartera, entrar directo al panel
+SESION_MAX_EDAD_SECONDS = 12 * 3600  # Las sesiones guardadas más antiguas no se intentan reanudar
+TIMEOUT_REANUDAR_SECONDS = 15        # Espera máxima a que la página muestre el panel (o el wizard) al reanudar
+
+# --- Esperas del login ---
+TIMEOUT_WIZARD_SECONDS = 20          # Espera máxima de cada paso del wizard (WebDriverWait)
+TIMEOUT_INICIO_SESION_SECONDS = 40   # Espera máxima al botón 'Start session' tras firmar
+ESTABILIZACION_LOGIN_SECONDS = 10    # Pausa tras 'Start session' antes de leer el estado inicial
+
+SCRIPT_LEER_STORAGE = """
+return {local: Object.assign({}, window.localStorage), session: Object.assign({}, window.sessionStorage)};
+"""
+SCRIPT_ESCRIBIR_STORAGE = """
+const datos = arguments[0];
+for (const [clave, valor] of Object.entries(datos.local || {})) window.localStorage.setItem(clave, valor);
+for (const [clave, valor] of Object.entries(datos.session || {})) window.sessionStorage.setItem(clave, valor);
+"""
+CAMPOS_COOKIE = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+def guardar_sesion_navegador(driver, wallet_id: int, log_bot):
+    """Guarda en el almacén las cookies y el local/sessionStorage de la sesión actual de la cartera."""
+    try:
+        datos = driver.execute_script(SCRIPT_LEER_STORAGE) or {}
+        datos["cookies"] = driver.get_cookies()
+        almacen_carteras.guardar_sesion(wallet_id, datos)
+        log_bot(f"Sesión guardada ({len(datos['cookies'])} cookies, {len(datos.get('local') or {})} claves de localStorage).", logging.DEBUG)
+    except Exception as e:
+        log_bot(f"ADVERTENCIA: No se pudo guardar la sesión del navegador: {e}", logging.WARNING)
+
+def reanudar_sesion(driver, wallet_id: int, datos: dict, log_bot):
+    """
+    Intenta entrar directamente al panel de minado con la sesión guardada 'datos'
+    (ver guardar_sesion_navegador). Devuelve el número inicial de challenges resueltos
+    si lo consigue, o None si la sesión ya no vale (se borra y se limpia la pestaña
+    para hacer el wizard completo).
+    """
+    panel = (By.XPATH, XPATHS_MONITOREO["solved_count"])
+    wizard = (By.XPATH, "//button[contains(text(), 'Enter an address manually')]")
+    try:
+        # Las cookies y el storage solo se pueden escribir desde el propio origen
+        driver.get(URL_ORIGEN)
+        for cookie in datos.get("cookies") or []:
+            try:
+                driver.add_cookie({k: v for k, v in cookie.items() if k in CAMPOS_COOKIE})
+            except Exception:
+                pass # Cookie de otro dominio o caducada
+        driver.execute_script(SCRIPT_ESCRIBIR_STORAGE, datos)
+        driver.get(URL_WIZARD)
+
+        espera = WebDriverWait(driver, TIMEOUT_REANUDAR_SECONDS)
+        espera.until(EC.any_of(EC.visibility_of_element_located(panel), EC.presence_of_element_located(wizard)))
+        if driver.find_elements(*wizard):
+            raise ValueError("la página volvió al wizard")
+        # El contador puede tardar un momento en rellenarse
+        solved = espera.until(lambda d: d.find_element(*panel).text.strip().isdigit() and d.find_element(*panel).text.strip())
+        log_bot(f"Sesión reanudada directamente en el panel (sin wizard). Solved: {solved}")
+        return int(solved)
+    except Exception as e:
+        log_bot(f"No se pudo reanudar la sesión guardada ({e}). Haciendo el wizard completo...")
+
+    almacen_carteras.borrar_sesion(wallet_id)
+    # Limpiar solo esta pestaña/contexto para que el wizard empiece de cero
+    driver.delete_all_cookies()
+    driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    return None
+
+@contextmanager
+def medir_paso(mediciones: list, paso: str):
+    """
+    Mide la duración de un paso del wizard y la añade a 'mediciones' como
+    {"paso", "segundos", "resultado"} ("ok", "timeout" o "error"). No captura la excepción.
+    """
+    inicio = time.perf_counter()
+    resultado = "error"
+    try:
+        yield
+        resultado = "ok"
+    except TimeoutException:
+        resultado = "timeout"
+        raise
+    finally:
+        mediciones.append({"paso": paso, "segundos": round(time.perf_counter() - inicio, 3), "resultado": resultado})
+
+def login_cartera(driver, wallet_id: int, log_bot, mediciones: list = None) -> int:
+    """
+    Hace login con la cartera 'wallet_id' en la ventana actual (wizard, pasos 1 a 14,
+    o directamente al panel si REANUDAR_SESIONES y hay una sesión guardada válida)
+    y devuelve el número inicial de challenges resueltos. Si se pasa 'mediciones',
+    se le añade la duración y el resultado de cada paso (ver medir_paso).
+    Los errores (carga de cartera, timeouts del wizard...) se propagan como excepción.
+    """
+    if mediciones is None:
+        mediciones = []
+
+    # 1. Cargar datos de la cartera
+    with medir_paso(mediciones, "cargar_cartera"):
+        wallet_data = almacen_carteras.obtener_cartera(wallet_id)
+        if wallet_data is None:
+            raise KeyError(f"la cartera {wallet_id} no existe en el almacén")
+    
+    address = wallet_data["address"]
+    public_key = wallet_data["public_key_hex"]
+    private_key_hex = wallet_data["payment_private_key_hex"] 
+    
+    log_bot(f"Cartera cargada. Dirección: {address[:20]}...")
+
+    # Sesión guardada de un lanzamiento anterior: evita los pasos 1 a 14
+    sesion_guardada = almacen_carteras.obtener_sesion(wallet_id, SESION_MAX_EDAD_SECONDS) if REANUDAR_SESIONES else None
+    if sesion_guardada:
+        inicio = time.perf_counter()
+        reanudado = reanudar_sesion(driver, wallet_id, sesion_guardada, log_bot)
+        mediciones.append({"paso": "reanudar_sesion", "segundos": round(time.perf_counter() - inicio, 3),
+                           "resultado": "ok" if reanudado is not None else "invalida"})
+        if reanudado is not None:
+            return reanudado
+
+    wait = WebDriverWait(driver, TIMEOUT_WIZARD_SECONDS) 
+
+    # Paso 1: Ir a la página
+    with medir_paso(mediciones, "cargar_pagina"):
+        driver.get(URL_WIZARD)
+    log_bot(f"Abierta la página: {driver.title}")
+
+    # --- INICIO LÓGICA DE LOGIN (Pasos 2 a 13) ---
+    # Paso 2: Clic en "Enter an address manually"
+    with medir_paso(mediciones, "direccion_manual"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[contains(text(), 'Enter an address manually')]")
+        )).click()
+    log_bot("Clic en 'Enter an address manually'.")
+
+    # Paso 3: Pegar la address
+    with medir_paso(mediciones, "pegar_direccion"):
+        wait.until(EC.visibility_of_element_located(
+            (By.XPATH, "//input[@placeholder='Please enter an unused Cardano address']")
+        )).send_keys(address)
+    log_bot("Dirección (Base Address) pegada.")
+
+    # Paso 4: Clic en "Continue"
+    with medir_paso(mediciones, "continue"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Continue']")
+        )).click()
+    log_bot("Clic en 'Continue'.")
+
+    # Paso 5: Clic en "Next"
+    with medir_paso(mediciones, "next_1"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Next']")
+        )).click()
+    log_bot("Clic en 'Next' (1/2).")
+
+    # Paso 6: Clic en "Next" (otra vez)
+    with medir_paso(mediciones, "next_2"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Next']")
+        )).click()
+    log_bot("Clic en 'Next' (2/2).")
+
+    # Paso 7: Scroll y clic en checkbox "accept-terms"
+    log_bot("Página de términos. Buscando checkbox...")
+    with medir_paso(mediciones, "checkbox_terminos"):
+        checkbox = wait.until(EC.presence_of_element_located(
+            (By.ID, "accept-terms")
+        ))
+        driver.execute_script("arguments[0].click();", checkbox)
+    log_bot("Checkbox de términos marcado.")
+
+    # Paso 8: Clic en "Accept and sign"
+    with medir_paso(mediciones, "accept_and_sign"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Accept and sign']")
+        )).click()
+    log_bot("Clic en 'Accept and sign'.")
+
+    # --- FASE DE FIRMA ---
+    log_bot("Iniciando fase de firma...")
+    with medir_paso(mediciones, "firmar_mensaje"):
+        message_element = wait.until(EC.visibility_of_element_located(
+            (By.XPATH, "//div[contains(text(), 'I agree to abide by the terms')]")
+        ))
+        texto_challenge = message_element.text
+        firma_hex = None
+        try:
+            firma_hex = almacen_carteras.obtener_firma_cache(address, texto_challenge)
+        except Exception as e:
+            log_bot(f"ADVERTENCIA: No se pudo consultar la caché de firmas: {e}", logging.WARNING)
+        firma_en_cache = bool(firma_hex)
+        if not firma_en_cache:
+            firma_hex = firmar_mensaje_cip8(clave_de_pago(private_key_hex), texto_challenge)
+    
+    # --- Guardar Firma en el almacén (y en la caché) ---
+    if firma_en_cache:
+        log_bot("Firma reutilizada de la caché (mismo texto de términos).")
+    else:
+        try:
+            almacen_carteras.guardar_firma(wallet_id, firma_hex)
+            if firma_hex:
+                almacen_carteras.guardar_firmas_cache([(address, firma_hex)], texto_challenge)
+        except Exception as e:
+            log_bot(f"ADVERTENCIA: No se pudo guardar la firma en el almacén: {e}", logging.WARNING)
+
+    # --- LÓGICA DE PEGADO Y EDICIÓN MANUAL ---
+    with medir_paso(mediciones, "pegar_firma"):
+        signature_textarea = wait.until(EC.visibility_of_element_located(
+            (By.XPATH, "//textarea[@placeholder='Please enter the signature generated by your wallet']")
+        ))
+        driver.execute_script("arguments[0].value = arguments[1];", signature_textarea, firma_hex)
+        signature_textarea.click() 
+        signature_textarea.send_keys(Keys.SPACE)
+        signature_textarea.send_keys(Keys.BACKSPACE)
+        
+        public_key_input = wait.until(EC.visibility_of_element_located(
+            (By.XPATH, "//input[@placeholder='Please enter a public key']")
+        ))
+        driver.execute_script("arguments[0].value = arguments[1];", public_key_input, public_key)
+        public_key_input.click()
+        public_key_input.send_keys(Keys.SPACE)
+        public_key_input.send_keys(Keys.BACKSPACE)
+
+    # Paso 13: Clic en "Sign"
+    with medir_paso(mediciones, "sign"):
+        wait.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Sign']")
+        )).click()
+    log_bot("Clic en 'Sign'.")
+    # --- FIN LÓGICA LOGIN ---
+
+
+    # Paso 14: Clic en "Start session"
+    wait_long = WebDriverWait(driver, TIMEOUT_INICIO_SESION_SECONDS) 
+    with medir_paso(mediciones, "start_session"):
+        wait_long.until(EC.element_to_be_clickable(
+            (By.XPATH, "//button[text()='Start session']")
+        )).click()
+    log_bot("¡Sesión iniciada! Estabilizando para capturar estado inicial...")
+
+    # --- Capturar estado inicial ---
+    time.sleep(ESTABILIZACION_LOGIN_SECONDS) # Espera a que la página se estabilice
+    initial_solved_challenges = -1
+    try:
+        with medir_paso(mediciones, "estado_inicial"):
+            initial_solved_challenges_str = wait.until(EC.visibility_of_element_located(
+                (By.XPATH, "//span[@data-testid='solved-count']")
+            )).text
+            initial_solved_challenges = int(initial_solved_challenges_str)
+        log_bot(f"Estado inicial capturado -> Solved: {initial_solved_challenges}")
+    except Exception as e:
+        log_bot(f"Error capturando estado inicial. Asumiendo 0. Error: {e}", logging.WARNING)
+        initial_solved_challenges = 0 # Fallback
+
+    if REANUDAR_SESIONES:
+        guardar_sesion_navegador(driver, wallet_id, log_bot)
+
+    return initial_solved_challenges
+
+def enviar_mediciones_login(status_queue: Queue, slot_id: int, wallet_id: int, mediciones: list):
+    """Envía al supervisor las duraciones de los pasos del wizard (también las de un login fallido)."""
+    if mediciones:
+        status_queue.put({"slot": slot_id, "wallet_id": wallet_id, "tipo": "pasos_login", "pasos": mediciones})
+
+def comprobar_progreso(driver, sesion: dict, status_queue: Queue, log_bot) -> bool:
+    """
+    Una iteración del monitoreo sobre la ventana actual: lee el snapshot, lo registra
+    y reporta el timer al supervisor. 'sesion' contiene slot, wallet_id,
+    initial_solved y ultimo_solved (se actualiza aquí). Devuelve True si resolvió.
+    """
+    slot_id = sesion["slot"]
+    wallet_id = sesion["wallet_id"]
+    initial_solved_challenges = sesion["initial_solved"]
+    try:
+        # --- Capturar estado actual (un único execute_script para todos los campos) ---
+        estado, faltantes = parsear_snapshot(driver.execute_script(SCRIPT_SNAPSHOT_DOM, XPATHS_MONITOREO))
+
+        if len(faltantes) >= len(XPATHS_MONITOREO):
+            # No se encontró nada: la página está rota o en blanco
+            log_bot("No se pudo leer ningún dato de progreso. Refrescando...", logging.WARNING)
+            driver.refresh()
+            return False
+        if faltantes:
+            log_bot(f"Campos de progreso no disponibles (puede ser temporal): {', '.join(faltantes)}", logging.WARNING)
+
+        # --- Log de Progreso (un registro estructurado; va al JSONL, no a la consola) ---
+        log_bot(f"PROGRESO: [{estado['miner_status']}] Claim: {estado['claim']} | Solved: {estado['solved']} (Initial: {initial_solved_challenges}) | Current ID: {estado['challenge_id']} | Timer: {estado['next_challenge_in']}",
+                paso="progreso", miner_status=estado["miner_status"], claim=estado["claim"], solved=estado["solved"],
+                initial_solved=initial_solved_challenges, challenge_id=estado["challenge_id"], timer_seconds=estado["timer_seconds"])
+
+        # --- ¡NUEVO! Lógica de salida por éxito (Challenge Solved) ---
+        if estado["solved"] is not None and estado["solved"] > initial_solved_challenges:
+            log_bot(f"¡ÉXITO! Challenge resuelto. (Solved: {estado['solved']} > {initial_solved_challenges})")
+            return True
+        if estado["solved"] is not None:
+            sesion["ultimo_solved"] = estado["solved"]
+
+
+        # --- Reportar estado al Supervisor (Timer y Challenge ID) ---
+        if estado["timer_seconds"] is not None:
+            status_queue.put({
+                "slot": slot_id,
+                "wallet_id": wallet_id, 
+                "timer_seconds": estado["timer_seconds"],
+                "challenge_id": estado["challenge_id"]
+            })
+        
+    except Exception as e:
+        log_bot(f"Error inesperado en el bucle de monitoreo: {e}", logging.ERROR)
+        # Reportar un estado de "error" (timer -1)
+        status_queue.put({"slot": slot_id, "wallet_id": wallet_id, "timer_seconds": -1})
+    return False
+
+def ejecutar_cartera(driver, wallet_id: int, slot_id: int, status_queue: Queue, log_bot, interrumpir=None) -> bool:
+    """
+    Hace login con la cartera 'wallet_id' en el navegador ya abierto y monitorea
+    hasta que resuelve un challenge. Devuelve True cuando lo resuelve.
+    'interrumpir' (opcional, p. ej. conn.poll) se consulta en cada iteración: si
+    devuelve True el supervisor ya envió otra asignación y se devuelve False.
+    Los errores (carga de cartera, timeouts del wizard...) se propagan como excepción.
+    """
+    mediciones = []
+    try:
+        initial_solved_challenges = login_cartera(driver, wallet_id, log_bot, mediciones)
+    finally:
+        enviar_mediciones_login(status_queue, slot_id, wallet_id, mediciones)
+    sesion = {"slot": slot_id, "wallet_id": wallet_id,
+              "initial_solved": initial_solved_challenges, "ultimo_solved": initial_solved_challenges}
+    # Avisar al supervisor (cierra el reinicio escalonado del slot, si lo había)
+    status_queue.put({"slot": slot_id, "wallet_id": wallet_id, "tipo": "sesion_iniciada"})
+
+    # Paso 15: Bucle de monitoreo (¡CÓDIGO DE REPORTE!)
+    if MODO_VIGILANCIA:
+        driver.set_script_timeout(INTERVALO_VIGILANCIA_SECONDS + 10)
+    alerta_hasta = 0 # Mientras dure, se despierta cada INTERVALO_ALERTA_SECONDS (reinicio inminente)
+    while True:
+        if comprobar_progreso(driver, sesion, status_queue, log_bot):
+            return True
+        if interrumpir is not None and interrumpir():
+            log_bot("Sesión interrumpida por el supervisor (reinicio del slot).")
+            return False
+
+        # --- Esperar al siguiente cambio (o al siguiente sondeo) ---
+        espera = INTERVALO_ALERTA_SECONDS if time.time() < alerta_hasta else INTERVALO_VIGILANCIA_SECONDS
+        eventos = esperar_cambio_en_pagina(driver, espera, sesion["ultimo_solved"]) if MODO_VIGILANCIA else None
+        if eventos is None:
+            if interrumpir is not None:
+                interrumpir(MONITOR_POLL_SECONDS) # Despierta antes si llega una asignación
+            else:
+                time.sleep(MONITOR_POLL_SECONDS)
+        elif eventos != ["timeout"]:
+            log_bot(f"Cambio detectado en la página: {', '.join(eventos)}", logging.DEBUG)
+            if interrumpir is not None and ("timer" in eventos or "rollover" in eventos):
+                alerta_hasta = time.time() + RESTART_TRIGGER_SECONDS + ESTABILIZACION_CHALLENGE_SECONDS + REINICIO_TIMEOUT_SECONDS
+
+def _log_bot_para(wallet_id, slot_id=None):
+    """
+    Devuelve un helper de log para la cartera: log_bot(mensaje, level, paso=None, **campos).
+    Cada registro lleva slot, wallet_id, paso y campos como atributos (ver registro_logs).
+    """
+    def log_bot(mensaje, level=logging.INFO, paso=None, **campos):
+        log.log(level, mensaje, extra={"slot": slot_id, "wallet_id": wallet_id, "paso": paso, "campos": campos})
+    return log_bot
+
+def ajustes_aplicados(valores: dict):
+    """Hook de configuracion.aplicar: recalcula URL_WIZARD si la configuración cambió URL_ORIGEN."""
+    global URL_ORIGEN, URL_WIZARD
+    if "URL_ORIGEN" in valores:
+        URL_ORIGEN = valores["URL_ORIGEN"].rstrip("/")
+        URL_WIZARD = URL_ORIGEN + "/wizard/mine"
+
+def modulos_configurables() -> dict:
+    """Secciones de la configuración que aplica un worker -> módulo cuyas constantes ajustan."""
+    return {"worker": sys.modules[__name__], "logs": registro_logs, "almacen": almacen_carteras, "procesos": procesos_navegador}
+
+
+def preparar_worker(slot_id, cola_logs, ajustes):
+    """Al empezar un proceso worker: aplica la configuración del supervisor y envía los logs a su cola."""
+    configuracion.aplicar(ajustes, modulos_configurables())
+    if cola_logs is not None:
+        registro_logs.configurar_worker(cola_logs, slot_id)
+
+
+def run_bot_worker(wallet_id: int, slot_id: int, status_queue: Queue, driver_path: str, cola_logs=None, ajustes=None):
+    """
+    Esta función es el TRABAJO que realizará CADA bot de Selenium (un proceso y un Chrome por cartera).
+    Reporta su estado y sale con código 0 si SOLVED. 
+    """
+    preparar_worker(slot_id, cola_logs, ajustes)
+    log_bot = _log_bot_para(wallet_id, slot_id)
+    log_bot(f"Bot iniciado. Cargando datos de cartera {wallet_id} desde '{almacen_carteras.ALMACEN_DB}'")
+
+    driver = None # Definir el driver fuera del try para el 'finally'
+    resuelto = False
+    try:
+        driver = crear_navegador(driver_path, slot_id)
+        log_bot("Navegador iniciado.")
+        resuelto = ejecutar_cartera(driver, wallet_id, slot_id, status_queue, log_bot)
+        log_bot("Cerrando este worker para rotación de NUEVA wallet. Saliendo con código 0...")
+    except TimeoutException:
+        log_bot("ERROR: Un elemento no se encontró o no estuvo clicable a tiempo. El bot se detendrá.", logging.ERROR)
+        traceback.print_exc()
+    except KeyboardInterrupt:
+        log_bot("Cierre por Ctrl+C detectado en el worker...", logging.INFO)
+    except Exception as e:
+        log_bot(f"ERROR fatal en el bot: {e}", logging.ERROR)
+        traceback.print_exc()
+    finally:
+        if driver:
+            log_bot("Ejecutando driver.quit() en 'finally'...", logging.INFO)
+            cerrar_navegador(driver)
+        log_bot("Navegador cerrado. Proceso terminado (por 'finally').")
+
+    sys.exit(EXIT_CODE_SOLVED if resuelto else EXIT_CODE_ERROR)
+
+def run_browser_worker(slot_id: int, conn, status_queue: Queue, driver_path: str, cola_logs=None, ajustes=None):
+    """
+    Worker de navegador PERSISTENTE: arranca Chrome una sola vez y recibe carteras
+    por 'conn' (un Pipe) como {"slot", "wallet_id"}. Tras cada challenge resuelto solo
+    limpia la sesión y responde {"slot", "evento": "resuelto", "wallet_id"} para que
+    el supervisor le envíe la siguiente. Si la cartera falla responde "fallo".
+    Una asignación que llega en mitad de una sesión la interrumpe sin responder
+    (así reinicia el supervisor un slot sin relanzar Chrome).
+    Recibir None lo cierra. Si el propio navegador deja de responder, sale con EXIT_CODE_ERROR.
+    """
+    preparar_worker(slot_id, cola_logs, ajustes)
+    log.info(f"[slot_{slot_id}] Navegador persistente iniciándose...")
+    driver = None
+    try:
+        driver = crear_navegador(driver_path, slot_id)
+        log.info(f"[slot_{slot_id}] Navegador iniciado. Esperando cartera...")
+
+        while True:
+            asignacion = conn.recv()
+            if asignacion is None:
+                log.info(f"[slot_{slot_id}] Orden de cierre recibida.")
+                break
+            wallet_id = asignacion["wallet_id"]
+
+            log_bot = _log_bot_para(wallet_id, slot_id)
+            log_bot(f"Cartera asignada al navegador del slot {slot_id}.")
+            evento = "fallo"
+            try:
+                if ejecutar_cartera(driver, wallet_id, slot_id, status_queue, log_bot, interrumpir=conn.poll):
+                    evento = "resuelto"
+                else:
+                    evento = None # Interrumpida: la siguiente asignación ya espera en 'conn'
+            except TimeoutException:
+                log_bot("ERROR: Un elemento no se encontró o no estuvo clicable a tiempo.", logging.ERROR)
+                traceback.print_exc()
+            except Exception as e:
+                log_bot(f"ERROR en la sesión de la cartera: {e}", logging.ERROR)
+                traceback.print_exc()
+
+            # Si limpiar falla, el navegador está roto: salir para que el supervisor lo relance
+            limpiar_sesion_navegador(driver)
+            log_bot(f"Sesión limpiada (resultado: {evento or 'interrumpida'}). Navegador listo para la siguiente cartera.")
+            if evento:
+                conn.send({"slot": slot_id, "evento": evento, "wallet_id": wallet_id})
+
+    except (EOFError, KeyboardInterrupt):
+        log.info(f"[slot_{slot_id}] Supervisor desconectado o Ctrl+C. Cerrando navegador...")
+    except Exception as e:
+        log.error(f"[slot_{slot_id}] ERROR fatal en el navegador persistente: {e}")
+        traceback.print_exc()
+        sys.exit(EXIT_CODE_ERROR)
+    finally:
+        if driver:
+            cerrar_navegador(driver)
+        log.info(f"[slot_{slot_id}] Navegador cerrado. Proceso terminado (por 'finally').")
+
+
+# --- VARIAS CARTERAS POR NAVEGADOR (contextos aislados) ---
+
+def crear_contexto_aislado(driver):
+    """
+    Crea un contexto de navegador aislado (cookies y storage propios, como una ventana
+    de incógnito) con una pestaña, y cambia el driver a ella.
+    Devuelve (browser_context_id, window_handle).
+    """
+    contexto = driver.execute_cdp_cmd("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+    handles_antes = set(driver.window_handles)
+    target_id = driver.execute_cdp_cmd("Target.createTarget", {"url": "about:blank", "browserContextId": contexto})["targetId"]
+    handles = driver.window_handles
+    # chromedriver usa el targetId como window handle; por si acaso, buscar la ventana nueva
+    handle = target_id if target_id in handles else next(iter(set(handles) - handles_antes), None)
+    if handle is None:
+        raise RuntimeError("chromedriver no expone la pestaña del contexto aislado")
+    driver.switch_to.window(handle)
+    bloquear_recursos(driver) # El bloqueo es por pestaña
+    return contexto, handle
+
+def cerrar_contexto_aislado(driver, contexto, handle_base):
+    """Destruye el contexto (y todo su estado de sesión) y vuelve a la ventana base."""
+    driver.switch_to.window(handle_base)
+    driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": contexto})
+
+def run_multi_browser_worker(slot_ids: list, conn, status_queue: Queue, driver_path: str, cola_logs=None, ajustes=None):
+    """
+    Worker de navegador persistente que aloja VARIOS slots en un único Chrome.
+    Cada slot trabaja en su propio contexto aislado (Target.createBrowserContext).
+    Usa el mismo protocolo por 'conn' que run_browser_worker ({"slot", "wallet_id"}
+    -> {"slot", "evento", "wallet_id"}) y reporta a status_queue con el ID de
+    cada slot, así que para el supervisor cada slot sigue siendo independiente.
+    El login de un slot bloquea brevemente el monitoreo del resto; el monitoreo
+    es por sondeo (MONITOR_POLL_SECONDS) repartido entre los contextos.
+    """
+    preparar_worker(None, cola_logs, ajustes)
+    etiqueta = f"[navegador_{'_'.join(str(i) for i in slot_ids)}]"
+    log.info(f"{etiqueta} Navegador compartido iniciándose para {len(slot_ids)} slots...")
+    driver = None
+    sesiones = {} # slot_id -> {"contexto", "handle", "wallet_id", "initial_solved", "ultimo_solved", "proximo"}
+    try:
+        driver = crear_navegador(driver_path, slot_ids[0])
+        handle_base = driver.current_window_handle
+        log.info(f"{etiqueta} Navegador iniciado. Esperando carteras...")
+
+        def terminar_sesion(slot_id, evento):
+            # Destruye el contexto (limpia la sesión) y avisa al supervisor
+            sesion = sesiones.pop(slot_id)
+            cerrar_contexto_aislado(driver, sesion["contexto"], handle_base)
+            conn.send({"slot": slot_id, "evento": evento, "wallet_id": sesion["wallet_id"]})
+
+        while True:
+            # 1. Nuevas asignaciones del supervisor (login en un contexto nuevo)
+            espera = min([s["proximo"] for s in sesiones.values()], default=time.time() + MONITOR_POLL_SECONDS) - time.time()
+            while conn.poll(max(0, espera)):
+                asignacion = conn.recv()
+                if asignacion is None:
+                    log.info(f"{etiqueta} Orden de cierre recibida.")
+                    return
+                slot_id, wallet_id = asignacion["slot"], asignacion["wallet_id"]
+                if slot_id in sesiones:
+                    cerrar_contexto_aislado(driver, sesiones.pop(slot_id)["contexto"], handle_base)
+
+                log_bot = _log_bot_para(wallet_id, slot_id)
+                log_bot(f"Cartera asignada al slot {slot_id} (navegador compartido).")
+                contexto, handle = crear_contexto_aislado(driver)
+                sesiones[slot_id] = {"slot": slot_id, "wallet_id": wallet_id, "contexto": contexto, "handle": handle,
+                                     "initial_solved": 0, "ultimo_solved": 0, "proximo": time.time()}
+                mediciones = []
+                try:
+                    sesiones[slot_id]["initial_solved"] = login_cartera(driver, wallet_id, log_bot, mediciones)
+                    sesiones[slot_id]["ultimo_solved"] = sesiones[slot_id]["initial_solved"]
+                    status_queue.put({"slot": slot_id, "wallet_id": wallet_id, "tipo": "sesion_iniciada"})
+                except Exception as e:
+                    log_bot(f"ERROR en el login de la cartera: {e}", logging.ERROR)
+                    traceback.print_exc()
+                    terminar_sesion(slot_id, "fallo")
+                finally:
+                    enviar_mediciones_login(status_queue, slot_id, wallet_id, mediciones)
+                espera = 0
+
+            # 2. Monitoreo de los slots a los que les toca
+            ahora = time.time()
+            for slot_id in [i for i, s in sesiones.items() if s["proximo"] <= ahora]:
+                sesion = sesiones[slot_id]
+                log_bot = _log_bot_para(sesion["wallet_id"], slot_id)
+                driver.switch_to.window(sesion["handle"])
+                if comprobar_progreso(driver, sesion, status_queue, log_bot):
+                    terminar_sesion(slot_id, "resuelto")
+                    log_bot("Contexto destruido. Slot listo para la siguiente cartera.")
+                else:
+                    sesion["proximo"] = time.time() + MONITOR_POLL_SECONDS
+
+    except (EOFError, KeyboardInterrupt):
+        log.info(f"{etiqueta} Supervisor desconectado o Ctrl+C. Cerrando navegador...")
+    except Exception as e:
+        log.error(f"{etiqueta} ERROR fatal en el navegador compartido: {e}")
+        traceback.print_exc()
+        sys.exit(EXIT_CODE_ERROR)
+    finally:
+        if driver:
+            cerrar_navegador(driver)
+        log.info(f"{etiqueta} Navegador cerrado. Proceso terminado (por 'finally').")